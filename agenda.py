@@ -0,0 +1,110 @@
+from datetime import time as dt_time
+
+# ==========================================
+# AGENDA NORMALIZADA (DIAS E HORÁRIOS)
+# ==========================================
+# Os dias de frequência ficam em `dias_mask` (bit por dia) e os horários
+# em minutos desde a meia-noite (`entrada_min`, `saida_min`), mantidos por
+# gatilhos a partir das colunas de texto. As agregações do painel são
+# GROUP BY em SQL sobre o índice idx_solicitacoes_agenda, sem pandas.
+
+DIAS = ("Segunda", "Terça", "Quarta", "Quinta", "Sexta")
+BITS = {dia: 1 << i for i, dia in enumerate(DIAS)}
+
+# Dimensão -> expressão SQL (nunca interpolamos texto do usuário)
+DIMENSOES = {
+    "escola": "s.nome_escola",
+    "dia": "d.nome",
+    "faixa": "(s.{horario}_min / :faixa) * :faixa",
+    "empresa": "COALESCE(s.empresa, 'Sem empresa')",
+    "cadeirante": "s.cadeirante",
+}
+# Ordem natural de cada dimensão no resultado
+_ORDEM = {"dia": "MIN(d.bit)"}
+
+
+def mascara(dias):
+    """["Segunda", "Quarta"] -> 5."""
+    return sum(BITS[d] for d in dias)
+
+
+def minutos(horario):
+    """datetime.time ou "HH:MM[:SS]" -> minutos desde a meia-noite (None se vazio)."""
+    if horario is None or horario in ("", "None"):
+        return None
+    if isinstance(horario, dt_time):
+        return horario.hour * 60 + horario.minute
+    h, m = str(horario).split(":")[:2]
+    return int(h) * 60 + int(m)
+
+
+def formatar_minutos(valor):
+    return None if valor is None else f"{valor // 60:02d}:{valor % 60:02d}"
+
+
+def _tabela_dias():
+    return "SELECT " + " UNION ALL SELECT ".join(f"'{d}' AS nome, {b} AS bit" if i == 0 else f"'{d}', {b}"
+                                                  for i, (d, b) in enumerate(BITS.items()))
+
+
+def contagens(conn, dimensoes=("escola", "dia", "faixa", "empresa"), status="Aprovado", escola=None, empresa=None,
+              dias=None, cadeirante=None, horario="entrada", desde=None, ate=None, faixa=30):
+    """Alunos (e cadeirantes) agrupados pelas dimensões pedidas.
+
+    `desde`/`ate` são minutos (inclusive) do horário escolhido ("entrada" ou
+    "saida"); `faixa` é o tamanho, em minutos, das faixas de horário.
+    Ex.: cadeirantes na escola X na terça até 07:30 ->
+    contagens(conn, ("escola",), escola="X", dias=["Terça"], cadeirante=True, ate=450)
+    """
+    if horario not in ("entrada", "saida"):
+        raise ValueError(f"Horário inválido: {horario}")
+    colunas = [DIMENSOES[d].format(horario=horario) for d in dimensoes]
+
+    # Sem a dimensão "dia" cada aluno conta uma vez; com ela, uma vez por dia
+    por_dia = "dia" in dimensoes
+    condicoes, params = ["(s.dias_mask & d.bit) != 0"] if por_dia else [], {"faixa": faixa}
+    if status:
+        condicoes.append("s.status = :status")
+        params["status"] = status
+    if escola:
+        condicoes.append("s.nome_escola = :escola")
+        params["escola"] = escola
+    if empresa:
+        condicoes.append("s.empresa = :empresa")
+        params["empresa"] = empresa
+    if dias:
+        condicoes.append("(s.dias_mask & :dias) != 0")
+        params["dias"] = mascara(dias)
+    if cadeirante is not None:
+        condicoes.append("s.cadeirante = :cadeirante")
+        params["cadeirante"] = "SIM" if cadeirante else "NÃO"
+    if desde is not None:
+        condicoes.append(f"s.{horario}_min >= :desde")
+        params["desde"] = desde
+    if ate is not None:
+        condicoes.append(f"s.{horario}_min <= :ate")
+        params["ate"] = ate
+
+    selecao = [f"{c} AS {d}" for c, d in zip(colunas, dimensoes)]
+    sql = f"""
+        SELECT {', '.join(selecao + ['COUNT(*) AS alunos',
+                                      "SUM(CASE WHEN s.cadeirante = 'SIM' THEN 1 ELSE 0 END) AS cadeirantes"])}
+        FROM solicitacoes s{f" CROSS JOIN ({_tabela_dias()}) d" if por_dia else ""}
+        {"WHERE " + " AND ".join(condicoes) if condicoes else ""}
+    """
+    if dimensoes:
+        sql += f" GROUP BY {', '.join(colunas)}"
+        sql += f" ORDER BY {', '.join(_ORDEM.get(d, c) for d, c in zip(dimensoes, colunas))}"
+
+    linhas = [dict(r) for r in conn.execute(sql, params)]
+    if "faixa" in dimensoes:
+        for linha in linhas:
+            linha["faixa"] = formatar_minutos(linha["faixa"])
+    return linhas
+
+
+def sem_horario(conn, status="Aprovado"):
+    """Quantos registros não têm dia ou horário de entrada utilizável."""
+    return conn.execute(
+        "SELECT COUNT(*) FROM solicitacoes WHERE status = ? AND (dias_mask = 0 OR entrada_min IS NULL)", (status,)
+    ).fetchone()[0]
@@ -0,0 +1,175 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+import dados
+
+# ==========================================
+# SENHAS (SCRYPT) E SESSÕES PERSISTENTES
+# ==========================================
+# As senhas são guardadas como scrypt$n$r$p$sal$hash. O cálculo é síncrono
+# (a execução da página espera por ele) e limitado por um semáforo: o scrypt
+# libera o GIL, e o limite evita que um pico de logins às 7h dispare dezenas
+# de cálculos de 16 MB ao mesmo tempo.
+# Senhas antigas em texto puro são aceitas uma última vez e convertidas.
+#
+# Sessões: token "<id>.<expira>.<assinatura>" (HMAC-SHA256), registrado na
+# tabela sessoes. Sobrevive a reinícios do servidor, pois fica num cookie
+# do navegador e no banco. Fora da URL: não vaza por histórico, links
+# copiados ou capturas de tela.
+
+SCRYPT_N = int(os.environ.get("TRANSPORTE_SCRYPT_N", 2**14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+DURACAO_SESSAO = 12 * 3600
+PREFIXO_HASH = "scrypt$"
+
+_limite_hash = threading.BoundedSemaphore(min(4, os.cpu_count() or 1))
+_segredo = None
+_trava_segredo = threading.Lock()
+_hash_ficticio = None
+
+
+def _b64(dados_bin):
+    return base64.urlsafe_b64encode(dados_bin).decode().rstrip("=")
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _scrypt(senha, sal, n, r, p):
+    with _limite_hash:
+        return hashlib.scrypt(senha.encode(), salt=sal, n=n, r=r, p=p, maxmem=256 * 1024 * 1024, dklen=32)
+
+
+# ---------- Hash de senha ----------
+def gerar_hash(senha, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    sal = os.urandom(16)
+    return f"{PREFIXO_HASH}{n}${r}${p}${_b64(sal)}${_b64(_scrypt(senha, sal, n, r, p))}"
+
+
+def conferir_hash(senha, armazenado):
+    """Devolve (confere, precisa_regerar)."""
+    if not armazenado.startswith(PREFIXO_HASH):
+        # Texto puro herdado das versões anteriores
+        return hmac.compare_digest(senha.encode(), armazenado.encode()), True
+    _, n, r, p, sal, esperado = armazenado.split("$")
+    n, r, p = int(n), int(r), int(p)
+    confere = hmac.compare_digest(_scrypt(senha, _de_b64(sal), n, r, p), _de_b64(esperado))
+    return confere, confere and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def _obter_hash_ficticio():
+    # Conferido quando o usuário não existe: o tempo de resposta é o mesmo
+    # de uma senha errada e não revela quais logins existem
+    global _hash_ficticio
+    if _hash_ficticio is None:
+        _hash_ficticio = gerar_hash(secrets.token_urlsafe(16))
+    return _hash_ficticio
+
+
+def verificar_credenciais(pool, username, senha):
+    """Devolve a linha do usuário (sem a senha) se as credenciais conferirem; senão None."""
+    with pool.leitura() as conn:
+        usuario = conn.execute("SELECT id, nome_completo, username, password, perfis FROM usuarios WHERE username = ?",
+                               (username,)).fetchone()
+    if usuario is None:
+        conferir_hash(senha, _obter_hash_ficticio())
+        return None
+
+    confere, regerar = conferir_hash(senha, usuario["password"])
+    if not confere:
+        return None
+    if regerar:
+        novo = gerar_hash(senha)
+        with pool.escrita() as w:
+            w.execute("UPDATE usuarios SET password = ? WHERE id = ? AND password = ?",
+                      (novo, usuario["id"], usuario["password"]))
+    return {chave: usuario[chave] for chave in ("id", "nome_completo", "username", "perfis")}
+
+
+# ---------- Perfis (com cache) ----------
+@dados.em_cache(dados.depende("usuarios", ("username", "nome_completo", "perfis")))
+def perfis_usuario(conn, username):
+    linha = conn.execute("SELECT nome_completo, perfis FROM usuarios WHERE username = ?", (username,)).fetchone()
+    if linha is None:
+        return None
+    return linha["nome_completo"], [p.strip() for p in linha["perfis"].split(",")]
+
+
+# ---------- Sessões ----------
+def _obter_segredo(pool):
+    global _segredo
+    if _segredo is None:
+        with _trava_segredo:
+            if _segredo is None:
+                do_ambiente = os.environ.get("TRANSPORTE_SEGREDO")
+                if do_ambiente:
+                    _segredo = do_ambiente.encode()
+                else:
+                    with pool.leitura() as conn:
+                        _segredo = conn.execute("SELECT valor FROM config WHERE chave = 'segredo_sessao'").fetchone()[0].encode()
+    return _segredo
+
+
+def _assinar(pool, corpo):
+    return _b64(hmac.new(_obter_segredo(pool), corpo.encode(), hashlib.sha256).digest()[:18])
+
+
+def criar_sessao(pool, username, perfil, duracao=DURACAO_SESSAO):
+    id_sessao = secrets.token_urlsafe(18)
+    expira = int(time.time() + duracao)
+    with pool.escrita() as w:
+        # Cada login também apaga as sessões vencidas (índice em expira_em)
+        _apagar_vencidas(w)
+        w.execute("INSERT INTO sessoes (id, username, perfil, criada_em, expira_em) VALUES (?, ?, ?, ?, ?)",
+                  (id_sessao, username, perfil, time.time(), expira))
+    corpo = f"{id_sessao}.{expira}"
+    return f"{corpo}.{_assinar(pool, corpo)}"
+
+
+def validar_sessao(pool, token):
+    """Devolve (username, nome_completo, perfil) de uma sessão válida, ou None."""
+    try:
+        id_sessao, expira, assinatura = token.split(".")
+        expira = int(expira)
+    except (AttributeError, ValueError):
+        return None
+    # Assinatura e validade conferidas antes de tocar no banco
+    if not hmac.compare_digest(assinatura, _assinar(pool, f"{id_sessao}.{expira}")) or expira < time.time():
+        return None
+
+    with pool.leitura() as conn:
+        sessao = conn.execute("SELECT username, perfil FROM sessoes WHERE id = ? AND expira_em >= ?",
+                              (id_sessao, time.time())).fetchone()
+        if sessao is None:
+            return None
+        # O perfil pode ter sido retirado (ou o usuário excluído) depois do login
+        usuario = perfis_usuario(conn, sessao["username"])
+    if usuario is None or sessao["perfil"] not in usuario[1]:
+        return None
+    return sessao["username"], usuario[0], sessao["perfil"]
+
+
+def renovar_sessao(pool, token, username, perfil):
+    """Token novo (e o antigo encerrado) se já passou da metade da validade; senão o mesmo token."""
+    if int(token.split(".")[1]) - time.time() > DURACAO_SESSAO / 2:
+        return token
+    novo = criar_sessao(pool, username, perfil)
+    encerrar_sessao(pool, token)
+    return novo
+
+
+def encerrar_sessao(pool, token):
+    id_sessao = (token or "").split(".")[0]
+    with pool.escrita() as w:
+        w.execute("DELETE FROM sessoes WHERE id = ?", (id_sessao,))
+
+
+def _apagar_vencidas(w):
+    return w.execute("DELETE FROM sessoes WHERE expira_em < ?", (time.time(),)).rowcount
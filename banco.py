@@ -0,0 +1,382 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import metricas
+
+# ==========================================
+# POOL DE CONEXÕES SQLITE (WAL)
+# ==========================================
+# Um conjunto limitado de conexões só de leitura e um único escritor
+# serializado por trava. Em modo WAL, leitores não esperam o escritor e
+# o escritor não espera os leitores: a avaliação de um supervisor não
+# bloqueia as escolas consultando o sistema.
+
+PRAGMAS_CONEXAO = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",    # seguro em WAL; só o último commit pode se perder numa queda de energia
+    "PRAGMA cache_size = -20000",     # ~20 MB de cache de páginas por conexão
+    "PRAGMA mmap_size = 268435456",   # 256 MB mapeados em memória para leitura
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+# Textos de SQL distintos com chaves guardadas no escritor; acima disso o
+# escritor é reaberto (cache de statements novo) e a contagem recomeça
+LIMITE_SQL_ESCRITOR = 2000
+
+# Chave de invalidação "tudo": escrita cujo efeito não se sabe (banco_pg)
+INVALIDAR_TUDO = "*"
+
+
+class PoolEsgotado(RuntimeError):
+    pass
+
+
+class CursorMedido:
+    """Cursor que conta as linhas à medida que são lidas; a amostra vai para metricas quando ele se esgota
+    ou é fechado (ou descartado sem ler tudo, como em `execute(...).fetchone()`).
+
+    A duração é a do execute mais a dos fetch; o que quem lê faz entre um
+    fetch e outro não entra.
+    """
+
+    def __init__(self, cursor, nome, segundos):
+        self._cursor = cursor
+        self._nome = nome
+        self._segundos = segundos
+        self._linhas = 0
+        self._bytes = 0
+        self._aberto = True
+
+    def __getattr__(self, nome):
+        # rowcount, lastrowid, description, arraysize...
+        return getattr(self._cursor, nome)
+
+    def _ler(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        self._segundos += time.perf_counter() - inicio
+        return resultado
+
+    def _contar(self, linhas):
+        self._linhas += len(linhas)
+        if metricas.CONTAR_BYTES:
+            self._bytes += metricas.tamanho(linhas)
+
+    def _registrar(self):
+        if self._aberto:
+            self._aberto = False
+            metricas.registro.registrar("sql", self._nome, self._segundos, self._linhas, self._bytes)
+
+    def fetchone(self):
+        linha = self._ler(self._cursor.fetchone)
+        if linha is None:
+            self._registrar()
+        else:
+            self._contar((linha,))
+        return linha
+
+    def fetchmany(self, tamanho=None):
+        tamanho = self._cursor.arraysize if tamanho is None else tamanho
+        lote = self._ler(self._cursor.fetchmany, tamanho)
+        self._contar(lote)
+        if len(lote) < tamanho:
+            self._registrar()
+        return lote
+
+    def fetchall(self):
+        linhas = self._ler(self._cursor.fetchall)
+        self._contar(linhas)
+        self._registrar()
+        return linhas
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        linha = self.fetchone()
+        if linha is None:
+            raise StopIteration
+        return linha
+
+    def close(self):
+        self._registrar()
+        self._cursor.close()
+
+    def __del__(self):
+        self._registrar()
+
+
+class ConexaoMedida:
+    """Envolve uma conexão (sqlite3 ou banco_pg.ConexaoPG) e mede cada comando em metricas ("sql")."""
+
+    def __init__(self, conn):
+        self._original = conn
+
+    def __getattr__(self, nome):
+        return getattr(self._original, nome)
+
+    def execute(self, sql, params=()):
+        nome = metricas.nome_consulta(sql)
+        inicio = time.perf_counter()
+        cursor = self._original.execute(sql, params)
+        segundos = time.perf_counter() - inicio
+        if cursor.description is None:
+            metricas.registro.registrar("sql", nome, segundos)
+            return cursor
+        return CursorMedido(cursor, nome, segundos)
+
+    def executemany(self, sql, lista_params):
+        with metricas.medir("sql", metricas.nome_consulta(sql)) as medida:
+            cursor = self._original.executemany(sql, lista_params)
+            medida.linhas = max(cursor.rowcount, 0)
+        return cursor
+
+
+def medida(conn):
+    return ConexaoMedida(conn) if metricas.ATIVO else conn
+
+
+class Resultado:
+    """Linhas já lidas de um cursor, com a interface de cursor (a conexão pode ter voltado ao pool)."""
+    arraysize = 1
+
+    def __init__(self, cursor, linhas):
+        self._linhas = linhas
+        self._posicao = 0
+        self.rowcount = cursor.rowcount
+        self.lastrowid = getattr(cursor, "lastrowid", None)
+        self.description = cursor.description
+
+    def fetchone(self):
+        if self._posicao >= len(self._linhas):
+            return None
+        self._posicao += 1
+        return self._linhas[self._posicao - 1]
+
+    def fetchmany(self, tamanho=None):
+        fim = self._posicao + (tamanho or self.arraysize)
+        lote = self._linhas[self._posicao:fim]
+        self._posicao += len(lote)
+        return lote
+
+    def fetchall(self):
+        return self.fetchmany(len(self._linhas))
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._linhas, self._posicao = [], 0
+
+
+class LeituraPorConsulta:
+    """Conexão de leitura para as telas: cada consulta empresta uma conexão do pool só pelo tempo dela.
+
+    Uma tela pode esperar a rede (ViaCEP) ou um time.sleep entre uma consulta
+    e outra; com a conexão emprestada a cada execute, o pool atende muito
+    mais sessões simultâneas que o seu número de conexões.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.dialeto = pool.dialeto
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        with self.pool.leitura() as conn:
+            cursor = conn.execute(sql, params)
+            return Resultado(cursor, cursor.fetchall() if cursor.description is not None else [])
+
+
+def conectar(caminho, somente_leitura=False, cached_statements=128):
+    # isolation_level=None: as transações são abertas explicitamente (BEGIN IMMEDIATE)
+    conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None,
+                           cached_statements=cached_statements)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS_CONEXAO:
+        conn.execute(pragma)
+    if somente_leitura:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+class EscritorSQLite:
+    """O escritor de PoolConexoes: execute/executemany passam pelo registro de chaves alteradas do pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def execute(self, sql, params=()):
+        return self._pool._executar(self._conn.execute, sql, params)
+
+    def executemany(self, sql, lista_params):
+        return self._pool._executar(self._conn.executemany, sql, lista_params)
+
+
+class PoolConexoes:
+    dialeto = "sqlite"
+    ErroIntegridade = sqlite3.IntegrityError
+
+    def __init__(self, caminho, max_leitores=8, timeout=10.0):
+        self.caminho = caminho
+        self.max_leitores = max_leitores
+        self.timeout = timeout
+        self._livres = queue.LifoQueue()
+        self._criados = 0
+        self._trava_criacao = threading.Lock()
+        self._trava_escrita = threading.Lock()
+
+        # Chamados após cada escrita confirmada com o conjunto de chaves
+        # alteradas: "tabela" (INSERT/DELETE), "tabela.coluna" e "tabela.*" (UPDATE)
+        self.ouvintes_escrita = []
+        self._alteradas = set()
+
+        # O autorizador do SQLite só é consultado na preparação (inclusive
+        # das ações dos gatilhos); com o cache de statements, a segunda
+        # execução do mesmo texto não o chama. As chaves vistas na primeira
+        # ficam guardadas por texto de SQL e são repetidas nas seguintes.
+        self._chaves_sql = {}
+        self._capturadas = None
+        self._reabrir_escritor = False
+        self._escritor = self._abrir_escritor()
+        # journal_mode é persistente no arquivo; basta o escritor definir
+        self._escritor.execute("PRAGMA journal_mode = WAL")
+
+    def _abrir_escritor(self):
+        conn = conectar(self.caminho)
+        conn.set_authorizer(self._registrar_alteracao)
+        return conn
+
+    def _registrar_alteracao(self, acao, arg1, arg2, banco, gatilho):
+        if acao in (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_DELETE):
+            chaves = (arg1,)
+        elif acao == sqlite3.SQLITE_UPDATE:
+            chaves = (f"{arg1}.{arg2}", f"{arg1}.*")
+        else:
+            return sqlite3.SQLITE_OK
+        if self._capturadas is not None:
+            self._capturadas.update(chaves)
+        else:
+            # Escrita preparada fora da captura: statement do cache preparado
+            # de novo pelo SQLite após mudança de esquema (ex.: gatilho novo).
+            # Vale para esta execução; as chaves guardadas podem estar
+            # desatualizadas, então o escritor é reaberto na próxima escrita.
+            self._alteradas.update(chaves)
+            self._reabrir_escritor = True
+        return sqlite3.SQLITE_OK
+
+    def _executar(self, metodo, sql, params):
+        chaves = self._chaves_sql.get(sql)
+        if chaves is not None:
+            self._alteradas.update(chaves)
+            return metodo(sql, params)
+        # Texto novo: ainda não está no cache de statements, então é preparado
+        # agora e o autorizador vê tudo o que ele altera
+        self._capturadas = set()
+        try:
+            return metodo(sql, params)
+        finally:
+            # Guardado mesmo com erro na execução: o statement já foi preparado
+            # e está no cache do sqlite3
+            capturadas, self._capturadas = self._capturadas, None
+            self._chaves_sql[sql] = frozenset(capturadas)
+            self._alteradas.update(capturadas)
+
+    def _notificar(self):
+        alteradas, self._alteradas = self._alteradas, set()
+        if alteradas:
+            for ouvinte in self.ouvintes_escrita:
+                ouvinte(alteradas)
+
+    def _obter_leitor(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._trava_criacao:
+            if self._criados < self.max_leitores:
+                self._criados += 1
+                return conectar(self.caminho, somente_leitura=True)
+        try:
+            return self._livres.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolEsgotado(f"Nenhuma conexão de leitura livre após {self.timeout}s") from None
+
+    @contextmanager
+    def leitura(self):
+        """Empresta uma conexão de leitura à thread atual até o fim do bloco."""
+        conn = self._obter_leitor()
+        try:
+            yield medida(conn)
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.put(conn)
+
+    @contextmanager
+    def escrita(self, transacao=True):
+        """Dá acesso exclusivo ao escritor; com `transacao`, faz commit ao final do bloco."""
+        if not self._trava_escrita.acquire(timeout=self.timeout):
+            raise PoolEsgotado(f"Escritor ocupado há mais de {self.timeout}s")
+        try:
+            if self._reabrir_escritor or len(self._chaves_sql) > LIMITE_SQL_ESCRITOR:
+                self._escritor.close()
+                self._escritor = self._abrir_escritor()
+                self._chaves_sql.clear()
+                self._reabrir_escritor = False
+            conn = self._escritor
+            self._alteradas.clear()
+            if transacao:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield medida(EscritorSQLite(self, conn))
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._alteradas.clear()
+                raise
+            if conn.in_transaction:
+                conn.commit()
+            self._notificar()
+        finally:
+            self._trava_escrita.release()
+
+    def fechar(self):
+        while True:
+            try:
+                self._livres.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._trava_escrita:
+            self._escritor.close()
+
+
+def abrir(url, **opcoes):
+    """Pool pelo endereço do banco: caminho ou sqlite:///caminho (SQLite), postgresql://... (PostgreSQL).
+
+    As duas implementações têm a mesma interface (leitura, escrita,
+    ouvintes_escrita, fechar); trocar de banco é só trocar o endereço.
+    """
+    if url.startswith(("postgresql://", "postgres://")):
+        try:
+            import banco_pg  # psycopg só é necessário com PostgreSQL
+        except ImportError:
+            raise RuntimeError('Para usar PostgreSQL instale os pacotes psycopg e psycopg_pool '
+                               '(pip install "psycopg[binary]" psycopg_pool)') from None
+        return banco_pg.PoolPostgres(url, **opcoes)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return PoolConexoes(url, **opcoes)
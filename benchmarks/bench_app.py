@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+APP = os.path.join(RAIZ, "transporte.py")
+
+# ==========================================
+# BENCHMARK DAS PÁGINAS DO APP
+# ==========================================
+# Gera um banco sintético, roda o app com streamlit.testing.v1.AppTest e
+# mede a latência de cada rerun por página, o pico de memória e o tamanho
+# do banco. Com --json o resultado fica num arquivo para comparar versões:
+#
+#   python benchmarks/bench_app.py --registros 20000 --json resultados/bench.json
+#
+# O AppTest não simula file_uploader; o envio da escola e a decisão do
+# supervisor com anexo são medidos chamando diretamente o mesmo caminho de
+# gravação usado pelo app (armazém de documentos + escrita no pool).
+
+
+def _achar(widgets, rotulo):
+    for w in widgets:
+        if w.label == rotulo:
+            return w
+    raise LookupError(f"Widget não encontrado: {rotulo}")
+
+
+def _novo_app(logado=True):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=60)
+    if logado:
+        at.session_state.logged_in = True
+        at.session_state.user_role = "ADM"
+        at.session_state.user_name = "Administrador do Sistema"
+        at.session_state.username_login = "adm"
+    return at
+
+
+def _checar(at):
+    if at.exception:
+        raise RuntimeError(f"Erro no app: {at.exception[0].message}")
+    return at
+
+
+def _ir_para(at, pagina):
+    _checar(at.run())
+    at.sidebar.radio[0].set_value(pagina)
+    return _checar(at.run())
+
+
+# ---------- Cenários ----------
+# Cada cenário prepara o app e devolve uma função que executa uma medição.
+
+def cenario_login():
+    def passo():
+        at = _novo_app(logado=False)
+        at.run()
+        _achar(at.text_input, "Usuário").input("adm")
+        _achar(at.text_input, "Senha").input("12345678")
+        _achar(at.button, "Entrar").click()
+        _checar(at.run())
+    return passo
+
+
+def cenario_escola_formulario():
+    at = _novo_app()
+    _ir_para(at, "Escola (Solicitação)")
+    return lambda: _checar(at.run())
+
+
+def cenario_escola_envio(pool):
+    import documentos
+    import gerar_dados
+    import processamento
+
+    seq = iter(range(10**9))
+
+    def passo():
+        n = next(seq)
+        ref = documentos.salvar_documento(os.urandom(50 * 1024))
+        with pool.escrita() as w:
+            w.execute("INSERT INTO solicitacoes (nome_aluno, cpf_aluno, ra_aluno, nome_escola, ref_arq_medico, "
+                      "nome_arq_medico, ref_arq_viagem, nome_arq_viagem, data_solicitacao) VALUES (?,?,?,?,?,?,?,?,?)",
+                      (f"Bench {n}", gerar_dados.cpf_valido(random.Random(n)), f"B{n}", "EE Escola 1",
+                       ref, "medico.pdf", ref, "viagem.pdf", str(datetime.now())))
+            processamento.enfileirar(w, [ref])
+    return passo
+
+
+def cenario_supervisor_fila():
+    at = _novo_app()
+    _ir_para(at, "Supervisor (Avaliação)")
+    _achar(at.button, "📥 Pegar próximas").click()
+    _checar(at.run())
+    return lambda: _checar(at.run())
+
+
+def cenario_supervisor_decisao(pool):
+    import documentos
+    import fila
+
+    def passo():
+        reservadas = fila.reservar(pool, "bench", 1)
+        if not reservadas:
+            return
+        id_sol, _, versao = reservadas[0]
+        ref = documentos.salvar_documento(os.urandom(50 * 1024))
+        fila.finalizar(pool, id_sol, versao, "bench", "Aprovado", "Bench", "00000000000", "Aprovado", ref, "parecer.pdf")
+    return passo
+
+
+def cenario_relatorio_filtro():
+    at = _novo_app()
+    _ir_para(at, "Relatórios e Docs")
+    status = iter(["Aprovado", "Reprovado", "Pendente", "Todos"] * 10**6)
+
+    def passo():
+        _achar(at.selectbox, "Filtrar Status").set_value(next(status))
+        _checar(at.run())
+    return passo
+
+
+def cenario_relatorio_paginas():
+    at = _novo_app()
+    _ir_para(at, "Relatórios e Docs")
+
+    def passo():
+        botao = _achar(at.button, "Próxima ➡️")
+        if botao.disabled:
+            _achar(at.button, "⬅️ Anterior").click()
+        else:
+            botao.click()
+        _checar(at.run())
+    return passo
+
+
+def cenario_relatorio_registro():
+    at = _novo_app()
+    _ir_para(at, "Relatórios e Docs")
+    seletor = _achar(at.selectbox, "Registro da página:")
+    opcoes = [o for o in seletor.options if o != "Selecione..."]
+    indice = iter(range(10**9))
+
+    def passo():
+        if opcoes:
+            _achar(at.selectbox, "Registro da página:").select_index(1 + next(indice) % len(opcoes))
+        _checar(at.run())
+    return passo
+
+
+def cenario_usuarios():
+    at = _novo_app()
+    _ir_para(at, "Gestão de Acesso")
+    seq = iter(range(10**9))
+
+    def passo():
+        n = next(seq)
+        _achar(at.text_input, "Nome Completo").input(f"Usuário Bench {n}")
+        _achar(at.text_input, "Usuário (Login)").input(f"bench_{n}_{time.time_ns()}")
+        _achar(at.text_input, "Senha").input("senha-bench")
+        _achar(at.multiselect, "Perfis de Acesso").set_value(["Escola"])
+        _achar(at.button, "Cadastrar").click()
+        _checar(at.run())
+    return passo
+
+
+# ---------- Execução ----------
+def _medir(passo, repeticoes):
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        passo()
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def _pico_memoria(fabrica):
+    tracemalloc.start()
+    try:
+        passo = fabrica()
+        tracemalloc.reset_peak()
+        passo()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _resumo(latencias):
+    ms = sorted(v * 1000 for v in latencias)
+    p95 = statistics.quantiles(ms, n=20)[18] if len(ms) > 1 else ms[0]
+    return {"n": len(ms), "p50_ms": round(statistics.median(ms), 2), "p95_ms": round(p95, 2),
+            "max_ms": round(ms[-1], 2), "media_ms": round(statistics.fmean(ms), 2)}
+
+
+def _tamanho_pasta(caminho):
+    return sum(os.path.getsize(os.path.join(raiz, f)) for raiz, _, arquivos in os.walk(caminho) for f in arquivos)
+
+
+def executar(args):
+    import gerar_dados
+    import metricas
+
+    pool = gerar_dados.preparar_banco(os.environ["TRANSPORTE_DB"])
+    inicio = time.perf_counter()
+    gerar_dados.gerar(pool, args.registros, args.tamanho_doc, args.docs_distintos,
+                      raiz=os.environ["TRANSPORTE_DOCS_DIR"])
+    geracao = time.perf_counter() - inicio
+    print(f"{args.registros} registros sintéticos gerados em {geracao:.1f}s")
+
+    cenarios = {
+        "login": cenario_login,
+        "escola_formulario": cenario_escola_formulario,
+        "escola_envio": lambda: cenario_escola_envio(pool),
+        "supervisor_fila": cenario_supervisor_fila,
+        "supervisor_decisao": lambda: cenario_supervisor_decisao(pool),
+        "relatorio_filtro": cenario_relatorio_filtro,
+        "relatorio_paginas": cenario_relatorio_paginas,
+        "relatorio_registro": cenario_relatorio_registro,
+        "usuarios_cadastro": cenario_usuarios,
+    }
+    if args.cenarios:
+        cenarios = {nome: f for nome, f in cenarios.items() if nome in args.cenarios}
+
+    resultados = {}
+    for nome, fabrica in cenarios.items():
+        passo = fabrica()
+        passo()  # aquecimento: caches, imports e primeira conexão
+        res = _resumo(_medir(passo, args.repeticoes))
+        if args.memoria:
+            res["pico_memoria_mb"] = round(_pico_memoria(fabrica) / 2**20, 2)
+        resultados[nome] = res
+        print(f"{nome:>20}: p50 {res['p50_ms']:8.1f} ms | p95 {res['p95_ms']:8.1f} ms"
+              + (f" | pico {res['pico_memoria_mb']:.1f} MB" if args.memoria else ""))
+    pool.fechar()
+
+    db = os.environ["TRANSPORTE_DB"]
+    return {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "streamlit": __import__("streamlit").__version__,
+            "registros": args.registros,
+            "tamanho_doc_kb": args.tamanho_doc,
+            "repeticoes": args.repeticoes,
+            "geracao_s": round(geracao, 2),
+        },
+        "cenarios": resultados,
+        "armazenamento": {
+            "banco_mb": round(os.path.getsize(db) / 2**20, 2),
+            "wal_mb": round(os.path.getsize(db + "-wal") / 2**20, 2) if os.path.exists(db + "-wal") else 0,
+            "documentos_mb": round(_tamanho_pasta(os.environ["TRANSPORTE_DOCS_DIR"]) / 2**20, 2),
+        },
+        # ru_maxrss é em KB no Linux
+        "processo": {"rss_max_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)},
+        # Medições internas do app (o AppTest roda no mesmo processo): tempo por tela e por consulta
+        "metricas": metricas.registro.resumo(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de latência por página do app.")
+    parser.add_argument("--registros", type=int, default=10000)
+    parser.add_argument("--tamanho-doc", type=int, default=50, help="KB por documento sintético")
+    parser.add_argument("--docs-distintos", type=int, default=200)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--cenarios", nargs="*", help="Roda só os cenários indicados")
+    parser.add_argument("--memoria", action="store_true", help="Mede o pico de memória (tracemalloc) por cenário")
+    parser.add_argument("--json", help="Grava o resultado neste arquivo JSON")
+    parser.add_argument("--manter", action="store_true", help="Não apaga o banco gerado ao final")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_transporte_")
+    # O app lê o caminho do banco e do armazém destas variáveis ao ser importado
+    os.environ["TRANSPORTE_DB"] = os.path.join(pasta, "bench.db")
+    os.environ["TRANSPORTE_DOCS_DIR"] = os.path.join(pasta, "documentos")
+    # CEPs sintéticos não devem sair para a rede
+    os.environ.setdefault("TRANSPORTE_VIACEP_URL", "http://127.0.0.1:9/{cep}")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    try:
+        resultado = executar(args)
+    finally:
+        if not args.manter:
+            shutil.rmtree(pasta, ignore_errors=True)
+        else:
+            print(f"Banco mantido em {pasta}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as arq:
+            json.dump(resultado, arq, indent=2, ensure_ascii=False)
+        print(f"Resultado gravado em {args.json}")
@@ -0,0 +1,152 @@
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+import listagem
+import migracoes
+
+# ==========================================
+# BENCHMARK DE CONCORRÊNCIA
+# ==========================================
+# N escolas enviando solicitações ao mesmo tempo em que M supervisores
+# consultam a fila de pendentes e o relatório. Compara o pool WAL com o
+# modelo antigo (uma conexão nova por operação, journal padrão).
+#
+#   python benchmarks/concorrencia.py --escolas 8 --supervisores 8 --segundos 10
+
+INSERT_SOLICITACAO = '''INSERT INTO solicitacoes (
+    nome_aluno, cpf_aluno, ra_aluno, cadeirante, nome_escola, status, empresa,
+    dias_frequencia, horario_entrada, horario_saida, data_solicitacao
+) VALUES (?,?,?,?,?,?,?,?,?,?,?)'''
+
+
+def _linha(i):
+    return (f"Aluno {i}", f"{i:011d}", f"RA{i}", "NÃO", f"Escola {i % 40}", "Pendente",
+            f"Empresa {i % 5}", "Segunda, Quarta", "07:00:00", "12:00:00", str(datetime.now()))
+
+
+def _leitura(conn):
+    conn.execute("SELECT id, nome_aluno FROM solicitacoes WHERE status='Pendente'").fetchall()
+    listagem.listar_pagina(conn, listagem.montar_filtros(status="Pendente"))
+
+
+class ModoPool:
+    nome = "pool WAL"
+
+    def __init__(self, caminho):
+        self.pool = banco.PoolConexoes(caminho)
+
+    def escrever(self, i):
+        with self.pool.escrita() as w:
+            w.execute(INSERT_SOLICITACAO, _linha(i))
+
+    def ler(self):
+        with self.pool.leitura() as conn:
+            _leitura(conn)
+
+    def fechar(self):
+        self.pool.fechar()
+
+
+class ModoAntigo:
+    nome = "conexão por operação"
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        conn = sqlite3.connect(caminho)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def escrever(self, i):
+        conn = self._conectar()
+        conn.execute(INSERT_SOLICITACAO, _linha(i))
+        conn.commit()
+        conn.close()
+
+    def ler(self):
+        conn = self._conectar()
+        _leitura(conn)
+        conn.close()
+
+    def fechar(self):
+        pass
+
+
+def _trabalhador(operacao, fim, latencias, erros):
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        try:
+            operacao()
+        except sqlite3.OperationalError:
+            # "database is locked": o que o usuário veria como erro na tela
+            erros.append(1)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    return statistics.quantiles(valores, n=100)[p - 1] if len(valores) > 1 else valores[0]
+
+
+def executar(modo_cls, escolas, supervisores, segundos, registros_iniciais):
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        conn = sqlite3.connect(caminho)
+        migracoes.migrar(conn)
+        conn.executemany(INSERT_SOLICITACAO, (_linha(i) for i in range(registros_iniciais)))
+        conn.commit()
+        conn.close()
+
+        modo = modo_cls(caminho)
+        contador = iter(range(registros_iniciais, 10**9))
+        trava = threading.Lock()
+
+        def proximo():
+            with trava:
+                return next(contador)
+
+        lat_escrita, lat_leitura, erros = [], [], []
+        fim = time.perf_counter() + segundos
+        threads = [threading.Thread(target=_trabalhador, args=(lambda: modo.escrever(proximo()), fim, lat_escrita, erros))
+                   for _ in range(escolas)]
+        threads += [threading.Thread(target=_trabalhador, args=(modo.ler, fim, lat_leitura, erros))
+                    for _ in range(supervisores)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        modo.fechar()
+
+    print(f"\n== {modo_cls.nome} ({escolas} escolas, {supervisores} supervisores, {segundos}s) ==")
+    for rotulo, lat in (("escritas", lat_escrita), ("leituras", lat_leitura)):
+        print(f"{rotulo:>9}: {len(lat) / segundos:8.1f} op/s | "
+              f"p50 {_percentil(lat, 50) * 1000:7.2f} ms | p95 {_percentil(lat, 95) * 1000:7.2f} ms")
+    print(f"    erros: {len(erros)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de escolas e supervisores simultâneos.")
+    parser.add_argument("--escolas", type=int, default=8)
+    parser.add_argument("--supervisores", type=int, default=8)
+    parser.add_argument("--segundos", type=float, default=5)
+    parser.add_argument("--registros", type=int, default=5000, help="Registros pré-carregados")
+    args = parser.parse_args()
+
+    for modo in (ModoAntigo, ModoPool):
+        executar(modo, args.escolas, args.supervisores, args.segundos, args.registros)
@@ -0,0 +1,128 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+import documentos
+import migracoes
+
+# ==========================================
+# GERADOR DE DADOS SINTÉTICOS
+# ==========================================
+# Popula um banco (e o armazém de documentos) com solicitações realistas
+# para os benchmarks:
+#
+#   python benchmarks/gerar_dados.py --registros 20000 --tamanho-doc 200 --banco bench.db --docs bench_docs
+
+NOMES = ("Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Heitor", "Isabela", "João",
+         "Larissa", "Miguel", "Nicole", "Otávio", "Pedro", "Rafaela", "Samuel", "Thais", "Vitor", "Yasmin")
+SOBRENOMES = ("Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa", "Rodrigues",
+              "Almeida", "Nascimento", "Araújo", "Carvalho", "Gomes", "Martins", "Rocha")
+DIAS = ("Segunda", "Terça", "Quarta", "Quinta", "Sexta")
+HORARIOS = (("07:00:00", "12:00:00"), ("07:30:00", "12:30:00"), ("13:00:00", "18:00:00"), ("13:30:00", "18:30:00"))
+MOTIVOS = ("Falta de Doc", "Não elegível", "Reavaliação")
+
+COLUNAS = (
+    "nome_aluno", "cpf_aluno", "ra_aluno", "cadeirante", "cid",
+    "cep_aluno", "logradouro_aluno", "numero_aluno", "municipio_aluno",
+    "nome_escola", "cep_escola", "logradouro_escola", "numero_escola", "municipio_escola",
+    "sala_recurso", "dias_frequencia", "horario_entrada", "horario_saida",
+    "ref_arq_medico", "nome_arq_medico", "ref_arq_viagem", "nome_arq_viagem",
+    "status", "supervisor_nome", "supervisor_cpf", "motivo_reprovacao",
+    "ref_arq_assinado", "nome_arq_assinado", "data_atualizacao", "empresa", "data_solicitacao",
+)
+
+
+def cpf_valido(rnd):
+    d = [rnd.randint(0, 9) for _ in range(9)]
+    for tamanho in (9, 10):
+        soma = sum(x * peso for x, peso in zip(d, range(tamanho + 1, 1, -1)))
+        d.append((soma * 10) % 11 % 10)
+    return "".join(map(str, d))
+
+
+def _documento(rnd, tamanho_kb, distintos, cache, raiz):
+    # Com `distintos` pequeno, vários registros compartilham o mesmo arquivo (deduplicação)
+    chave = rnd.randrange(distintos) if distintos else None
+    if chave is not None and chave in cache:
+        return cache[chave]
+    conteudo = b"%PDF-1.4\n" + rnd.randbytes(max(tamanho_kb * 1024 - 9, 0))
+    ref = documentos.salvar_documento(conteudo, raiz)
+    if chave is not None:
+        cache[chave] = ref
+    return ref
+
+
+def gerar(pool, registros, tamanho_doc_kb=50, docs_distintos=200, escolas=60, empresas=6,
+          proporcao_pendentes=0.3, semente=42, raiz=documentos.DOCS_DIR, lote=2000):
+    """Insere `registros` solicitações sintéticas e devolve quantas foram inseridas."""
+    rnd = random.Random(semente)
+    cache_docs = {}
+    inicio_periodo = datetime.now() - timedelta(days=180)
+    inseridos = 0
+
+    while inseridos < registros:
+        linhas = []
+        for _ in range(min(lote, registros - inseridos)):
+            n = inseridos + len(linhas)
+            escola = rnd.randrange(escolas)
+            entrada, saida = rnd.choice(HORARIOS)
+            data_sol = inicio_periodo + timedelta(minutes=rnd.randrange(180 * 24 * 60))
+            pendente = rnd.random() < proporcao_pendentes
+            aprovado = not pendente and rnd.random() < 0.8
+            sup = f"Supervisor {rnd.randrange(8)}"
+            tem_doc = tamanho_doc_kb > 0
+            linhas.append((
+                f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}",
+                cpf_valido(rnd), f"RA{n:08d}", "SIM" if rnd.random() < 0.12 else "NÃO", f"F{rnd.randrange(10, 99)}",
+                f"{rnd.randrange(1000, 9999):05d}-{rnd.randrange(1000):03d}", f"Rua {rnd.randrange(500)}, Bairro {rnd.randrange(40)}",
+                str(rnd.randrange(1, 3000)), "São Paulo - SP",
+                f"EE Escola {escola}", f"0{escola:04d}-000", f"Avenida {escola}, Centro", str(escola * 10), "São Paulo - SP",
+                rnd.choice(("SIM", "NÃO")), ", ".join(sorted(rnd.sample(DIAS, rnd.randint(2, 5)), key=DIAS.index)),
+                entrada, saida,
+                _documento(rnd, tamanho_doc_kb, docs_distintos, cache_docs, raiz) if tem_doc else None, "medico.pdf",
+                _documento(rnd, tamanho_doc_kb, docs_distintos, cache_docs, raiz) if tem_doc else None, "viagem.pdf",
+                "Pendente" if pendente else ("Aprovado" if aprovado else "Reprovado"),
+                None if pendente else sup, None if pendente else cpf_valido(rnd),
+                None if pendente else ("Aprovado" if aprovado else rnd.choice(MOTIVOS)),
+                None if pendente or not tem_doc else _documento(rnd, tamanho_doc_kb, docs_distintos, cache_docs, raiz),
+                None if pendente else "parecer.pdf",
+                None if pendente else str(data_sol + timedelta(hours=rnd.randrange(1, 240))),
+                f"Empresa {rnd.randrange(empresas)}" if aprovado else None,
+                str(data_sol),
+            ))
+        with pool.escrita() as w:
+            w.executemany(f"INSERT INTO solicitacoes ({', '.join(COLUNAS)}) VALUES ({', '.join('?' * len(COLUNAS))})",
+                          linhas)
+        inseridos += len(linhas)
+    return inseridos
+
+
+def preparar_banco(caminho):
+    pool = banco.PoolConexoes(caminho)
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+    return pool
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera solicitações sintéticas para benchmarks.")
+    parser.add_argument("--banco", default="bench_transporte.db")
+    parser.add_argument("--docs", default="bench_documentos", help="Pasta do armazém de documentos")
+    parser.add_argument("--registros", type=int, default=10000)
+    parser.add_argument("--tamanho-doc", type=int, default=50, help="Tamanho de cada documento em KB (0 = sem documentos)")
+    parser.add_argument("--docs-distintos", type=int, default=200,
+                        help="Quantidade de arquivos diferentes (0 = todos diferentes)")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    pool = preparar_banco(args.banco)
+    inicio = time.perf_counter()
+    total = gerar(pool, args.registros, args.tamanho_doc, args.docs_distintos, semente=args.semente, raiz=args.docs)
+    pool.fechar()
+    print(f"{total} solicitações geradas em {time.perf_counter() - inicio:.1f}s -> {args.banco}")
@@ -0,0 +1,81 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import autenticacao
+import banco
+import migracoes
+
+# ==========================================
+# BENCHMARK DE LOGIN (PICO DA MANHÃ)
+# ==========================================
+# Cadastra U usuários e dispara C logins simultâneos (verificação da senha
+# + criação da sessão), como na chegada das escolas às 7h. Mostra a vazão e
+# a latência para o custo de scrypt configurado (TRANSPORTE_SCRYPT_N).
+#
+#   TRANSPORTE_SCRYPT_N=16384 python benchmarks/login.py --usuarios 200 --simultaneos 32
+
+
+def _percentil(valores, p):
+    return statistics.quantiles(valores, n=100)[p - 1] if len(valores) > 1 else valores[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de logins simultâneos.")
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--simultaneos", type=int, default=32)
+    parser.add_argument("--logins", type=int, default=400, help="Total de logins no pico")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        pool = banco.PoolConexoes(os.path.join(pasta, "login.db"), max_leitores=args.simultaneos)
+        with pool.escrita(transacao=False) as conn:
+            migracoes.migrar(conn)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(os.cpu_count()) as executor:
+            hashes = list(executor.map(autenticacao.gerar_hash, (f"senha{i}" for i in range(args.usuarios))))
+        with pool.escrita() as w:
+            w.executemany("INSERT INTO usuarios (nome_completo, username, password, perfis) VALUES (?, ?, ?, 'Escola')",
+                          [(f"Escola {i}", f"escola{i}", h) for i, h in enumerate(hashes)])
+        print(f"{args.usuarios} usuários cadastrados em {time.perf_counter() - inicio:.1f}s "
+              f"(scrypt n={autenticacao.SCRYPT_N})")
+
+        latencias, falhas = [], []
+        proximo = iter(range(args.logins))
+        trava = threading.Lock()
+
+        def escola():
+            while True:
+                with trava:
+                    i = next(proximo, None)
+                if i is None:
+                    return
+                u = i % args.usuarios
+                t0 = time.perf_counter()
+                usuario = autenticacao.verificar_credenciais(pool, f"escola{u}", f"senha{u}")
+                if usuario is None:
+                    falhas.append(i)
+                    continue
+                token = autenticacao.criar_sessao(pool, usuario["username"], "Escola")
+                autenticacao.validar_sessao(pool, token)
+                latencias.append(time.perf_counter() - t0)
+
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=escola) for _ in range(args.simultaneos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        total = time.perf_counter() - inicio
+        pool.fechar()
+
+    print(f"{len(latencias)} logins em {total:.2f}s ({len(latencias) / total:.1f} logins/s), {len(falhas)} falhas")
+    print(f"p50 {_percentil(latencias, 50) * 1000:.1f} ms | p95 {_percentil(latencias, 95) * 1000:.1f} ms")
@@ -0,0 +1,143 @@
+import re
+import time
+
+import eventos
+import migracoes
+
+# ==========================================
+# BUSCA TEXTUAL (FTS5 / TSVECTOR)
+# ==========================================
+# Índice `busca_solicitacoes` (rowid = solicitacoes.id), mantido por
+# gatilhos. O tokenizador unicode61 com remove_diacritics ignora acentos
+# e maiúsculas ("joao" acha "João"); cada termo é buscado como prefixo
+# ("silv" acha "Silva"). CPF, RA e CEP também ficam indexados só com os
+# dígitos, então "123.456" e "123456" acham o mesmo CPF.
+#
+# Se nenhum registro tiver todos os termos, a busca repete exigindo
+# qualquer um deles (resultado aproximado, ainda ordenado por relevância).
+#
+# No PostgreSQL o índice é a coluna gerada `solicitacoes.busca` (tsvector
+# com índice GIN, sem acentos); a consulta equivalente usa to_tsquery com
+# prefixo (termo:*) e a ordem vem de ts_rank.
+#
+# Para refazer o índice (ex.: após restaurar um backup): python busca.py --banco ...
+
+# Pesos do bm25 por coluna do índice: nome, documentos, escola, empresa, endereço
+PESOS = (10.0, 8.0, 3.0, 2.0, 1.0)
+# Pesos do ts_rank (PostgreSQL) para os rótulos D, C, B, A da coluna busca:
+# empresa e endereço, escola, documentos, nome
+PESOS_PG = (0.1, 0.3, 0.8, 1.0)
+LIMITE_PADRAO = 20
+
+COLUNAS_RESULTADO = ("id", "nome_aluno", "cpf_aluno", "ra_aluno", "nome_escola", "empresa", "status",
+                     "reservado_por", "reserva_expira", "versao")
+
+# Condição de listagem.montar_filtros por dialeto (dados reconhece a busca por ela)
+CONDICOES = {
+    "sqlite": "id IN (SELECT rowid FROM busca_solicitacoes WHERE busca_solicitacoes MATCH ?)",
+    "postgres": "busca @@ to_tsquery('simple', ?)",
+}
+
+_TERMO = re.compile(r"\w+(?:[.\-/]\w+)*", re.UNICODE)
+
+
+def _termos(texto):
+    termos = []
+    for termo in _TERMO.findall(texto or ""):
+        # 123.456.789-09 / 01310-100 -> só dígitos, como está no índice
+        if any(ch.isdigit() for ch in termo):
+            termo = re.sub(r"[.\-/]", "", termo)
+        termos.extend(t for t in re.split(r"[.\-/]", termo) if t)
+    return termos
+
+
+_TABELA_ACENTOS = str.maketrans(*migracoes.ACENTOS)
+
+
+def _sem_acento(termo):
+    # Mesma normalização da coluna busca do PostgreSQL: lower(translate(...)) da função sem_acento
+    return termo.translate(_TABELA_ACENTOS).lower()
+
+
+def montar_consulta(texto, qualquer=False, dialeto="sqlite"):
+    """Texto do usuário -> expressão MATCH (ou tsquery) segura, com os termos como prefixo; None se vazio."""
+    termos = _termos(texto)
+    if not termos:
+        return None
+    if dialeto == "postgres":
+        return (" | " if qualquer else " & ").join(f"{_sem_acento(t)}:*" for t in termos)
+    return (" OR " if qualquer else " AND ").join(f'"{t}"*' for t in termos)
+
+
+def condicao(texto, dialeto="sqlite"):
+    """Condição para os filtros da listagem (listagem.montar_filtros); None se não houver termos."""
+    consulta = montar_consulta(texto, dialeto=dialeto)
+    if consulta is None:
+        return None
+    return CONDICOES[dialeto], consulta
+
+
+def _sql_busca(dialeto, filtro_status):
+    colunas = ", ".join("s." + c for c in COLUNAS_RESULTADO)
+    if dialeto == "postgres":
+        pesos = ", ".join(str(p) for p in PESOS_PG)
+        return (f"SELECT {colunas} FROM solicitacoes s, to_tsquery('simple', ?) q "
+                f"WHERE s.busca @@ q{filtro_status} "
+                f"ORDER BY ts_rank('{{{pesos}}}', s.busca, q) DESC, s.id LIMIT ?")
+    pesos = ", ".join(str(p) for p in PESOS)
+    return (f"SELECT {colunas} FROM busca_solicitacoes b JOIN solicitacoes s ON s.id = b.rowid "
+            f"WHERE busca_solicitacoes MATCH ?{filtro_status} "
+            f"ORDER BY bm25(busca_solicitacoes, {pesos}) LIMIT ?")
+
+
+def buscar(conn, texto, limite=LIMITE_PADRAO, status=None):
+    """Resultados ordenados por relevância: (linhas, aproximado, segundos)."""
+    inicio = time.perf_counter()
+    dialeto = getattr(conn, "dialeto", "sqlite")
+    sql = _sql_busca(dialeto, " AND s.status = ?" if status else " AND (s.status IS NULL OR s.status != ?)")
+    status = status or eventos.STATUS_EXCLUIDO
+    linhas, aproximado = [], False
+    for qualquer in (False, True):
+        consulta = montar_consulta(texto, qualquer, dialeto)
+        if consulta is None:
+            break
+        linhas = conn.execute(sql, (consulta, status, limite)).fetchall()
+        aproximado = qualquer
+        # Com um termo só, a busca "qualquer" é igual à primeira
+        if linhas or len(_termos(texto)) < 2:
+            break
+    return linhas, aproximado and bool(linhas), time.perf_counter() - inicio
+
+
+def reconstruir(pool):
+    """Refaz o índice inteiro a partir de solicitacoes (ex.: após restaurar um backup antigo)."""
+    if pool.dialeto == "postgres":
+        # Coluna gerada: sempre em dia; basta refazer o índice GIN
+        with pool.escrita(transacao=False) as w:
+            w.execute("REINDEX INDEX idx_solicitacoes_busca")
+        return
+    with pool.escrita() as w:
+        w.execute("DELETE FROM busca_solicitacoes")
+        w.execute(f"INSERT INTO busca_solicitacoes (rowid, {migracoes.COLUNAS_BUSCA}) "
+                  f"SELECT id, {migracoes.sql_busca()} FROM solicitacoes")
+        w.execute("INSERT INTO busca_solicitacoes (busca_solicitacoes) VALUES ('optimize')")
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    import banco
+
+    parser = argparse.ArgumentParser(description="Refaz o índice de busca a partir das solicitações.")
+    parser.add_argument("--banco", default=os.environ.get("TRANSPORTE_DB", "transporte_v4.db"),
+                        help="Arquivo SQLite ou postgresql://...")
+    args = parser.parse_args()
+
+    pool = banco.abrir(args.banco)
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+    inicio = time.perf_counter()
+    reconstruir(pool)
+    pool.fechar()
+    print(f"Índice de busca refeito em {time.perf_counter() - inicio:.1f}s.")
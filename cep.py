@@ -0,0 +1,187 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metricas
+
+# ==========================================
+# SERVIÇO DE CONSULTA DE CEP
+# ==========================================
+# Ordem de resolução: LRU em memória -> tabela cep_cache (com validade)
+# -> cliente HTTP (ViaCEP). CEPs inexistentes também ficam guardados
+# (cache negativo) por menos tempo. A base local carregada em lote fica
+# na mesma tabela, sem validade, e permite usar o formulário sem rede.
+
+VIACEP_URL = os.environ.get("TRANSPORTE_VIACEP_URL", "https://viacep.com.br/ws/{cep}/json/")
+TTL_ENCONTRADO = 30 * 24 * 3600
+TTL_INEXISTENTE = 24 * 3600
+CAMPOS_ENDERECO = ("cep", "logradouro", "bairro", "localidade", "uf")
+_UPSERT_CACHE = ("INSERT INTO cep_cache (cep, dados, expira_em) VALUES (?, ?, ?) "
+                 "ON CONFLICT (cep) DO UPDATE SET dados = excluded.dados, expira_em = excluded.expira_em")
+
+
+def normalizar_cep(cep):
+    if not cep:
+        return None
+    digitos = "".join(ch for ch in str(cep) if ch.isdigit())
+    return digitos if len(digitos) == 8 else None
+
+
+class ClienteViaCEP:
+    """Cliente HTTP padrão. Qualquer objeto com `consultar(cep)` pode substituí-lo."""
+
+    def __init__(self, url=VIACEP_URL, timeout=(2, 4), conexoes=10):
+        self.url = url
+        self.timeout = timeout
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=conexoes, pool_maxsize=conexoes, max_retries=1)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+
+    def consultar(self, cep):
+        # Devolve o dicionário do endereço, None se o CEP não existe, ou
+        # levanta requests.RequestException se o serviço estiver fora
+        resposta = self.sessao.get(self.url.format(cep=cep), timeout=self.timeout)
+        if resposta.status_code == 400:
+            return None
+        resposta.raise_for_status()
+        dados = resposta.json()
+        if "erro" in dados:
+            return None
+        return {campo: dados.get(campo, "") for campo in CAMPOS_ENDERECO}
+
+
+class ServicoCEP:
+    def __init__(self, pool, cliente=None, tamanho_lru=4096,
+                 ttl_encontrado=TTL_ENCONTRADO, ttl_inexistente=TTL_INEXISTENTE):
+        self.pool = pool
+        self.cliente = cliente if cliente is not None else ClienteViaCEP()
+        self.tamanho_lru = tamanho_lru
+        self.ttl_encontrado = ttl_encontrado
+        self.ttl_inexistente = ttl_inexistente
+        self._lru = OrderedDict()
+        self._trava = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cep")
+
+    # ---------- LRU em memória ----------
+    def _lru_get(self, cep):
+        with self._trava:
+            item = self._lru.get(cep)
+            if item is None:
+                return False, None
+            dados, expira_em = item
+            if expira_em is not None and expira_em < time.time():
+                del self._lru[cep]
+                return False, None
+            self._lru.move_to_end(cep)
+            return True, dados
+
+    def _lru_put(self, cep, dados, expira_em):
+        with self._trava:
+            self._lru[cep] = (dados, expira_em)
+            self._lru.move_to_end(cep)
+            while len(self._lru) > self.tamanho_lru:
+                self._lru.popitem(last=False)
+
+    # ---------- Tabela cep_cache ----------
+    def _tabela_get(self, cep):
+        with self.pool.leitura() as conn:
+            return conn.execute("SELECT dados, expira_em FROM cep_cache WHERE cep=?", (cep,)).fetchone()
+
+    def _tabela_put(self, cep, dados, expira_em):
+        with self.pool.escrita() as w:
+            w.execute(_UPSERT_CACHE, (cep, json.dumps(dados) if dados else None, expira_em))
+
+    def resolver(self, cep):
+        """Devolve o endereço do CEP (dict) ou None se inválido/inexistente/indisponível."""
+        cep = normalizar_cep(cep)
+        if cep is None:
+            return None
+        inicio = time.perf_counter()
+        origem, dados = self._resolver(cep)
+        metricas.registro.registrar("cep", origem, time.perf_counter() - inicio)
+        return dados
+
+    def _resolver(self, cep):
+        # Devolve (origem da resposta, dados); a origem nomeia a série em metricas
+        achou, dados = self._lru_get(cep)
+        if achou:
+            return "lru", dados
+
+        linha = self._tabela_get(cep)
+        if linha is not None and (linha["expira_em"] is None or linha["expira_em"] >= time.time()):
+            dados = json.loads(linha["dados"]) if linha["dados"] else None
+            self._lru_put(cep, dados, linha["expira_em"])
+            return "tabela", dados
+
+        try:
+            dados = self.cliente.consultar(cep)
+        except requests.RequestException:
+            # Sem rede: um registro vencido ainda é melhor que nada
+            if linha is not None and linha["dados"]:
+                return "sem rede", json.loads(linha["dados"])
+            return "sem rede", None
+
+        expira_em = time.time() + (self.ttl_encontrado if dados else self.ttl_inexistente)
+        self._tabela_put(cep, dados, expira_em)
+        self._lru_put(cep, dados, expira_em)
+        return "viacep", dados
+
+    def resolver_varios(self, ceps):
+        """Resolve vários CEPs em paralelo, preservando a ordem."""
+        return list(self._executor.map(self.resolver, ceps))
+
+    # ---------- Base local ----------
+    def carregar_base_local(self, caminho_csv, lote=5000):
+        """Carrega um CSV (cep;logradouro;bairro;localidade;uf) como base permanente."""
+        total = 0
+        with open(caminho_csv, newline="", encoding="utf-8") as arq:
+            dialeto = csv.Sniffer().sniff(arq.read(4096), delimiters=",;")
+            arq.seek(0)
+            leitor = csv.DictReader(arq, dialect=dialeto)
+            buffer = []
+            for linha in leitor:
+                cep = normalizar_cep(linha.get("cep"))
+                if cep is None:
+                    continue
+                dados = {campo: (linha.get(campo) or "").strip() for campo in CAMPOS_ENDERECO}
+                dados["cep"] = f"{cep[:5]}-{cep[5:]}"
+                buffer.append((cep, json.dumps(dados), None))
+                if len(buffer) >= lote:
+                    total += self._gravar_lote(buffer)
+                    buffer = []
+            if buffer:
+                total += self._gravar_lote(buffer)
+        with self._trava:
+            self._lru.clear()
+        return total
+
+    def _gravar_lote(self, linhas):
+        with self.pool.escrita() as w:
+            w.executemany(_UPSERT_CACHE, linhas)
+        return len(linhas)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import banco
+    import migracoes
+
+    parser = argparse.ArgumentParser(description="Carrega uma base local de CEPs (CSV) no banco.")
+    parser.add_argument("csv")
+    parser.add_argument("--banco", default="transporte_v4.db", help="Arquivo SQLite ou postgresql://...")
+    args = parser.parse_args()
+
+    pool = banco.abrir(args.banco)
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+    print(f"{ServicoCEP(pool).carregar_base_local(args.csv)} CEPs carregados.")
+    pool.fechar()
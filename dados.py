@@ -0,0 +1,195 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+import agenda
+import banco
+import busca
+import eventos
+import fila
+import listagem
+import migracoes
+import processamento
+
+# ==========================================
+# CONSULTAS DE LEITURA COM CACHE
+# ==========================================
+# Cada resultado fica guardado junto com a "geração" das tabelas/colunas
+# de que depende. O pool avisa, após cada commit, quais chaves foram
+# alteradas ("tabela" em INSERT/DELETE, "tabela.coluna" e "tabela.*" em
+# UPDATE); só os resultados que dependem delas deixam de valer (todos,
+# com a chave banco.INVALIDAR_TUDO). O TTL é uma rede de segurança para
+# escritas feitas fora deste processo.
+
+TTL_PADRAO = 300
+
+# Colunas de solicitacoes sem os BLOBs legados (os documentos ficam no armazém)
+COLUNAS_REGISTRO = """
+    id, nome_aluno, cpf_aluno, ra_aluno, cadeirante, cid,
+    cep_aluno, logradouro_aluno, numero_aluno, municipio_aluno,
+    nome_escola, cep_escola, logradouro_escola, numero_escola, municipio_escola,
+    sala_recurso, dias_frequencia, horario_entrada, horario_saida,
+    ref_arq_medico, nome_arq_medico, ref_arq_viagem, nome_arq_viagem,
+    status, supervisor_nome, supervisor_cpf, motivo_reprovacao,
+    ref_arq_assinado, nome_arq_assinado, data_atualizacao, empresa, data_solicitacao, versao
+"""
+
+
+class CacheConsultas:
+    def __init__(self, max_itens=512, ttl=TTL_PADRAO):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._geracoes = {}
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def invalidar(self, chaves):
+        with self._trava:
+            for chave in chaves:
+                self._geracoes[chave] = self._geracoes.get(chave, 0) + 1
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+    def obter(self, chave, dependencias, calcular, ttl=None):
+        with self._trava:
+            # Assinatura lida antes de calcular: se houver escrita durante o
+            # cálculo, o valor gravado já nasce vencido
+            assinatura = (self._geracoes.get(banco.INVALIDAR_TUDO, 0),
+                          *(self._geracoes.get(dep, 0) for dep in dependencias))
+            item = self._itens.get(chave)
+            if item is not None and item[0] == assinatura and item[1] > time.monotonic():
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return item[2]
+            self.faltas += 1
+
+        valor = calcular()
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._trava:
+            self._itens[chave] = (assinatura, expira, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return valor
+
+
+cache = CacheConsultas()
+
+
+def ligar_invalidacao(pool):
+    """Faz as escritas do pool invalidarem o cache (uma vez por pool)."""
+    if cache.invalidar not in pool.ouvintes_escrita:
+        pool.ouvintes_escrita.append(cache.invalidar)
+
+
+def depende(tabela, colunas=None):
+    """Chaves de dependência: a tabela (INSERT/DELETE) e as colunas lidas (ou todas: "*")."""
+    return (tabela, *(f"{tabela}.{col}" for col in (colunas or ("*",))))
+
+
+def _congelar(valor):
+    # Listas e dicts viram tuplas para compor a chave do cache
+    if isinstance(valor, (list, tuple)):
+        return tuple(_congelar(v) for v in valor)
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _congelar(v)) for k, v in valor.items()))
+    return valor
+
+
+def em_cache(dependencias, ttl=None):
+    """Decora funções `f(conn, *args)`; a conexão não entra na chave.
+
+    `dependencias` pode ser uma função dos mesmos argumentos (sem a conexão),
+    quando as chaves variam com a consulta.
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def consulta(conn, *args, **kwargs):
+            chave = (func.__qualname__, _congelar(args), _congelar(kwargs))
+            deps = dependencias(*args, **kwargs) if callable(dependencias) else dependencias
+            return cache.obter(chave, deps, lambda: func(conn, *args, **kwargs), ttl)
+        return consulta
+    return decorador
+
+
+# ---------- Relatórios ----------
+_DEP_LISTAGEM = depende("solicitacoes", listagem.COLUNAS_LISTAGEM)
+# Com busca textual o resultado também muda quando muda o que está indexado (CPF, endereço...)
+_DEP_LISTAGEM_BUSCA = _DEP_LISTAGEM + depende("solicitacoes", migracoes.COLUNAS_FONTE_BUSCA)
+
+
+def _dep_listagem(filtros, *_):
+    condicoes = filtros[0] if filtros else ()
+    return _DEP_LISTAGEM_BUSCA if any(c in busca.CONDICOES.values() for c in condicoes) else _DEP_LISTAGEM
+
+
+@em_cache(_dep_listagem)
+def listar_pagina(conn, filtros, ordem, decrescente, apos):
+    return listagem.listar_pagina(conn, filtros, ordem, decrescente, apos=apos)
+
+
+@em_cache(_dep_listagem)
+def contar(conn, filtros):
+    return listagem.contar(conn, filtros)
+
+
+@em_cache(depende("solicitacoes", ("nome_escola", "empresa")))
+def valores_distintos(conn, coluna):
+    return listagem.valores_distintos(conn, coluna)
+
+
+@em_cache(depende("solicitacoes"))
+def registro(conn, id_solicitacao):
+    return conn.execute(f"SELECT {COLUNAS_REGISTRO} FROM solicitacoes WHERE id=?", (id_solicitacao,)).fetchone()
+
+
+# ---------- Fila do supervisor ----------
+_DEP_FILA = depende("solicitacoes", ("status", "reservado_por", "reserva_expira", "versao",
+                                     "nome_aluno", "supervisor_nome", "data_atualizacao"))
+
+
+# TTL curto: as reservas também vencem com o passar do tempo, sem escrita
+@em_cache(_DEP_FILA, ttl=15)
+def metricas_fila(conn):
+    return fila.metricas(conn)
+
+
+@em_cache(_DEP_FILA, ttl=15)
+def minhas_reservas(conn, supervisor):
+    return fila.minhas_reservas(conn, supervisor)
+
+
+# ---------- Histórico e SLA ----------
+@em_cache(depende("eventos"))
+def historico(conn, id_solicitacao):
+    return eventos.historico(conn, id_solicitacao)
+
+
+# TTL: a janela de dias anda com o relógio
+@em_cache(depende("sla_diario"), ttl=600)
+def sla(conn, agrupar):
+    return eventos.sla(conn, agrupar)
+
+
+# ---------- Painel de frequência ----------
+@em_cache(depende("solicitacoes", ("status", "nome_escola", "empresa", "cadeirante", "dias_mask",
+                                   "entrada_min", "saida_min")))
+def contagens_agenda(conn, dimensoes, **filtros):
+    return agenda.contagens(conn, dimensoes, **filtros)
+
+
+# ---------- Documentos em processamento ----------
+@em_cache(depende("tarefas") + depende("documentos_info"))
+def situacao_documentos(conn, refs):
+    return processamento.situacao(conn, refs)
+
+
+# ---------- Usuários ----------
+@em_cache(depende("usuarios", ("nome_completo", "username", "perfis")))
+def listar_usuarios(conn):
+    return conn.execute("SELECT id, nome_completo, username, perfis FROM usuarios ORDER BY id").fetchall()
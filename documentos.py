@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+
+import metricas
+
+# ==========================================
+# ARMAZÉM DE DOCUMENTOS (ENDEREÇADO POR CONTEÚDO)
+# ==========================================
+# Os arquivos ficam em disco, nomeados pelo SHA-256 do conteúdo:
+#   documentos_v4/ab/cd/abcd...ef
+# Na tabela guardamos apenas a referência (o hash). Arquivos iguais
+# enviados mais de uma vez ocupam espaço uma única vez.
+DOCS_DIR = os.environ.get("TRANSPORTE_DOCS_DIR", "documentos_v4")
+TAMANHO_BLOCO = 1024 * 1024
+
+# Coluna BLOB antiga -> coluna com a referência no armazém
+COLUNAS_DOCUMENTOS = {
+    "arquivo_medico": "ref_arq_medico",
+    "arquivo_viagem": "ref_arq_viagem",
+    "arquivo_assinado": "ref_arq_assinado",
+}
+
+
+def caminho_documento(ref, raiz=DOCS_DIR):
+    return os.path.join(raiz, ref[:2], ref[2:4], ref)
+
+
+def _ler_blocos(origem):
+    if isinstance(origem, (bytes, bytearray, memoryview)):
+        yield bytes(origem)
+        return
+    if hasattr(origem, "seek"):
+        origem.seek(0)
+    while True:
+        bloco = origem.read(TAMANHO_BLOCO)
+        if not bloco:
+            break
+        yield bloco
+
+
+def salvar_documento(origem, raiz=DOCS_DIR):
+    """Grava bytes ou um arquivo aberto no armazém e devolve a referência (SHA-256)."""
+    tmp_dir = os.path.join(raiz, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    sha = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            for bloco in _ler_blocos(origem):
+                sha.update(bloco)
+                tmp.write(bloco)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+
+        ref = sha.hexdigest()
+        destino = caminho_documento(ref, raiz)
+        if os.path.exists(destino):
+            # Deduplicação: o conteúdo já está guardado
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(tmp_path, destino)
+        return ref
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def abrir_documento(ref, raiz=DOCS_DIR):
+    """Abre o documento para leitura em fluxo; devolve None se não existir."""
+    if not ref:
+        return None
+    try:
+        return open(caminho_documento(ref, raiz), "rb")
+    except FileNotFoundError:
+        return None
+
+
+def ler_documento(ref, raiz=DOCS_DIR):
+    with metricas.medir("documento", "ler") as medida:
+        arq = abrir_documento(ref, raiz)
+        if arq is None:
+            return None
+        with arq:
+            conteudo = arq.read()
+        medida.bytes = len(conteudo)
+    return conteudo
+
+
+# ==========================================
+# MIGRAÇÃO DOS BLOBS DO BANCO V4
+# ==========================================
+def _blob_para_armazem(conn, coluna, rowid, raiz):
+    # Lê o BLOB em fluxo direto do SQLite, sem carregá-lo inteiro na memória
+    with conn.blobopen("solicitacoes", coluna, rowid, readonly=True) as blob:
+        return salvar_documento(blob, raiz)
+
+
+def migrar_blobs(conn, raiz=DOCS_DIR, lote=50, vacuum=False, progresso=None):
+    """Move os BLOBs de `solicitacoes` para o armazém, em lotes curtos.
+
+    Cada lote é uma transação própria, então o app pode continuar em uso
+    durante a migração. Pode ser executada de novo com segurança.
+    As colunas ref_arq_* precisam existir (migracoes.migrar).
+    """
+    filtro = " OR ".join(f"length({col}) > 0" for col in COLUNAS_DOCUMENTOS)
+    colunas_len = ", ".join(f"length({col})" for col in COLUNAS_DOCUMENTOS)
+    ultimo_id = 0
+    migrados = 0
+
+    while True:
+        linhas = conn.execute(
+            f"SELECT id, {colunas_len} FROM solicitacoes "
+            f"WHERE id > ? AND ({filtro}) ORDER BY id LIMIT ?",
+            (ultimo_id, lote),
+        ).fetchall()
+        if not linhas:
+            break
+
+        for linha in linhas:
+            rowid = linha[0]
+            sets, valores = [], []
+            for i, (coluna, coluna_ref) in enumerate(COLUNAS_DOCUMENTOS.items(), start=1):
+                if linha[i]:
+                    ref = _blob_para_armazem(conn, coluna, rowid, raiz)
+                    sets.append(f"{coluna_ref}=?, {coluna}=NULL")
+                    valores.append(ref)
+            conn.execute(f"UPDATE solicitacoes SET {', '.join(sets)} WHERE id=?", (*valores, rowid))
+            ultimo_id = rowid
+            migrados += 1
+
+        conn.commit()
+        if progresso:
+            progresso(migrados, ultimo_id)
+
+    if vacuum:
+        # Devolve ao sistema o espaço ocupado pelos BLOBs removidos
+        conn.execute("VACUUM")
+    return migrados
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Move os documentos do banco para o armazém em disco.")
+    parser.add_argument("banco", nargs="?", default="transporte_v4.db")
+    parser.add_argument("--docs", default=DOCS_DIR, help="Pasta do armazém de documentos")
+    parser.add_argument("--lote", type=int, default=50, help="Registros por transação")
+    parser.add_argument("--vacuum", action="store_true", help="Compactar o banco ao final")
+    args = parser.parse_args()
+
+    import migracoes
+
+    conexao = sqlite3.connect(args.banco)
+    migracoes.migrar(conexao)
+    total = migrar_blobs(
+        conexao, raiz=args.docs, lote=args.lote, vacuum=args.vacuum,
+        progresso=lambda n, ult: print(f"{n} registros migrados (último id {ult})"),
+    )
+    conexao.close()
+    print(f"Concluído: {total} registros migrados.")
@@ -0,0 +1,209 @@
+import json
+import time
+from datetime import datetime
+
+# ==========================================
+# HISTÓRICO DE EVENTOS E MÉTRICAS DE SLA
+# ==========================================
+# Toda mudança de estado de uma solicitação vira uma linha em `eventos`
+# (somente inclusão: gatilhos recusam UPDATE e DELETE). A codificação é
+# compacta: tipo como inteiro, instante em segundos (REAL) e, em `dados`,
+# um JSON só com os campos que mudaram, de chaves curtas.
+#
+# `seq` é crescente e serve de cursor para o feed de mudanças: quem
+# sincroniza guarda o último seq recebido e pede só o que veio depois.
+#
+# A criação é registrada por gatilho (cobre formulário e importação); os
+# demais eventos são gravados por quem altera, na mesma transação, com o
+# autor. Cada decisão do supervisor também acumula o tempo envio -> decisão
+# em `sla_diario` (por dia, supervisor e escola), já agregado para o painel.
+
+CRIADA = 1
+RESERVADA = 2
+LIBERADA = 3
+DECIDIDA = 4
+EDITADA = 5
+EXCLUIDA = 6
+RESTAURADA = 7
+
+NOMES = {
+    CRIADA: "criada", RESERVADA: "reservada", LIBERADA: "liberada", DECIDIDA: "decidida",
+    EDITADA: "editada", EXCLUIDA: "excluida", RESTAURADA: "restaurada",
+}
+
+STATUS_EXCLUIDO = "Excluído"
+PRAZO_SLA_HORAS = 72
+LIMITE_FEED = 1000
+
+
+def _compactar(dados):
+    dados = {k: v for k, v in (dados or {}).items() if v is not None}
+    if not dados:
+        return None
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def registrar(w, id_solicitacao, tipo, autor=None, dados=None, em=None):
+    """Acrescenta um evento usando a conexão de escrita `w` (na transação de quem chama)."""
+    w.execute("INSERT INTO eventos (solicitacao_id, tipo, em, autor, dados) VALUES (?, ?, ?, ?, ?)",
+              (id_solicitacao, tipo, time.time() if em is None else em, autor, _compactar(dados)))
+
+
+def registrar_varios(w, ids, tipo, autor=None, dados=None):
+    agora = time.time()
+    compacto = _compactar(dados)
+    w.executemany("INSERT INTO eventos (solicitacao_id, tipo, em, autor, dados) VALUES (?, ?, ?, ?, ?)",
+                  [(i, tipo, agora, autor, compacto) for i in ids])
+
+
+def registrar_decisao(w, id_solicitacao, autor, status, supervisor_nome, motivo=None):
+    """Evento de decisão + acumulado de SLA (tempo desde a criação)."""
+    agora = time.time()
+    registrar(w, id_solicitacao, DECIDIDA, autor, {"st": status, "sup": supervisor_nome, "mot": motivo}, em=agora)
+    linha = w.execute(
+        "SELECT s.nome_escola, (SELECT MIN(em) FROM eventos WHERE solicitacao_id = s.id AND tipo = ?) AS criada_em "
+        "FROM solicitacoes s WHERE s.id = ?", (CRIADA, id_solicitacao)
+    ).fetchone()
+    if linha is None or linha["criada_em"] is None or linha["criada_em"] > agora:
+        # Sem criação conhecida (ou registrada depois, em dados migrados): fora do SLA
+        return
+    _acumular_sla(w, agora, supervisor_nome, linha["nome_escola"], status, (agora - linha["criada_em"]) / 3600)
+
+
+def _acumular_sla(w, em, supervisor, escola, status, horas):
+    w.execute(
+        '''INSERT INTO sla_diario (dia, supervisor, escola, decididas, aprovadas, no_prazo, soma_horas, max_horas)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+        ON CONFLICT (dia, supervisor, escola) DO UPDATE SET
+            decididas = sla_diario.decididas + 1,
+            aprovadas = sla_diario.aprovadas + excluded.aprovadas,
+            no_prazo = sla_diario.no_prazo + excluded.no_prazo,
+            soma_horas = sla_diario.soma_horas + excluded.soma_horas,
+            max_horas = CASE WHEN excluded.max_horas > sla_diario.max_horas
+                             THEN excluded.max_horas ELSE sla_diario.max_horas END''',
+        (datetime.fromtimestamp(em).strftime("%Y-%m-%d"), supervisor or "", escola or "",
+         int(status == "Aprovado"), int(horas <= PRAZO_SLA_HORAS), horas, horas),
+    )
+
+
+def recalcular_sla(w):
+    """Refaz `sla_diario` a partir dos eventos (ex.: depois de mudar PRAZO_SLA_HORAS)."""
+    # Agregado em Python: o dia local e o JSON são lidos como em _acumular_sla,
+    # igual em qualquer banco
+    dias = {}
+    for em, dados, escola, criada_em in w.execute(
+        '''SELECT d.em, d.dados, s.nome_escola, c.em
+        FROM eventos d
+        JOIN (SELECT solicitacao_id, MIN(em) AS em FROM eventos WHERE tipo = ? GROUP BY solicitacao_id) c
+            ON c.solicitacao_id = d.solicitacao_id
+        JOIN solicitacoes s ON s.id = d.solicitacao_id
+        WHERE d.tipo = ?''',
+        (CRIADA, DECIDIDA),
+    ):
+        if criada_em > em:
+            # Criação depois da decisão (histórico antigo reconstruído): duração sem sentido
+            continue
+        decisao = json.loads(dados) if dados else {}
+        horas = (em - criada_em) / 3600
+        chave = (datetime.fromtimestamp(em).strftime("%Y-%m-%d"), decisao.get("sup") or "", escola or "")
+        soma = dias.setdefault(chave, [0, 0, 0, 0.0, horas])
+        soma[0] += 1
+        soma[1] += decisao.get("st") == "Aprovado"
+        soma[2] += horas <= PRAZO_SLA_HORAS
+        soma[3] += horas
+        soma[4] = max(soma[4], horas)
+    w.execute("DELETE FROM sla_diario")
+    w.executemany("INSERT INTO sla_diario (dia, supervisor, escola, decididas, aprovadas, no_prazo, soma_horas, "
+                  "max_horas) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(*chave, *soma) for chave, soma in dias.items()])
+
+
+# ---------- Feed de mudanças ----------
+def _decodificar(linha):
+    return {
+        "seq": linha["seq"],
+        "solicitacao_id": linha["solicitacao_id"],
+        "tipo": NOMES.get(linha["tipo"], str(linha["tipo"])),
+        "em": datetime.fromtimestamp(linha["em"]).isoformat(timespec="seconds"),
+        "autor": linha["autor"],
+        "dados": json.loads(linha["dados"]) if linha["dados"] else {},
+    }
+
+
+def desde(conn, cursor=0, limite=LIMITE_FEED):
+    """Eventos com seq > cursor, em ordem. Devolve (eventos, novo_cursor); repita até vir vazio."""
+    linhas = conn.execute("SELECT seq, solicitacao_id, tipo, em, autor, dados FROM eventos WHERE seq > ? "
+                          "ORDER BY seq LIMIT ?", (cursor, limite)).fetchall()
+    return [_decodificar(linha) for linha in linhas], (linhas[-1]["seq"] if linhas else cursor)
+
+
+def ids_alterados(conn, cursor=0):
+    """Solicitações com algum evento depois do cursor (para reler só o que mudou). Devolve (ids, novo_cursor)."""
+    linha = conn.execute("SELECT MAX(seq) FROM eventos WHERE seq > ?", (cursor,)).fetchone()
+    if linha[0] is None:
+        return [], cursor
+    ids = [r[0] for r in conn.execute("SELECT DISTINCT solicitacao_id FROM eventos WHERE seq > ? AND seq <= ?",
+                                      (cursor, linha[0]))]
+    return ids, linha[0]
+
+
+def historico(conn, id_solicitacao):
+    linhas = conn.execute("SELECT seq, solicitacao_id, tipo, em, autor, dados FROM eventos "
+                          "WHERE solicitacao_id = ? ORDER BY seq", (id_solicitacao,)).fetchall()
+    return [_decodificar(linha) for linha in linhas]
+
+
+# ---------- SLA ----------
+def sla(conn, agrupar="supervisor", dias=30):
+    """Tempo envio -> decisão por supervisor ou escola, nos últimos `dias`, a partir de sla_diario."""
+    if agrupar not in ("supervisor", "escola"):
+        raise ValueError(f"Agrupamento inválido: {agrupar}")
+    inicio = datetime.fromtimestamp(time.time() - dias * 86400).strftime("%Y-%m-%d")
+    linhas = conn.execute(
+        f'''SELECT {agrupar}, SUM(decididas) AS decididas, SUM(aprovadas) AS aprovadas, SUM(no_prazo) AS no_prazo,
+               SUM(soma_horas) AS soma_horas, MAX(max_horas) AS horas_max
+        FROM sla_diario WHERE dia >= ? GROUP BY {agrupar} ORDER BY decididas DESC''', (inicio,))
+    # Arredondamento feito aqui: ROUND(REAL) não existe em todos os bancos
+    return [{agrupar: r[agrupar], "decididas": r["decididas"], "aprovadas": r["aprovadas"],
+             "pct_no_prazo": round(100.0 * r["no_prazo"] / r["decididas"], 1),
+             "horas_media": round(r["soma_horas"] / r["decididas"], 1), "horas_max": round(r["horas_max"], 1)}
+            for r in linhas]
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import sys
+
+    import banco
+    import migracoes
+
+    parser = argparse.ArgumentParser(description="Feed de mudanças: imprime os eventos depois do cursor (JSON por linha).")
+    parser.add_argument("--banco", default=os.environ.get("TRANSPORTE_DB", "transporte_v4.db"),
+                        help="Arquivo SQLite ou postgresql://...")
+    parser.add_argument("--desde", type=int, default=0, help="Último seq já recebido")
+    parser.add_argument("--ids", action="store_true", help="Só os ids das solicitações alteradas (um por linha)")
+    parser.add_argument("--recalcular-sla", action="store_true")
+    args = parser.parse_args()
+
+    pool = banco.abrir(args.banco)
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+    if args.recalcular_sla:
+        with pool.escrita() as w:
+            recalcular_sla(w)
+    cursor = args.desde
+    if args.ids:
+        with pool.leitura() as conn:
+            ids, cursor = ids_alterados(conn, cursor)
+        for id_sol in ids:
+            sys.stdout.write(f"{id_sol}\n")
+    else:
+        while True:
+            with pool.leitura() as conn:
+                lote, cursor = desde(conn, cursor)
+            if not lote:
+                break
+            for evento in lote:
+                sys.stdout.write(json.dumps(evento, ensure_ascii=False) + "\n")
+    pool.fechar()
+    print(f"cursor={cursor}", file=sys.stderr)
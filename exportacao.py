@@ -0,0 +1,171 @@
+import csv
+import io
+import os
+import shutil
+import zipfile
+
+import documentos
+
+# ==========================================
+# EXPORTAÇÃO EM FLUXO (TABELA + ZIP DE DOCUMENTOS)
+# ==========================================
+# As linhas saem do SQLite em lotes por id (sem transação longa) e são
+# escritas direto no destino. Os documentos são copiados do armazém para
+# o ZIP em blocos: nada da exportação fica inteiro na memória.
+
+LOTE_LEITURA = 2000
+
+COLUNAS_EXPORTACAO = (
+    "id", "nome_aluno", "cpf_aluno", "ra_aluno", "cadeirante", "cid",
+    "cep_aluno", "logradouro_aluno", "numero_aluno", "municipio_aluno",
+    "nome_escola", "cep_escola", "logradouro_escola", "numero_escola", "municipio_escola",
+    "sala_recurso", "dias_frequencia", "horario_entrada", "horario_saida",
+    "status", "empresa", "supervisor_nome", "supervisor_cpf", "motivo_reprovacao",
+    "data_solicitacao", "data_atualizacao",
+    "nome_arq_medico", "nome_arq_viagem", "nome_arq_assinado",
+)
+
+# Pasta dentro do ZIP -> (coluna de referência, coluna com o nome original)
+DOCUMENTOS_EXPORTACAO = {
+    "medico": ("ref_arq_medico", "nome_arq_medico"),
+    "viagem": ("ref_arq_viagem", "nome_arq_viagem"),
+    "assinado": ("ref_arq_assinado", "nome_arq_assinado"),
+}
+
+FORMATOS = ("csv", "xlsx", "parquet")
+
+
+def iterar_lotes(pool, filtros=None, colunas=COLUNAS_EXPORTACAO, lote=LOTE_LEITURA):
+    """Gera listas de linhas filtradas, em ordem de id, `lote` por vez."""
+    condicoes, params = filtros or ([], [])
+    ultimo_id = 0
+    while True:
+        where = " AND ".join(["id > ?", *condicoes])
+        with pool.leitura() as conn:
+            linhas = conn.execute(
+                f"SELECT {', '.join(colunas)} FROM solicitacoes WHERE {where} ORDER BY id LIMIT ?",
+                (ultimo_id, *params, lote),
+            ).fetchall()
+        if not linhas:
+            return
+        yield linhas
+        ultimo_id = linhas[-1]["id"]
+
+
+# ---------- Tabela ----------
+def _escrever_csv(destino, lotes):
+    texto = io.TextIOWrapper(destino, encoding="utf-8-sig", newline="", write_through=True)
+    escritor = csv.writer(texto, delimiter=";")
+    escritor.writerow(COLUNAS_EXPORTACAO)
+    total = 0
+    for linhas in lotes:
+        escritor.writerows(tuple(linha) for linha in linhas)
+        total += len(linhas)
+    texto.flush()
+    texto.detach()
+    return total
+
+
+def _escrever_xlsx(destino, lotes):
+    try:
+        import openpyxl
+    except ImportError:
+        raise RuntimeError("Para exportar .xlsx instale o pacote openpyxl") from None
+
+    # write_only grava as linhas em arquivo temporário, não em memória
+    planilha = openpyxl.Workbook(write_only=True)
+    aba = planilha.create_sheet("solicitacoes")
+    aba.append(COLUNAS_EXPORTACAO)
+    total = 0
+    for linhas in lotes:
+        for linha in linhas:
+            aba.append(tuple(linha))
+        total += len(linhas)
+    planilha.save(destino)
+    return total
+
+
+def _escrever_parquet(destino, lotes):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Para exportar .parquet instale o pacote pyarrow") from None
+
+    esquema = pa.schema([(col, pa.int64() if col == "id" else pa.string()) for col in COLUNAS_EXPORTACAO])
+    total = 0
+    with pq.ParquetWriter(destino, esquema, compression="zstd") as escritor:
+        for linhas in lotes:
+            colunas = list(zip(*linhas))
+            dados = [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, esquema)]
+            escritor.write_table(pa.Table.from_arrays(dados, schema=esquema))
+            total += len(linhas)
+    return total
+
+
+def exportar_tabela(pool, destino, formato="csv", filtros=None):
+    """Escreve os registros filtrados em `destino` (arquivo binário aberto) e devolve quantos foram."""
+    escritores = {"csv": _escrever_csv, "xlsx": _escrever_xlsx, "parquet": _escrever_parquet}
+    if formato not in escritores:
+        raise ValueError(f"Formato não suportado: {formato}")
+    return escritores[formato](destino, iterar_lotes(pool, filtros))
+
+
+# ---------- Documentos ----------
+def exportar_documentos_zip(pool, destino, filtros=None, progresso=None):
+    """Escreve em `destino` um ZIP com os documentos dos registros filtrados.
+
+    Estrutura: <id>/<tipo>_<nome original>. Os PDFs e imagens já vêm
+    comprimidos, então são apenas armazenados (ZIP_STORED). Devolve o
+    número de arquivos incluídos.
+    """
+    colunas = ("id", *(col for par in DOCUMENTOS_EXPORTACAO.values() for col in par))
+    arquivos = 0
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for linhas in iterar_lotes(pool, filtros, colunas=colunas, lote=500):
+            for linha in linhas:
+                for tipo, (col_ref, col_nome) in DOCUMENTOS_EXPORTACAO.items():
+                    origem = documentos.abrir_documento(linha[col_ref])
+                    if origem is None:
+                        continue
+                    nome = os.path.basename(linha[col_nome] or f"{tipo}.pdf")
+                    info = zipfile.ZipInfo(f"{linha['id']}/{tipo}_{nome}")
+                    with origem, zf.open(info, "w", force_zip64=True) as saida:
+                        shutil.copyfileobj(origem, saida, documentos.TAMANHO_BLOCO)
+                    arquivos += 1
+            if progresso:
+                progresso(arquivos, linhas[-1]["id"])
+    return arquivos
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import banco
+    import listagem
+
+    parser = argparse.ArgumentParser(description="Exporta solicitações filtradas e seus documentos.")
+    parser.add_argument("saida", help="Pasta de destino")
+    parser.add_argument("--banco", default="transporte_v4.db", help="Arquivo SQLite ou postgresql://...")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--status")
+    parser.add_argument("--escola")
+    parser.add_argument("--empresa")
+    parser.add_argument("--documentos", action="store_true", help="Gera também o ZIP de documentos")
+    args = parser.parse_args()
+
+    pool = banco.abrir(args.banco)
+    filtros = listagem.montar_filtros(status=args.status, escola=args.escola, empresa=args.empresa)
+    os.makedirs(args.saida, exist_ok=True)
+
+    caminho = os.path.join(args.saida, f"solicitacoes.{args.formato}")
+    with open(caminho, "wb") as arq:
+        print(f"{exportar_tabela(pool, arq, args.formato, filtros)} registros -> {caminho}")
+
+    if args.documentos:
+        caminho = os.path.join(args.saida, "documentos.zip")
+        with open(caminho, "wb") as arq:
+            total = exportar_documentos_zip(pool, arq, filtros,
+                                            progresso=lambda n, ult: print(f"{n} arquivos (até o id {ult})"))
+        print(f"{total} documentos -> {caminho}")
+    pool.fechar()
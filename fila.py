@@ -0,0 +1,141 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import eventos
+
+# ==========================================
+# FILA DO SUPERVISOR (RESERVA COM PRAZO)
+# ==========================================
+# Cada supervisor reserva as próximas N pendentes por um prazo. A reserva
+# é um único UPDATE ... RETURNING feito pelo escritor, então dois
+# supervisores nunca recebem o mesmo registro. A decisão final só é gravada
+# se a `versao` do registro ainda for a da reserva; se a reserva venceu e
+# outra pessoa pegou o registro (ou alguém o editou), a gravação é recusada.
+
+DURACAO_RESERVA = 15 * 60
+TEM_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+class ConflitoVersao(Exception):
+    pass
+
+
+def _disponivel_sql():
+    return "status = 'Pendente' AND (reservado_por IS NULL OR reserva_expira < ?)"
+
+
+def reservar(pool, supervisor, quantidade=5, duracao=DURACAO_RESERVA):
+    """Reserva até `quantidade` pendentes (as mais antigas) e devolve [(id, nome_aluno, versao)]."""
+    agora = time.time()
+    expira = agora + duracao
+    with pool.escrita() as w:
+        if TEM_RETURNING:
+            linhas = w.execute(
+                f'''UPDATE solicitacoes SET reservado_por = ?, reserva_expira = ?, versao = versao + 1
+                WHERE id IN (SELECT id FROM solicitacoes WHERE {_disponivel_sql()} ORDER BY id LIMIT ?)
+                RETURNING id, nome_aluno, versao''',
+                (supervisor, expira, agora, quantidade),
+            ).fetchall()
+        else:
+            # SQLite antigo: a mesma operação, protegida pelo BEGIN IMMEDIATE do escritor
+            ids = [r[0] for r in w.execute(
+                f"SELECT id FROM solicitacoes WHERE {_disponivel_sql()} ORDER BY id LIMIT ?",
+                (agora, quantidade))]
+            w.executemany("UPDATE solicitacoes SET reservado_por = ?, reserva_expira = ?, versao = versao + 1 WHERE id = ?",
+                          [(supervisor, expira, i) for i in ids])
+            marcadores = ",".join("?" * len(ids))
+            linhas = w.execute(f"SELECT id, nome_aluno, versao FROM solicitacoes WHERE id IN ({marcadores})",
+                               ids).fetchall() if ids else []
+        eventos.registrar_varios(w, [linha[0] for linha in linhas], eventos.RESERVADA, supervisor)
+    return sorted((tuple(linha) for linha in linhas), key=lambda linha: linha[0])
+
+
+def reservar_id(pool, id_solicitacao, supervisor, duracao=DURACAO_RESERVA):
+    """Reserva uma pendente específica (ex.: achada pela busca). Devolve False se outra pessoa a tiver."""
+    agora = time.time()
+    with pool.escrita() as w:
+        reservou = w.execute(
+            f"UPDATE solicitacoes SET reservado_por = ?, reserva_expira = ?, versao = versao + 1 "
+            f"WHERE id = ? AND ({_disponivel_sql()} OR (status = 'Pendente' AND reservado_por = ?))",
+            (supervisor, agora + duracao, id_solicitacao, agora, supervisor),
+        ).rowcount > 0
+        if reservou:
+            eventos.registrar(w, id_solicitacao, eventos.RESERVADA, supervisor)
+    return reservou
+
+
+def minhas_reservas(conn, supervisor):
+    return conn.execute(
+        "SELECT id, nome_aluno, versao, reserva_expira FROM solicitacoes "
+        "WHERE status = 'Pendente' AND reservado_por = ? AND reserva_expira >= ? ORDER BY id",
+        (supervisor, time.time()),
+    ).fetchall()
+
+
+def renovar(pool, supervisor, duracao=DURACAO_RESERVA):
+    """Estende o prazo de todas as reservas ainda válidas do supervisor."""
+    agora = time.time()
+    with pool.escrita() as w:
+        return w.execute(
+            "UPDATE solicitacoes SET reserva_expira = ? "
+            "WHERE status = 'Pendente' AND reservado_por = ? AND reserva_expira >= ?",
+            (agora + duracao, supervisor, agora),
+        ).rowcount
+
+
+def liberar(pool, id_solicitacao, supervisor):
+    with pool.escrita() as w:
+        if w.execute("UPDATE solicitacoes SET reservado_por = NULL, reserva_expira = NULL "
+                     "WHERE id = ? AND reservado_por = ?", (id_solicitacao, supervisor)).rowcount:
+            eventos.registrar(w, id_solicitacao, eventos.LIBERADA, supervisor)
+
+
+def expirar_reservas(pool):
+    """Limpa reservas vencidas (abandonadas); chamada antes de o supervisor pegar novas.
+
+    A reserva e as métricas já ignoram as vencidas; isto tira das telas o
+    "em análise por" de quem abandonou a fila.
+    """
+    with pool.escrita() as w:
+        return w.execute("UPDATE solicitacoes SET reservado_por = NULL, reserva_expira = NULL "
+                         "WHERE reservado_por IS NOT NULL AND reserva_expira < ?", (time.time(),)).rowcount
+
+
+def finalizar(pool, id_solicitacao, versao, supervisor, status, nome_sup, cpf_sup, motivo, ref_ass, nome_ass):
+    """Grava a decisão se o registro ainda estiver na versão reservada; senão levanta ConflitoVersao."""
+    with pool.escrita() as w:
+        cur = w.execute(
+            '''UPDATE solicitacoes SET
+                status=?, supervisor_nome=?, supervisor_cpf=?, motivo_reprovacao=?,
+                ref_arq_assinado=?, nome_arq_assinado=?, data_atualizacao=?,
+                versao = versao + 1, reservado_por = NULL, reserva_expira = NULL
+            WHERE id=? AND versao=? AND status='Pendente' AND (reservado_por IS NULL OR reservado_por=?)''',
+            (status, nome_sup, cpf_sup, motivo, ref_ass, nome_ass, str(datetime.now()),
+             id_solicitacao, versao, supervisor),
+        )
+        if cur.rowcount == 0:
+            raise ConflitoVersao(f"A solicitação {id_solicitacao} foi alterada ou reservada por outra pessoa.")
+        eventos.registrar_decisao(w, id_solicitacao, supervisor, status, nome_sup, motivo)
+
+
+def metricas(conn, janela_horas=24):
+    """Profundidade da fila e vazão recente (decisões por supervisor na janela)."""
+    agora = time.time()
+    desde = str(datetime.now() - timedelta(hours=janela_horas))
+    pendentes, reservadas = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(CASE WHEN reservado_por IS NOT NULL AND reserva_expira >= ? THEN 1 ELSE 0 END), 0) "
+        "FROM solicitacoes WHERE status = 'Pendente'", (agora,)
+    ).fetchone()
+    por_supervisor = conn.execute(
+        "SELECT supervisor_nome, COUNT(*) AS decididas FROM solicitacoes "
+        "WHERE status IN ('Aprovado', 'Reprovado') AND data_atualizacao >= ? "
+        "GROUP BY supervisor_nome ORDER BY decididas DESC", (desde,)
+    ).fetchall()
+    return {
+        "pendentes": pendentes,
+        "reservadas": reservadas,
+        "disponiveis": pendentes - reservadas,
+        "decididas": sum(r["decididas"] for r in por_supervisor),
+        "por_supervisor": por_supervisor,
+    }
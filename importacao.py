@@ -0,0 +1,256 @@
+import csv
+import io
+import time
+from datetime import datetime
+
+import cep as cep_mod
+
+# ==========================================
+# IMPORTAÇÃO EM LOTE DE SOLICITAÇÕES (CSV / XLSX)
+# ==========================================
+# O arquivo é lido em blocos; cada bloco é validado, tem os endereços
+# resolvidos pelos CEPs distintos e é gravado com um único executemany
+# numa transação. Linhas inválidas não interrompem a importação: vão para
+# o relatório de erros com o número da linha no arquivo.
+
+TAMANHO_BLOCO = 5000
+
+# Colunas aceitas no arquivo (cabeçalho = nome da coluna em solicitacoes)
+COLUNAS_IMPORTACAO = (
+    "nome_aluno", "cpf_aluno", "ra_aluno", "cadeirante", "cid",
+    "cep_aluno", "logradouro_aluno", "numero_aluno", "municipio_aluno",
+    "nome_escola", "cep_escola", "logradouro_escola", "numero_escola", "municipio_escola",
+    "sala_recurso", "dias_frequencia", "horario_entrada", "horario_saida", "empresa",
+)
+OBRIGATORIAS = ("nome_aluno", "cpf_aluno", "ra_aluno")
+
+INSERT_IMPORTACAO = (
+    f"INSERT INTO solicitacoes ({', '.join(COLUNAS_IMPORTACAO)}, status, data_solicitacao) "
+    f"VALUES ({', '.join('?' for _ in COLUNAS_IMPORTACAO)}, 'Pendente', ?)"
+)
+
+
+# ---------- Validações ----------
+def validar_cpf(cpf):
+    if isinstance(cpf, (int, float)):
+        # Planilhas costumam guardar o CPF como número e perder os zeros à esquerda
+        cpf = str(int(cpf)).zfill(11)
+    digitos = "".join(ch for ch in str(cpf) if ch.isdigit())
+    if len(digitos) != 11 or digitos == digitos[0] * 11:
+        return None
+    for tamanho in (9, 10):
+        soma = sum(int(d) * peso for d, peso in zip(digitos[:tamanho], range(tamanho + 1, 1, -1)))
+        dv = (soma * 10) % 11 % 10
+        if dv != int(digitos[tamanho]):
+            return None
+    return digitos
+
+
+def validar_ra(ra):
+    ra = str(ra).strip()
+    return ra if ra and all(ch.isalnum() or ch in "-./" for ch in ra) else None
+
+
+def _normalizar_horario(valor):
+    # Mesmo formato gravado pelo formulário (str(datetime.time)): HH:MM:SS
+    valor = (valor or "").strip()
+    if not valor:
+        return None
+    partes = valor.split(":")
+    if len(partes) == 2:
+        valor += ":00"
+    datetime.strptime(valor, "%H:%M:%S")
+    return valor
+
+
+def _texto(valor):
+    # Células numéricas do XLSX chegam como float: 12345.0 -> "12345"
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return "" if valor is None else str(valor).strip()
+
+
+def _sim_nao(valor):
+    return "SIM" if str(valor or "").strip().upper() in ("SIM", "S", "1", "TRUE") else "NÃO"
+
+
+def validar_linha(linha):
+    """Devolve (registro_normalizado, lista_de_erros)."""
+    erros = []
+    cpf_original = linha.get("cpf_aluno")
+    reg = {col: _texto(linha.get(col)) for col in COLUNAS_IMPORTACAO}
+
+    for col in OBRIGATORIAS:
+        if not reg[col]:
+            erros.append(f"{col}: obrigatório")
+
+    if reg["cpf_aluno"]:
+        cpf = validar_cpf(cpf_original)
+        if cpf is None:
+            erros.append("cpf_aluno: CPF inválido")
+        reg["cpf_aluno"] = cpf or reg["cpf_aluno"]
+    if reg["ra_aluno"] and validar_ra(reg["ra_aluno"]) is None:
+        erros.append("ra_aluno: RA inválido")
+
+    for col in ("cep_aluno", "cep_escola"):
+        if reg[col]:
+            if isinstance(linha.get(col), (int, float)):
+                # Como no CPF: o número perde o zero à esquerda (01310-100 -> 1310100)
+                reg[col] = reg[col].zfill(8)
+            normalizado = cep_mod.normalizar_cep(reg[col])
+            if normalizado is None:
+                erros.append(f"{col}: CEP inválido")
+            else:
+                reg[col] = f"{normalizado[:5]}-{normalizado[5:]}"
+
+    for col in ("horario_entrada", "horario_saida"):
+        try:
+            reg[col] = _normalizar_horario(reg[col])
+        except ValueError:
+            erros.append(f"{col}: horário inválido (use HH:MM)")
+
+    reg["cadeirante"] = _sim_nao(reg["cadeirante"])
+    reg["sala_recurso"] = _sim_nao(reg["sala_recurso"])
+    return reg, erros
+
+
+# ---------- Leitura em blocos ----------
+def linhas_csv(arquivo):
+    if isinstance(arquivo, str) or hasattr(arquivo, "__fspath__"):
+        texto = open(arquivo, newline="", encoding="utf-8-sig")
+    else:
+        texto = io.TextIOWrapper(arquivo, newline="", encoding="utf-8-sig")
+    with texto:
+        amostra = texto.read(4096)
+        texto.seek(0)
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+        yield from csv.DictReader(texto, dialect=dialeto)
+
+
+def _linhas_xlsx(arquivo):
+    try:
+        import openpyxl
+    except ImportError:
+        raise RuntimeError("Para importar .xlsx instale o pacote openpyxl") from None
+
+    planilha = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = planilha.active.iter_rows(values_only=True)
+        cabecalho = [str(c or "").strip() for c in next(linhas, [])]
+        for valores in linhas:
+            yield {col: ("" if v is None else v) for col, v in zip(cabecalho, valores)}
+    finally:
+        planilha.close()
+
+
+def ler_em_blocos(arquivo, nome=None, tamanho=TAMANHO_BLOCO):
+    """Gera listas de (numero_da_linha, dict) com até `tamanho` linhas."""
+    nome = (nome or str(arquivo)).lower()
+    linhas = _linhas_xlsx(arquivo) if nome.endswith((".xlsx", ".xlsm")) else linhas_csv(arquivo)
+    bloco = []
+    # Linha 1 é o cabeçalho
+    for numero, linha in enumerate(linhas, start=2):
+        bloco.append((numero, linha))
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+# ---------- Pipeline ----------
+def _completar_enderecos(servico_cep, registros):
+    # Um pedido por CEP distinto do bloco; o serviço já guarda em cache
+    pendentes = set()
+    for reg in registros:
+        if reg["cep_aluno"] and not (reg["logradouro_aluno"] and reg["municipio_aluno"]):
+            pendentes.add(reg["cep_aluno"])
+        if reg["cep_escola"] and not (reg["logradouro_escola"] and reg["municipio_escola"]):
+            pendentes.add(reg["cep_escola"])
+    if not pendentes:
+        return
+    ceps = sorted(pendentes)
+    enderecos = dict(zip(ceps, servico_cep.resolver_varios(ceps)))
+
+    for reg in registros:
+        for sufixo in ("aluno", "escola"):
+            d = enderecos.get(reg[f"cep_{sufixo}"])
+            if not d:
+                continue
+            if not reg[f"logradouro_{sufixo}"]:
+                reg[f"logradouro_{sufixo}"] = f"{d['logradouro']}, {d['bairro']}"
+            if not reg[f"municipio_{sufixo}"]:
+                reg[f"municipio_{sufixo}"] = f"{d['localidade']} - {d['uf']}"
+
+
+def importar(pool, arquivo, nome=None, servico_cep=None, tamanho_bloco=TAMANHO_BLOCO, progresso=None):
+    """Importa o arquivo e devolve o resumo: lidas, inseridas, erros [(linha, mensagem)], segundos."""
+    inicio = time.perf_counter()
+    resumo = {"lidas": 0, "inseridas": 0, "erros": [], "segundos": 0.0}
+    agora = str(datetime.now())
+
+    for bloco in ler_em_blocos(arquivo, nome, tamanho_bloco):
+        validos = []
+        for numero, linha in bloco:
+            reg, erros = validar_linha(linha)
+            if erros:
+                resumo["erros"].extend((numero, msg) for msg in erros)
+            else:
+                validos.append(reg)
+        resumo["lidas"] += len(bloco)
+
+        if servico_cep is not None:
+            _completar_enderecos(servico_cep, validos)
+
+        if validos:
+            with pool.escrita() as w:
+                w.executemany(INSERT_IMPORTACAO,
+                              ([*(reg[col] for col in COLUNAS_IMPORTACAO), agora] for reg in validos))
+            resumo["inseridas"] += len(validos)
+
+        if progresso:
+            progresso(resumo)
+
+    resumo["segundos"] = time.perf_counter() - inicio
+    return resumo
+
+
+def relatorio_erros_csv(erros):
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=";")
+    escritor.writerow(["linha", "erro"])
+    escritor.writerows(erros)
+    return saida.getvalue()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import banco
+    import migracoes
+
+    parser = argparse.ArgumentParser(description="Importa solicitações em lote de um CSV ou XLSX.")
+    parser.add_argument("arquivo")
+    parser.add_argument("--banco", default="transporte_v4.db", help="Arquivo SQLite ou postgresql://...")
+    parser.add_argument("--erros", help="Grava o relatório de erros neste CSV")
+    parser.add_argument("--sem-cep", action="store_true", help="Não completar endereços pelo CEP")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+
+    pool = banco.abrir(args.banco)
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+    servico = None if args.sem_cep else cep_mod.ServicoCEP(pool)
+
+    resumo = importar(
+        pool, args.arquivo, servico_cep=servico, tamanho_bloco=args.bloco,
+        progresso=lambda r: print(f"{r['lidas']} lidas | {r['inseridas']} inseridas | {len(r['erros'])} erros"),
+    )
+    pool.fechar()
+
+    taxa = resumo["lidas"] / resumo["segundos"] if resumo["segundos"] else 0
+    print(f"Concluído em {resumo['segundos']:.1f}s ({taxa:.0f} linhas/s).")
+    if args.erros and resumo["erros"]:
+        with open(args.erros, "w", encoding="utf-8", newline="") as arq:
+            arq.write(relatorio_erros_csv(resumo["erros"]))
+        print(f"Relatório de erros: {args.erros}")
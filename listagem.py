@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+
+import busca as busca_mod
+import eventos
+
+# ==========================================
+# LISTAGEM PAGINADA DE SOLICITAÇÕES
+# ==========================================
+# Paginação por chave (keyset): em vez de OFFSET, cada página começa
+# depois do último (valor_ordenado, id) da página anterior. O custo de
+# buscar uma página não cresce com o tamanho da tabela.
+
+COLUNAS_LISTAGEM = (
+    "id", "nome_aluno", "ra_aluno", "nome_escola", "status",
+    "empresa", "supervisor_nome", "data_solicitacao", "data_atualizacao",
+)
+
+# Ordenação permitida -> expressão SQL (nunca interpolamos texto do usuário);
+# cada uma tem um índice (expressão, id) criado em migracoes
+ORDENACOES = {
+    "ID": "id",
+    "Aluno": "COALESCE(nome_aluno, '')",
+    "Escola": "COALESCE(nome_escola, '')",
+    "Empresa": "COALESCE(empresa, '')",
+    "Status": "COALESCE(status, '')",
+    "Data da Solicitação": "COALESCE(data_solicitacao, '')",
+}
+
+TAMANHO_PAGINA = 50
+
+
+def montar_filtros(status=None, escola=None, empresa=None, data_inicio=None, data_fim=None, busca=None,
+                   dialeto="sqlite"):
+    condicoes, params = [], []
+    if not status:
+        # Excluídas (exclusão lógica) só aparecem quando pedidas pelo status
+        condicoes.append("(status IS NULL OR status != ?)")
+        params.append(eventos.STATUS_EXCLUIDO)
+    if busca:
+        # Texto livre: restringe pelo índice de busca (nome, CPF, RA, escola, empresa, endereço)
+        filtro_busca = busca_mod.condicao(busca, dialeto)
+        if filtro_busca:
+            condicoes.append(filtro_busca[0])
+            params.append(filtro_busca[1])
+    if status:
+        condicoes.append("status = ?")
+        params.append(status)
+    if escola:
+        condicoes.append("nome_escola = ?")
+        params.append(escola)
+    if empresa:
+        condicoes.append("empresa = ?")
+        params.append(empresa)
+    if data_inicio:
+        condicoes.append("data_solicitacao >= ?")
+        params.append(str(data_inicio))
+    if data_fim:
+        # data_solicitacao guarda data e hora; o fim do intervalo é inclusivo
+        if isinstance(data_fim, date):
+            data_fim = data_fim + timedelta(days=1)
+        condicoes.append("data_solicitacao < ?")
+        params.append(str(data_fim))
+    return condicoes, params
+
+
+def listar_pagina(conn, filtros=None, ordem="ID", decrescente=False, apos=None, limite=TAMANHO_PAGINA):
+    """Busca uma página e devolve (linhas, cursor_da_proxima_pagina).
+
+    `apos` é o cursor devolvido pela chamada anterior (ou None na primeira
+    página). O cursor seguinte é None quando não há mais registros.
+    """
+    condicoes, params = filtros or ([], [])
+    condicoes, params = list(condicoes), list(params)
+    expr = ORDENACOES[ordem]
+    op = "<" if decrescente else ">"
+    direcao = "DESC" if decrescente else "ASC"
+
+    if apos is not None:
+        # O primeiro termo vira uma busca no índice (expr, id) de migracoes;
+        # a comparação de linha desempata pelo id
+        condicoes.append(f"{expr} {op}= ? AND ({expr}, id) {op} (?, ?)")
+        params.extend((apos[0], *apos))
+
+    where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    linhas = conn.execute(
+        f"SELECT {', '.join(COLUNAS_LISTAGEM)}, {expr} AS _chave FROM solicitacoes{where} "
+        f"ORDER BY {expr} {direcao}, id {direcao} LIMIT ?",
+        (*params, limite + 1),
+    ).fetchall()
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = (linhas[-1]["_chave"], linhas[-1]["id"])
+    return linhas, proximo
+
+
+def contar(conn, filtros=None):
+    condicoes, params = filtros or ([], [])
+    where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return conn.execute(f"SELECT COUNT(*) FROM solicitacoes{where}", params).fetchone()[0]
+
+
+def valores_distintos(conn, coluna):
+    if coluna not in ("nome_escola", "empresa"):
+        raise ValueError(f"Coluna não permitida: {coluna}")
+    linhas = conn.execute(
+        f"SELECT DISTINCT {coluna} FROM solicitacoes WHERE {coluna} IS NOT NULL AND {coluna} != '' ORDER BY {coluna}"
+    ).fetchall()
+    return [row[0] for row in linhas]
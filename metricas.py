@@ -0,0 +1,179 @@
+import atexit
+import functools
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ==========================================
+# MÉTRICAS DE DESEMPENHO (SPANS E CONTADORES)
+# ==========================================
+# Cada trecho medido vira uma amostra em uma série (categoria, nome):
+# "sql" por comando, "cep" por origem da resposta, "documento" por leitura
+# do armazém, "pagina" por tela. A série guarda as últimas JANELA durações
+# (para p50/p95) e os totais de chamadas, linhas e bytes desde o início do
+# processo. Tudo em memória, por processo; a página "Desempenho" mostra o
+# resumo.
+#
+# Com TRANSPORTE_METRICAS_ARQUIVO, cada amostra também é acrescentada ao
+# arquivo como uma linha JSON (gravação em lote). TRANSPORTE_METRICAS=0
+# desliga a medição das consultas (as demais custam um perf_counter).
+# As consultas contam as linhas à medida que são lidas; os bytes de cada
+# valor só com TRANSPORTE_METRICAS_BYTES=1 (percorre todas as células).
+
+JANELA = 2000
+ATIVO = os.environ.get("TRANSPORTE_METRICAS", "1") != "0"
+CONTAR_BYTES = os.environ.get("TRANSPORTE_METRICAS_BYTES", "0") == "1"
+ARQUIVO = os.environ.get("TRANSPORTE_METRICAS_ARQUIVO")
+LOTE_ARQUIVO = 200
+INTERVALO_ARQUIVO = 10.0
+
+_ESPACOS = re.compile(r"\s+")
+_LISTA_MARCADORES = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+class Serie:
+    __slots__ = ("duracoes", "chamadas", "total", "maximo", "linhas", "bytes")
+
+    def __init__(self, janela):
+        self.duracoes = deque(maxlen=janela)
+        self.chamadas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.linhas = 0
+        self.bytes = 0
+
+
+class Medida:
+    """Contadores preenchidos por quem mede (linhas e bytes lidos)."""
+    __slots__ = ("linhas", "bytes", "pausa")
+
+    def __init__(self):
+        self.linhas = 0
+        self.bytes = 0
+        self.pausa = 0.0
+
+    def pausar(self, segundos):
+        """time.sleep que não entra na duração medida (ex.: tempo para ler um aviso antes do st.rerun)."""
+        time.sleep(segundos)
+        self.pausa += segundos
+
+
+def _percentil(ordenadas, fracao):
+    # Posição mais próxima (nearest rank)
+    return ordenadas[max(0, math.ceil(fracao * len(ordenadas)) - 1)]
+
+
+class Registro:
+    def __init__(self, janela=JANELA, arquivo=None):
+        self.janela = janela
+        self.arquivo = arquivo
+        self.inicio = time.time()
+        self._series = {}
+        self._trava = threading.Lock()
+        self._pendentes = []
+        self._gravado_em = time.monotonic()
+
+    def registrar(self, categoria, nome, segundos, linhas=0, bytes_lidos=0):
+        with self._trava:
+            serie = self._series.get((categoria, nome))
+            if serie is None:
+                serie = self._series[(categoria, nome)] = Serie(self.janela)
+            serie.duracoes.append(segundos)
+            serie.chamadas += 1
+            serie.total += segundos
+            serie.maximo = max(serie.maximo, segundos)
+            serie.linhas += linhas
+            serie.bytes += bytes_lidos
+            if self.arquivo is None:
+                return
+            self._pendentes.append({"em": round(time.time(), 3), "categoria": categoria, "nome": nome,
+                                    "ms": round(segundos * 1000, 3), "linhas": linhas, "bytes": bytes_lidos})
+            if len(self._pendentes) < LOTE_ARQUIVO and time.monotonic() - self._gravado_em < INTERVALO_ARQUIVO:
+                return
+            pendentes, self._pendentes = self._pendentes, []
+            self._gravado_em = time.monotonic()
+        self._gravar(pendentes)
+
+    def _gravar(self, amostras):
+        if amostras:
+            with open(self.arquivo, "a", encoding="utf-8") as arq:
+                arq.writelines(json.dumps(a, ensure_ascii=False) + "\n" for a in amostras)
+
+    def descarregar(self):
+        """Grava no arquivo as amostras ainda em memória."""
+        if self.arquivo is None:
+            return
+        with self._trava:
+            pendentes, self._pendentes = self._pendentes, []
+        self._gravar(pendentes)
+
+    def resumo(self, categoria=None):
+        """Uma linha por série, da que mais consumiu tempo para a que menos consumiu."""
+        with self._trava:
+            series = [(chave, sorted(s.duracoes), s.chamadas, s.total, s.maximo, s.linhas, s.bytes)
+                      for chave, s in self._series.items() if categoria is None or chave[0] == categoria]
+        linhas = []
+        for (cat, nome), ordenadas, chamadas, total, maximo, linhas_lidas, bytes_lidos in series:
+            linhas.append({
+                "categoria": cat, "nome": nome, "chamadas": chamadas,
+                "p50_ms": round(_percentil(ordenadas, 0.50) * 1000, 2),
+                "p95_ms": round(_percentil(ordenadas, 0.95) * 1000, 2),
+                "max_ms": round(maximo * 1000, 2), "total_s": round(total, 3),
+                "linhas": linhas_lidas, "bytes": bytes_lidos,
+            })
+        return sorted(linhas, key=lambda linha: linha["total_s"], reverse=True)
+
+    def limpar(self):
+        with self._trava:
+            self._series.clear()
+            self.inicio = time.time()
+
+    def exportar(self, caminho):
+        """Grava o resumo atual em JSON e devolve o caminho."""
+        with open(caminho, "w", encoding="utf-8") as arq:
+            json.dump({"desde": self.inicio, "gerado_em": time.time(), "series": self.resumo()},
+                      arq, ensure_ascii=False, indent=1)
+        return caminho
+
+
+registro = Registro(arquivo=ARQUIVO)
+atexit.register(registro.descarregar)
+
+
+@contextmanager
+def medir(categoria, nome):
+    """Mede o bloco; o objeto devolvido recebe as linhas e bytes lidos."""
+    medida = Medida()
+    inicio = time.perf_counter()
+    try:
+        yield medida
+    finally:
+        registro.registrar(categoria, nome, max(time.perf_counter() - inicio - medida.pausa, 0.0),
+                           medida.linhas, medida.bytes)
+
+
+@functools.lru_cache(maxsize=1024)
+def nome_consulta(sql):
+    """SQL -> nome da série: espaços colapsados e listas IN (?, ?, ...) iguais entre si.
+
+    O texto fica inteiro: consultas que só diferem no fim (filtros e ordem
+    da listagem) são séries distintas.
+    """
+    return _LISTA_MARCADORES.sub("?…", _ESPACOS.sub(" ", sql).strip())
+
+
+def tamanho(linhas):
+    """Bytes aproximados de um resultado (texto e binário pelo tamanho; números, 8)."""
+    total = 0
+    for linha in linhas:
+        for valor in linha:
+            if isinstance(valor, (str, bytes)):
+                total += len(valor)
+            elif valor is not None:
+                total += 8
+    return total
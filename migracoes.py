@@ -0,0 +1,674 @@
+import secrets
+import sqlite3
+from datetime import datetime
+
+import documentos
+import eventos
+
+# ==========================================
+# MIGRAÇÕES VERSIONADAS DO BANCO
+# ==========================================
+# Cada passo roda uma única vez, em ordem, dentro da própria transação, e
+# fica registrado em `schema_version`. Com o banco em dia, `migrar` faz
+# apenas uma leitura e não emite DDL nem escrita.
+
+
+def _colunas(conn, tabela):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({tabela})")}
+
+
+def _adicionar_coluna(conn, tabela, coluna, tipo):
+    # Bancos v4 antigos podem já ter a coluna (criada pelo init_db anterior)
+    if coluna not in _colunas(conn, tabela):
+        conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+
+
+def _m001_tabelas(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS solicitacoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome_aluno TEXT, cpf_aluno TEXT, ra_aluno TEXT, cadeirante TEXT, cid TEXT,
+        cep_aluno TEXT, logradouro_aluno TEXT, numero_aluno TEXT, municipio_aluno TEXT,
+        nome_escola TEXT, cep_escola TEXT, logradouro_escola TEXT, numero_escola TEXT, municipio_escola TEXT,
+        sala_recurso TEXT, dias_frequencia TEXT, horario_entrada TEXT, horario_saida TEXT,
+        arquivo_medico BLOB, nome_arq_medico TEXT, arquivo_viagem BLOB, nome_arq_viagem TEXT,
+        status TEXT DEFAULT 'Pendente', supervisor_nome TEXT, supervisor_cpf TEXT,
+        motivo_reprovacao TEXT, arquivo_assinado BLOB, nome_arq_assinado TEXT, data_atualizacao TEXT
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome_completo TEXT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        perfis TEXT NOT NULL
+    )
+    ''')
+
+
+def _m002_empresa(conn):
+    _adicionar_coluna(conn, "solicitacoes", "empresa", "TEXT")
+
+
+def _m003_data_solicitacao(conn):
+    _adicionar_coluna(conn, "solicitacoes", "data_solicitacao", "TEXT")
+
+
+def _m004_referencias_documentos(conn):
+    for coluna_ref in documentos.COLUNAS_DOCUMENTOS.values():
+        _adicionar_coluna(conn, "solicitacoes", coluna_ref, "TEXT")
+
+
+def _m005_usuario_adm(conn):
+    # Garante o usuário adm com a senha padrão (12345678) uma única vez
+    if conn.execute("SELECT 1 FROM usuarios WHERE username = 'adm'").fetchone():
+        conn.execute("UPDATE usuarios SET password = '12345678' WHERE username = 'adm'")
+    else:
+        conn.execute("INSERT INTO usuarios (nome_completo, username, password, perfis) VALUES (?, ?, ?, ?)",
+                     ("Administrador do Sistema", "adm", "12345678", "ADM"))
+
+
+def _m006_indices(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_status ON solicitacoes(status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_escola ON solicitacoes(nome_escola)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_empresa ON solicitacoes(empresa)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_cpf ON solicitacoes(cpf_aluno)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_ra ON solicitacoes(ra_aluno)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_data ON solicitacoes(data_solicitacao)")
+    # Fila do supervisor: índice parcial e de cobertura só com as pendentes
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_pendentes "
+                 "ON solicitacoes(id, nome_aluno) WHERE status = 'Pendente'")
+    conn.execute("ANALYZE")
+
+
+def _m007_cache_cep(conn):
+    # dados NULL = CEP inexistente (cache negativo); expira_em NULL = base local permanente
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS cep_cache (
+        cep TEXT PRIMARY KEY,
+        dados TEXT,
+        expira_em REAL
+    ) WITHOUT ROWID
+    ''')
+
+
+def _m008_fila_supervisor(conn):
+    _adicionar_coluna(conn, "solicitacoes", "reservado_por", "TEXT")
+    _adicionar_coluna(conn, "solicitacoes", "reserva_expira", "REAL")
+    _adicionar_coluna(conn, "solicitacoes", "versao", "INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_reservas "
+                 "ON solicitacoes(reservado_por, reserva_expira) WHERE status = 'Pendente'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_atualizacao ON solicitacoes(data_atualizacao)")
+
+
+def _m009_sessoes(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS config (
+        chave TEXT PRIMARY KEY,
+        valor TEXT NOT NULL
+    )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO config (chave, valor) VALUES ('segredo_sessao', ?)", (secrets.token_hex(32),))
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sessoes (
+        id TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        perfil TEXT NOT NULL,
+        criada_em REAL NOT NULL,
+        expira_em REAL NOT NULL
+    ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessoes_expira ON sessoes(expira_em)")
+
+
+def _m010_coordenadas_cep(conn):
+    # Centroides (lat/lon) dos CEPs para o planejamento de rotas, sem rede
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS cep_coordenadas (
+        cep TEXT PRIMARY KEY,
+        lat REAL NOT NULL,
+        lon REAL NOT NULL
+    ) WITHOUT ROWID
+    ''')
+
+
+# Texto -> colunas normalizadas (usado no backfill e nos gatilhos do passo 11).
+# Bits dos dias: Segunda=1, Terça=2, Quarta=4, Quinta=8, Sexta=16.
+_SQL_DIAS_MASK = " + ".join(
+    f"(instr(COALESCE({{t}}dias_frequencia, ''), '{dia}') > 0) * {1 << i}"
+    for i, dia in enumerate(("Segunda", "Terça", "Quarta", "Quinta", "Sexta"))
+)
+_SQL_MINUTOS = """CASE
+    WHEN {t}{col} GLOB '[0-9][0-9]:[0-9][0-9]*' THEN CAST(substr({t}{col}, 1, 2) AS INTEGER) * 60 + CAST(substr({t}{col}, 4, 2) AS INTEGER)
+    WHEN {t}{col} GLOB '[0-9]:[0-9][0-9]*' THEN CAST(substr({t}{col}, 1, 1) AS INTEGER) * 60 + CAST(substr({t}{col}, 3, 2) AS INTEGER)
+END"""
+
+
+def _sql_agenda(prefixo=""):
+    return (f"dias_mask = {_SQL_DIAS_MASK.format(t=prefixo)}, "
+            f"entrada_min = {_SQL_MINUTOS.format(t=prefixo, col='horario_entrada')}, "
+            f"saida_min = {_SQL_MINUTOS.format(t=prefixo, col='horario_saida')}")
+
+
+def _m011_agenda_normalizada(conn):
+    _adicionar_coluna(conn, "solicitacoes", "dias_mask", "INTEGER NOT NULL DEFAULT 0")
+    _adicionar_coluna(conn, "solicitacoes", "entrada_min", "INTEGER")
+    _adicionar_coluna(conn, "solicitacoes", "saida_min", "INTEGER")
+    # Horário vazio era gravado como o texto "None"
+    for coluna in ("horario_entrada", "horario_saida"):
+        conn.execute(f"UPDATE solicitacoes SET {coluna} = NULL WHERE {coluna} IN ('None', '')")
+    conn.execute(f"UPDATE solicitacoes SET {_sql_agenda()}")
+    # Gatilhos mantêm as colunas em dia em qualquer caminho de escrita
+    # (formulário, importação, edição), sem depender do código da aplicação
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_solicitacoes_agenda_ins AFTER INSERT ON solicitacoes
+    BEGIN
+        UPDATE solicitacoes SET {_sql_agenda("NEW.")} WHERE id = NEW.id;
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_solicitacoes_agenda_upd
+    AFTER UPDATE OF dias_frequencia, horario_entrada, horario_saida ON solicitacoes
+    BEGIN
+        UPDATE solicitacoes SET {_sql_agenda("NEW.")} WHERE id = NEW.id;
+    END
+    ''')
+    # Cobre as agregações do painel (status + escola + horário) sem ler a tabela
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_agenda "
+                 "ON solicitacoes(status, nome_escola, entrada_min, dias_mask, cadeirante, empresa, saida_min)")
+    conn.execute("ANALYZE solicitacoes")
+
+
+def _m012_tarefas_documentos(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS tarefas (
+        id INTEGER PRIMARY KEY,
+        tipo TEXT NOT NULL,
+        ref TEXT NOT NULL,
+        estado TEXT NOT NULL DEFAULT 'pendente',
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        reservada_ate REAL,
+        criada_em REAL NOT NULL,
+        concluida_em REAL,
+        erro TEXT
+    )
+    ''')
+    # No máximo uma tarefa aberta por documento; a fila só enxerga as abertas
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tarefas_abertas ON tarefas(tipo, ref) "
+                 "WHERE estado IN ('pendente', 'processando')")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_fila ON tarefas(tipo, estado, id) "
+                 "WHERE estado IN ('pendente', 'processando')")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_ref ON tarefas(ref)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS documentos_info (
+        ref TEXT PRIMARY KEY,
+        ref_original TEXT NOT NULL,
+        mime TEXT,
+        tamanho INTEGER,
+        tamanho_original INTEGER,
+        paginas INTEGER,
+        largura INTEGER,
+        altura INTEGER,
+        ref_miniatura TEXT,
+        processado_em REAL
+    ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_documentos_info_original ON documentos_info(ref_original)")
+
+
+# Colunas do índice de busca (passo 13) e como cada uma é montada a partir de solicitacoes
+COLUNAS_BUSCA = "nome, documentos, escola, empresa, endereco"
+# Colunas de solicitacoes que alimentam o índice (gatilho no SQLite, coluna gerada no PostgreSQL)
+COLUNAS_FONTE_BUSCA = ("nome_aluno", "cpf_aluno", "ra_aluno", "nome_escola", "empresa", "logradouro_aluno",
+                       "numero_aluno", "municipio_aluno", "logradouro_escola", "municipio_escola",
+                       "cep_aluno", "cep_escola")
+
+
+def _digitos(expr):
+    return f"replace(replace(replace(COALESCE({expr}, ''), '.', ''), '-', ''), '/', '')"
+
+
+def sql_busca(prefixo=""):
+    t = prefixo
+    return ", ".join((
+        f"{t}nome_aluno",
+        f"{_digitos(t + 'cpf_aluno')} || ' ' || {_digitos(t + 'ra_aluno')}",
+        f"{t}nome_escola",
+        f"{t}empresa",
+        " || ' ' || ".join(f"COALESCE({t}{c}, '')" for c in (
+            "logradouro_aluno", "numero_aluno", "municipio_aluno", "logradouro_escola", "municipio_escola"))
+        + f" || ' ' || {_digitos(t + 'cep_aluno')} || ' ' || {_digitos(t + 'cep_escola')}",
+    ))
+
+
+def _m013_busca_textual(conn):
+    # prefix: índices extras para buscas por prefixo curtas ("jo*", "sil*")
+    conn.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS busca_solicitacoes USING fts5(
+        {COLUNAS_BUSCA},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )
+    ''')
+    conn.execute(f"INSERT INTO busca_solicitacoes (rowid, {COLUNAS_BUSCA}) SELECT id, {sql_busca()} FROM solicitacoes")
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_busca_ins AFTER INSERT ON solicitacoes
+    BEGIN
+        INSERT INTO busca_solicitacoes (rowid, {COLUNAS_BUSCA}) VALUES (NEW.id, {sql_busca("NEW.")});
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_busca_upd AFTER UPDATE OF {", ".join(COLUNAS_FONTE_BUSCA)} ON solicitacoes
+    BEGIN
+        DELETE FROM busca_solicitacoes WHERE rowid = OLD.id;
+        INSERT INTO busca_solicitacoes (rowid, {COLUNAS_BUSCA}) VALUES (NEW.id, {sql_busca("NEW.")});
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_busca_del AFTER DELETE ON solicitacoes
+    BEGIN
+        DELETE FROM busca_solicitacoes WHERE rowid = OLD.id;
+    END
+    ''')
+
+
+_SQL_AGORA = "((julianday('now') - 2440587.5) * 86400.0)"
+
+
+def _sql_epoch(coluna):
+    # Texto str(datetime.now()) (hora local) -> segundos desde 1970
+    return f"((julianday({coluna}, 'utc') - 2440587.5) * 86400.0)"
+
+
+def _m014_eventos(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS eventos (
+        seq INTEGER PRIMARY KEY,
+        solicitacao_id INTEGER NOT NULL,
+        tipo INTEGER NOT NULL,
+        em REAL NOT NULL,
+        autor TEXT,
+        dados TEXT
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_eventos_solicitacao ON eventos(solicitacao_id, tipo, em)")
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_eventos_sem_update BEFORE UPDATE ON eventos
+    BEGIN
+        SELECT RAISE(ABORT, 'eventos: somente inclusão');
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_eventos_sem_delete BEFORE DELETE ON eventos
+    BEGIN
+        SELECT RAISE(ABORT, 'eventos: somente inclusão');
+    END
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sla_diario (
+        dia TEXT NOT NULL,
+        supervisor TEXT NOT NULL,
+        escola TEXT NOT NULL,
+        decididas INTEGER NOT NULL,
+        aprovadas INTEGER NOT NULL,
+        no_prazo INTEGER NOT NULL,
+        soma_horas REAL NOT NULL,
+        max_horas REAL NOT NULL,
+        PRIMARY KEY (dia, supervisor, escola)
+    ) WITHOUT ROWID
+    ''')
+
+    # Histórico reconstruído do que já existe: criação e decisão. Registros
+    # antigos não têm data_solicitacao (só o passo 15 a preenche): a criação
+    # usa a data da decisão e nunca fica depois dela
+    decisao = f"COALESCE({_sql_epoch('data_atualizacao')}, {_SQL_AGORA})"
+    conn.execute(f'''
+    INSERT INTO eventos (solicitacao_id, tipo, em, autor, dados)
+    SELECT id, tipo, em, NULL, dados FROM (
+        SELECT id, {eventos.CRIADA} AS tipo,
+               MIN(COALESCE({_sql_epoch("data_solicitacao")}, {decisao}), {decisao}) AS em, NULL AS dados
+        FROM solicitacoes
+        UNION ALL
+        SELECT id, {eventos.DECIDIDA}, {decisao},
+               json_object('st', status, 'sup', supervisor_nome, 'mot', motivo_reprovacao)
+        FROM solicitacoes WHERE status IN ('Aprovado', 'Reprovado')
+    ) ORDER BY em, tipo
+    ''')
+    eventos.recalcular_sla(conn)
+
+    # A criação fica por gatilho: cobre o formulário e a importação em lote
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_eventos_criada AFTER INSERT ON solicitacoes
+    BEGIN
+        INSERT INTO eventos (solicitacao_id, tipo, em) VALUES (NEW.id, {eventos.CRIADA}, {_SQL_AGORA});
+    END
+    ''')
+
+
+# Uma por ordenação de listagem.ORDENACOES (mesma expressão, seguida de id):
+# a página seguinte começa com uma busca no índice, sem ordenar a tabela
+_INDICES_ORDENACAO = {
+    "idx_solicitacoes_ord_aluno": "COALESCE(nome_aluno, '')",
+    "idx_solicitacoes_ord_escola": "COALESCE(nome_escola, '')",
+    "idx_solicitacoes_ord_empresa": "COALESCE(empresa, '')",
+    "idx_solicitacoes_ord_status": "COALESCE(status, '')",
+    "idx_solicitacoes_ord_data": "COALESCE(data_solicitacao, '')",
+}
+
+# Registros anteriores à coluna data_solicitacao: a data mais antiga
+# conhecida (decisão do supervisor ou evento de criação) no mesmo formato
+# de str(datetime.now()), para não sumirem dos filtros por data
+_SQL_PREENCHER_DATA = """
+UPDATE solicitacoes SET data_solicitacao = COALESCE(
+    data_atualizacao,
+    (SELECT {data_evento} FROM eventos WHERE solicitacao_id = solicitacoes.id AND tipo = {criada}),
+    {agora})
+WHERE data_solicitacao IS NULL
+"""
+
+
+def _criar_indices_ordenacao(conn):
+    for nome, expr in _INDICES_ORDENACAO.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON solicitacoes({expr}, id)")
+
+
+def _m015_ordenacao_listagem(conn):
+    _criar_indices_ordenacao(conn)
+    conn.execute(_SQL_PREENCHER_DATA.format(data_evento="datetime(MIN(em), 'unixepoch', 'localtime')",
+                                            criada=eventos.CRIADA, agora="datetime('now', 'localtime')"))
+
+
+def _m016_recalcular_sla(conn):
+    # Bancos migrados com a criação depois da decisão (passo 14 antigo):
+    # o SLA é refeito sem as durações negativas
+    eventos.recalcular_sla(conn)
+
+
+MIGRACOES = [
+    (1, "Tabelas solicitacoes e usuarios", _m001_tabelas),
+    (2, "Coluna empresa", _m002_empresa),
+    (3, "Coluna data_solicitacao", _m003_data_solicitacao),
+    (4, "Referências do armazém de documentos", _m004_referencias_documentos),
+    (5, "Usuário adm padrão", _m005_usuario_adm),
+    (6, "Índices de filtro e fila de pendentes", _m006_indices),
+    (7, "Cache e base local de CEPs", _m007_cache_cep),
+    (8, "Reserva e versão para a fila do supervisor", _m008_fila_supervisor),
+    (9, "Sessões persistentes e segredo de assinatura", _m009_sessoes),
+    (10, "Coordenadas dos CEPs para rotas", _m010_coordenadas_cep),
+    (11, "Dias (bitmask) e horários em minutos", _m011_agenda_normalizada),
+    (12, "Fila de processamento e metadados de documentos", _m012_tarefas_documentos),
+    (13, "Índice de busca textual (FTS5)", _m013_busca_textual),
+    (14, "Histórico de eventos e SLA", _m014_eventos),
+    (15, "Índices das ordenações da listagem e data das solicitações antigas", _m015_ordenacao_listagem),
+    (16, "SLA recalculado sem durações negativas", _m016_recalcular_sla),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+# ---------- PostgreSQL ----------
+# Banco novo já nasce no esquema atual (um passo só, numerado como a última
+# migração do SQLite). Ao criar o passo N acima, acrescente o equivalente
+# com o mesmo número em MIGRACOES_PG. O que no SQLite é gatilho de
+# manutenção (agenda, busca) aqui é coluna gerada; dados antigos vêm do
+# SQLite por `python banco_pg.py --de arquivo.db --para postgresql://...`.
+
+# Trava consultiva: faz o papel do BEGIN IMMEDIATE entre réplicas
+TRAVA_MIGRACAO_PG = 0x6D696772
+
+# Letras que a função sem_acento (coluna busca) troca; busca._sem_acento
+# aplica a mesma tabela aos termos digitados, para os dois lados baterem
+ACENTOS = ("ÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇáàâãäéèêëíìîïóòôõöúùûüç",
+           "AAAAAEEEEIIIIOOOOOUUUUCaaaaaeeeeiiiiooooouuuuc")
+
+
+def _pg_minutos(col):
+    return (f"CASE WHEN {col} ~ '^[0-9]{{2}}:[0-9]{{2}}' "
+            f"THEN substr({col}, 1, 2)::int * 60 + substr({col}, 4, 2)::int "
+            f"WHEN {col} ~ '^[0-9]:[0-9]{{2}}' THEN substr({col}, 1, 1)::int * 60 + substr({col}, 3, 2)::int END")
+
+
+def _pg_busca():
+    def vetor(expr, peso):
+        return f"setweight(to_tsvector('simple', sem_acento({expr})), '{peso}')"
+
+    def digitos(col):
+        return f"regexp_replace(COALESCE({col}, ''), '[.\\-/]', '', 'g')"
+
+    endereco = " || ' ' || ".join(
+        [f"COALESCE({c}, '')" for c in ("empresa", "logradouro_aluno", "numero_aluno", "municipio_aluno",
+                                        "logradouro_escola", "municipio_escola")]
+        + [digitos("cep_aluno"), digitos("cep_escola")])
+    return " || ".join((
+        vetor("COALESCE(nome_aluno, '')", "A"),
+        vetor(f"{digitos('cpf_aluno')} || ' ' || {digitos('ra_aluno')}", "B"),
+        vetor("COALESCE(nome_escola, '')", "C"),
+        vetor(endereco, "D"),
+    ))
+
+
+def _pg014_esquema(conn):
+    conn.execute(f'''
+    CREATE OR REPLACE FUNCTION sem_acento(texto text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$ SELECT lower(translate(texto, '{ACENTOS[0]}', '{ACENTOS[1]}')) $$
+    ''')
+    dias_mask = " + ".join(f"(CASE WHEN strpos(COALESCE(dias_frequencia, ''), '{dia}') > 0 THEN {1 << i} ELSE 0 END)"
+                           for i, dia in enumerate(("Segunda", "Terça", "Quarta", "Quinta", "Sexta")))
+    conn.execute(f'''
+    CREATE TABLE IF NOT EXISTS solicitacoes (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        nome_aluno TEXT, cpf_aluno TEXT, ra_aluno TEXT, cadeirante TEXT, cid TEXT,
+        cep_aluno TEXT, logradouro_aluno TEXT, numero_aluno TEXT, municipio_aluno TEXT,
+        nome_escola TEXT, cep_escola TEXT, logradouro_escola TEXT, numero_escola TEXT, municipio_escola TEXT,
+        sala_recurso TEXT, dias_frequencia TEXT, horario_entrada TEXT, horario_saida TEXT,
+        nome_arq_medico TEXT, nome_arq_viagem TEXT,
+        status TEXT DEFAULT 'Pendente', supervisor_nome TEXT, supervisor_cpf TEXT,
+        motivo_reprovacao TEXT, nome_arq_assinado TEXT, data_atualizacao TEXT,
+        empresa TEXT, data_solicitacao TEXT,
+        ref_arq_medico TEXT, ref_arq_viagem TEXT, ref_arq_assinado TEXT,
+        reservado_por TEXT, reserva_expira DOUBLE PRECISION, versao INTEGER NOT NULL DEFAULT 0,
+        dias_mask INTEGER GENERATED ALWAYS AS ({dias_mask}) STORED,
+        entrada_min INTEGER GENERATED ALWAYS AS ({_pg_minutos("horario_entrada")}) STORED,
+        saida_min INTEGER GENERATED ALWAYS AS ({_pg_minutos("horario_saida")}) STORED,
+        busca TSVECTOR GENERATED ALWAYS AS ({_pg_busca()}) STORED
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        nome_completo TEXT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        perfis TEXT NOT NULL
+    )
+    ''')
+    conn.execute("INSERT INTO usuarios (nome_completo, username, password, perfis) VALUES (?, ?, ?, ?) "
+                 "ON CONFLICT (username) DO NOTHING", ("Administrador do Sistema", "adm", "12345678", "ADM"))
+    for indice in (
+        "idx_solicitacoes_status ON solicitacoes(status)",
+        "idx_solicitacoes_escola ON solicitacoes(nome_escola)",
+        "idx_solicitacoes_empresa ON solicitacoes(empresa)",
+        "idx_solicitacoes_cpf ON solicitacoes(cpf_aluno)",
+        "idx_solicitacoes_ra ON solicitacoes(ra_aluno)",
+        "idx_solicitacoes_data ON solicitacoes(data_solicitacao)",
+        "idx_solicitacoes_pendentes ON solicitacoes(id, nome_aluno) WHERE status = 'Pendente'",
+        "idx_solicitacoes_reservas ON solicitacoes(reservado_por, reserva_expira) WHERE status = 'Pendente'",
+        "idx_solicitacoes_atualizacao ON solicitacoes(data_atualizacao)",
+        "idx_solicitacoes_agenda ON solicitacoes(status, nome_escola, entrada_min, dias_mask, cadeirante, "
+        "empresa, saida_min)",
+        "idx_solicitacoes_busca ON solicitacoes USING GIN (busca)",
+    ):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {indice}")
+
+    conn.execute("CREATE TABLE IF NOT EXISTS cep_cache (cep TEXT PRIMARY KEY, dados TEXT, expira_em DOUBLE PRECISION)")
+    conn.execute("CREATE TABLE IF NOT EXISTS config (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+    conn.execute("INSERT INTO config (chave, valor) VALUES ('segredo_sessao', ?) ON CONFLICT (chave) DO NOTHING",
+                 (secrets.token_hex(32),))
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sessoes (
+        id TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        perfil TEXT NOT NULL,
+        criada_em DOUBLE PRECISION NOT NULL,
+        expira_em DOUBLE PRECISION NOT NULL
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessoes_expira ON sessoes(expira_em)")
+    conn.execute("CREATE TABLE IF NOT EXISTS cep_coordenadas (cep TEXT PRIMARY KEY, lat DOUBLE PRECISION NOT NULL, "
+                 "lon DOUBLE PRECISION NOT NULL)")
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS tarefas (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        tipo TEXT NOT NULL,
+        ref TEXT NOT NULL,
+        estado TEXT NOT NULL DEFAULT 'pendente',
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        reservada_ate DOUBLE PRECISION,
+        criada_em DOUBLE PRECISION NOT NULL,
+        concluida_em DOUBLE PRECISION,
+        erro TEXT
+    )
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tarefas_abertas ON tarefas(tipo, ref) "
+                 "WHERE estado IN ('pendente', 'processando')")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_fila ON tarefas(tipo, estado, id) "
+                 "WHERE estado IN ('pendente', 'processando')")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_ref ON tarefas(ref)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS documentos_info (
+        ref TEXT PRIMARY KEY,
+        ref_original TEXT NOT NULL,
+        mime TEXT,
+        tamanho BIGINT,
+        tamanho_original BIGINT,
+        paginas INTEGER,
+        largura INTEGER,
+        altura INTEGER,
+        ref_miniatura TEXT,
+        processado_em DOUBLE PRECISION
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_documentos_info_original ON documentos_info(ref_original)")
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS eventos (
+        seq BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        solicitacao_id BIGINT NOT NULL,
+        tipo INTEGER NOT NULL,
+        em DOUBLE PRECISION NOT NULL,
+        autor TEXT,
+        dados TEXT
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_eventos_solicitacao ON eventos(solicitacao_id, tipo, em)")
+    conn.execute('''
+    CREATE OR REPLACE FUNCTION eventos_somente_inclusao() RETURNS trigger LANGUAGE plpgsql
+    AS $$ BEGIN RAISE EXCEPTION 'eventos: somente inclusão'; END $$
+    ''')
+    conn.execute("DROP TRIGGER IF EXISTS trg_eventos_sem_alteracao ON eventos")
+    conn.execute("CREATE TRIGGER trg_eventos_sem_alteracao BEFORE UPDATE OR DELETE ON eventos "
+                 "FOR EACH ROW EXECUTE FUNCTION eventos_somente_inclusao()")
+    conn.execute("DROP TRIGGER IF EXISTS trg_eventos_sem_truncate ON eventos")
+    conn.execute("CREATE TRIGGER trg_eventos_sem_truncate BEFORE TRUNCATE ON eventos "
+                 "FOR EACH STATEMENT EXECUTE FUNCTION eventos_somente_inclusao()")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sla_diario (
+        dia TEXT NOT NULL,
+        supervisor TEXT NOT NULL,
+        escola TEXT NOT NULL,
+        decididas INTEGER NOT NULL,
+        aprovadas INTEGER NOT NULL,
+        no_prazo INTEGER NOT NULL,
+        soma_horas DOUBLE PRECISION NOT NULL,
+        max_horas DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (dia, supervisor, escola)
+    )
+    ''')
+    conn.execute(f'''
+    CREATE OR REPLACE FUNCTION eventos_criada() RETURNS trigger LANGUAGE plpgsql
+    AS $$ BEGIN
+        INSERT INTO eventos (solicitacao_id, tipo, em) VALUES (NEW.id, {eventos.CRIADA}, extract(epoch FROM clock_timestamp()));
+        RETURN NULL;
+    END $$
+    ''')
+    conn.execute("DROP TRIGGER IF EXISTS trg_eventos_criada ON solicitacoes")
+    conn.execute("CREATE TRIGGER trg_eventos_criada AFTER INSERT ON solicitacoes "
+                 "FOR EACH ROW EXECUTE FUNCTION eventos_criada()")
+    conn.execute("ANALYZE")
+
+
+def _pg015_ordenacao_listagem(conn):
+    _criar_indices_ordenacao(conn)
+    conn.execute(_SQL_PREENCHER_DATA.format(data_evento="to_char(to_timestamp(MIN(em)), 'YYYY-MM-DD HH24:MI:SS')",
+                                            criada=eventos.CRIADA,
+                                            agora="to_char(localtimestamp, 'YYYY-MM-DD HH24:MI:SS')"))
+
+
+MIGRACOES_PG = [
+    (14, "Esquema completo (equivalente às versões 1 a 14)", _pg014_esquema),
+    (15, "Índices das ordenações da listagem e data das solicitações antigas", _pg015_ordenacao_listagem),
+    (16, "SLA recalculado sem durações negativas", _m016_recalcular_sla),
+]
+
+
+def _postgres(conn):
+    return getattr(conn, "dialeto", "sqlite") == "postgres"
+
+
+def versao_atual(conn):
+    if _postgres(conn):
+        if conn.execute("SELECT to_regclass('schema_version')").fetchone()[0] is None:
+            return 0
+        return conn.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_version").fetchone()[0]
+    try:
+        return conn.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_version").fetchone()[0]
+    except sqlite3.OperationalError:
+        # Banco sem a tabela de controle (novo ou anterior às migrações)
+        return 0
+
+
+def _iniciar(conn, postgres):
+    # BEGIN IMMEDIATE trava a escrita: se outro processo migrar ao mesmo
+    # tempo, o segundo espera e depois enxerga a versão já registrada
+    if postgres:
+        conn.execute("BEGIN")
+        conn.execute("SELECT pg_advisory_xact_lock(?)", (TRAVA_MIGRACAO_PG,))
+    else:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+def migrar(conn):
+    """Aplica as migrações pendentes e devolve quantas foram aplicadas."""
+    if versao_atual(conn) >= VERSAO_ATUAL:
+        return 0
+
+    postgres = _postgres(conn)
+    _iniciar(conn, postgres)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        versao INTEGER PRIMARY KEY,
+        descricao TEXT NOT NULL,
+        aplicada_em TEXT NOT NULL
+    )
+    ''')
+    conn.commit()
+
+    aplicadas = 0
+    for versao, descricao, passo in (MIGRACOES_PG if postgres else MIGRACOES):
+        _iniciar(conn, postgres)
+        try:
+            if versao_atual(conn) >= versao:
+                conn.rollback()
+                continue
+            passo(conn)
+            conn.execute("INSERT INTO schema_version (versao, descricao, aplicada_em) VALUES (?, ?, ?)",
+                         (versao, descricao, str(datetime.now())))
+            conn.commit()
+            aplicadas += 1
+        except BaseException:
+            conn.rollback()
+            raise
+    return aplicadas
@@ -0,0 +1,321 @@
+import io
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import documentos
+
+# ==========================================
+# PROCESSAMENTO DE DOCUMENTOS EM SEGUNDO PLANO
+# ==========================================
+# O envio só grava o arquivo no armazém e enfileira uma tarefa na tabela
+# `tarefas`, na mesma transação do registro. Trabalhadores em segundo
+# plano reservam as tarefas (com prazo, como a fila do supervisor),
+# otimizam o arquivo (imagens pelo Pillow; PDFs pelo PyMuPDF, se
+# instalado), geram a miniatura e gravam tamanho, tipo e checksum em
+# `documentos_info`. As solicitações continuam apontando para o arquivo
+# enviado (o download entrega o original; a assinatura digital do parecer
+# continua válida). A versão otimizada, quando menor, é só uma prévia:
+# `documentos_info.ref`, ligada ao enviado por `ref_original`.
+#
+# Tarefas presas (processo encerrado no meio) voltam à fila quando a
+# reserva vence; depois de MAX_TENTATIVAS tentativas, por falha ou por
+# reserva vencida, ficam com estado 'erro'.
+
+TIPO_DOCUMENTO = "documento"
+DURACAO_RESERVA = 5 * 60
+MAX_TENTATIVAS = 3
+INTERVALO_OCIOSO = 5.0
+# Espera após erro inesperado no laço (banco travado, pool esgotado...), dobrando até o máximo
+ESPERA_ERRO_MAXIMA = 60.0
+LADO_MAXIMO = 2200
+LADO_MINIATURA = 240
+QUALIDADE_JPEG = 80
+# Só troca pelo otimizado se economizar pelo menos 5%
+GANHO_MINIMO = 0.95
+
+_COLUNAS_REF = tuple(documentos.COLUNAS_DOCUMENTOS.values())
+_COLUNAS_INFO = ("ref_original", "mime", "tamanho", "tamanho_original", "paginas", "largura", "altura",
+                 "ref_miniatura", "processado_em")
+
+
+# ---------- Fila de tarefas ----------
+def enfileirar(w, refs, tipo=TIPO_DOCUMENTO):
+    """Enfileira as referências usando a conexão de escrita `w` (na transação de quem chama)."""
+    agora = time.time()
+    w.executemany("INSERT INTO tarefas (tipo, ref, criada_em) VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+                  [(tipo, ref, agora) for ref in dict.fromkeys(refs) if ref])
+
+
+def _reservar(pool, tipo):
+    agora = time.time()
+    with pool.escrita() as w:
+        # Reserva vencida na última tentativa: o trabalhador morreu ou travou nesse documento
+        w.execute("UPDATE tarefas SET estado = 'erro', reservada_ate = NULL, erro = ? WHERE tipo = ? "
+                  "AND estado = 'processando' AND reservada_ate < ? AND tentativas >= ?",
+                  ("Reserva vencida sem conclusão", tipo, agora, MAX_TENTATIVAS))
+        linha = w.execute(
+            "SELECT id, ref, tentativas FROM tarefas WHERE tipo = ? AND estado IN ('pendente', 'processando') "
+            "AND (estado = 'pendente' OR reservada_ate < ?) ORDER BY id LIMIT 1",
+            (tipo, agora),
+        ).fetchone()
+        if linha is None:
+            return None
+        w.execute("UPDATE tarefas SET estado = 'processando', reservada_ate = ?, tentativas = tentativas + 1 "
+                  "WHERE id = ?", (agora + DURACAO_RESERVA, linha["id"]))
+    return linha["id"], linha["ref"], linha["tentativas"] + 1
+
+
+def _falhar(pool, id_tarefa, tentativas, erro):
+    estado = "erro" if tentativas >= MAX_TENTATIVAS else "pendente"
+    with pool.escrita() as w:
+        w.execute("UPDATE tarefas SET estado = ?, reservada_ate = NULL, erro = ? WHERE id = ?",
+                  (estado, str(erro)[:500], id_tarefa))
+
+
+def situacao(conn, refs):
+    """{ref: dict} com 'estado' ('pronto', 'processando', 'erro' ou None) e os metadados, se houver."""
+    refs = [r for r in dict.fromkeys(refs) if r]
+    if not refs:
+        return {}
+    marcadores = ",".join("?" * len(refs))
+    resultado = {ref: {"estado": None} for ref in refs}
+    for linha in conn.execute(f"SELECT ref, estado, erro FROM tarefas WHERE ref IN ({marcadores}) ORDER BY id", refs):
+        resultado[linha["ref"]] = {"estado": "processando" if linha["estado"] in ("pendente", "processando")
+                                   else ("erro" if linha["estado"] == "erro" else None), "erro": linha["erro"]}
+    # Pelo enviado (ref_original) ou, em bancos que já trocaram a referência, pela própria prévia (ref)
+    for linha in conn.execute(f"SELECT * FROM documentos_info WHERE ref IN ({marcadores}) "
+                              f"OR ref_original IN ({marcadores})", refs + refs):
+        chave = linha["ref"] if linha["ref"] in resultado else linha["ref_original"]
+        resultado[chave] = {"estado": "pronto", **dict(linha)}
+    return resultado
+
+
+def pendentes(conn):
+    """Documentos ainda na fila (pendentes ou em processamento), para a página Desempenho."""
+    return conn.execute("SELECT COUNT(*) FROM tarefas WHERE estado IN ('pendente', 'processando')").fetchone()[0]
+
+
+# ---------- Otimização (sem banco; pode rodar em outro processo) ----------
+def _tipo_mime(cabecalho):
+    if cabecalho.startswith(b"%PDF"):
+        return "application/pdf"
+    if cabecalho.startswith(b"\x89PNG"):
+        return "image/png"
+    if cabecalho.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    return "application/octet-stream"
+
+
+def _otimizar_imagem(conteudo, mime):
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(conteudo)) as original:
+        imagem = ImageOps.exif_transpose(original)
+        imagem.thumbnail((LADO_MAXIMO, LADO_MAXIMO))
+        meta = {"largura": imagem.width, "altura": imagem.height, "paginas": 1}
+
+        saida = io.BytesIO()
+        if mime == "image/jpeg":
+            imagem.convert("RGB").save(saida, "JPEG", quality=QUALIDADE_JPEG, optimize=True, progressive=True)
+        else:
+            imagem.save(saida, "PNG", optimize=True)
+
+        miniatura = imagem.copy()
+        miniatura.thumbnail((LADO_MINIATURA, LADO_MINIATURA))
+        mini = io.BytesIO()
+        miniatura.convert("RGB").save(mini, "JPEG", quality=70)
+    return saida.getvalue(), mini.getvalue(), meta
+
+
+def _otimizar_pdf(conteudo):
+    try:
+        import pymupdf
+    except ImportError:
+        # Sem PyMuPDF: só registra os metadados
+        return None, None, {}
+
+    with pymupdf.open(stream=conteudo, filetype="pdf") as doc:
+        meta = {"paginas": doc.page_count}
+        pagina = doc[0]
+        escala = LADO_MINIATURA / max(pagina.rect.width, pagina.rect.height)
+        mini = pagina.get_pixmap(matrix=pymupdf.Matrix(escala, escala)).tobytes("jpeg", jpg_quality=70)
+        if hasattr(doc, "rewrite_images"):
+            # Digitalizações: reamostra imagens acima de 200 dpi para 150 dpi
+            doc.rewrite_images(dpi_threshold=200, dpi_target=150, quality=QUALIDADE_JPEG)
+        otimizado = doc.tobytes(garbage=4, deflate=True, clean=True)
+    return otimizado, mini, meta
+
+
+def otimizar_documento(ref, raiz=documentos.DOCS_DIR):
+    """Otimiza um documento do armazém e devolve os metadados (a referência final vem em 'ref')."""
+    conteudo = documentos.ler_documento(ref, raiz)
+    if conteudo is None:
+        raise FileNotFoundError(f"Documento {ref} não está no armazém")
+
+    mime = _tipo_mime(conteudo[:8])
+    otimizado, mini, meta = None, None, {}
+    if mime == "application/pdf":
+        otimizado, mini, meta = _otimizar_pdf(conteudo)
+    elif mime in ("image/png", "image/jpeg"):
+        otimizado, mini, meta = _otimizar_imagem(conteudo, mime)
+
+    info = {"ref_original": ref, "mime": mime, "tamanho_original": len(conteudo),
+            "ref_miniatura": documentos.salvar_documento(mini, raiz) if mini else None, **meta}
+    if otimizado is not None and len(otimizado) < len(conteudo) * GANHO_MINIMO:
+        info["ref"] = documentos.salvar_documento(otimizado, raiz)
+        info["tamanho"] = len(otimizado)
+    else:
+        info["ref"] = ref
+        info["tamanho"] = len(conteudo)
+    return info
+
+
+# ---------- Gravação do resultado ----------
+def _concluir(pool, id_tarefa, info=None):
+    # Só metadados: as referências das solicitações não mudam
+    with pool.escrita() as w:
+        if info is not None:
+            w.execute(
+                f"INSERT INTO documentos_info (ref, {', '.join(_COLUNAS_INFO)}) "
+                f"VALUES (?, {', '.join('?' * len(_COLUNAS_INFO))}) "
+                f"ON CONFLICT (ref) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in _COLUNAS_INFO)}",
+                (info["ref"], info["ref_original"], info["mime"], info["tamanho"], info["tamanho_original"],
+                 info.get("paginas"), info.get("largura"), info.get("altura"), info["ref_miniatura"], time.time()),
+            )
+        w.execute("UPDATE tarefas SET estado = 'concluida', concluida_em = ?, reservada_ate = NULL, erro = NULL "
+                  "WHERE id = ?", (time.time(), id_tarefa))
+
+
+def processar(pool, id_tarefa, ref, executor=None, raiz=documentos.DOCS_DIR):
+    with pool.leitura() as conn:
+        ja_feito = conn.execute("SELECT * FROM documentos_info WHERE ref_original = ? OR ref = ?",
+                                (ref, ref)).fetchone()
+    if ja_feito is not None and os.path.exists(documentos.caminho_documento(ja_feito["ref"], raiz)):
+        # Mesmo conteúdo já processado (outro envio do mesmo arquivo): a prévia serve para os dois
+        _concluir(pool, id_tarefa)
+        return dict(ja_feito)
+    if executor is not None:
+        info = executor.submit(otimizar_documento, ref, raiz).result()
+    else:
+        info = otimizar_documento(ref, raiz)
+    _concluir(pool, id_tarefa, info)
+    return info
+
+
+# ---------- Trabalhadores ----------
+class Processador:
+    """Threads que consomem a tabela `tarefas`.
+
+    Com `processos=True` a otimização (CPU) roda num ProcessPoolExecutor;
+    as threads só reservam tarefas e gravam os resultados no banco.
+    """
+
+    def __init__(self, pool, trabalhadores=2, processos=False, raiz=documentos.DOCS_DIR):
+        self.pool = pool
+        self.trabalhadores = trabalhadores
+        self.raiz = raiz
+        self._executor = (ProcessPoolExecutor(trabalhadores) if processos
+                          else ThreadPoolExecutor(trabalhadores, thread_name_prefix="otimizar"))
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._threads = []
+        self.processadas = 0
+        self.falhas = 0
+
+    def iniciar(self):
+        for n in range(self.trabalhadores):
+            t = threading.Thread(target=self._laco, name=f"processador-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def acordar(self):
+        self._acordar.set()
+
+    def parar(self, esperar=True):
+        self._parar.set()
+        self._acordar.set()
+        if esperar:
+            for t in self._threads:
+                t.join()
+        self._executor.shutdown(wait=esperar)
+
+    def _laco(self):
+        # A thread é criada uma vez por processo (st.cache_resource): nenhum erro pode encerrá-la
+        espera = INTERVALO_OCIOSO
+        while not self._parar.is_set():
+            try:
+                self._passo()
+                espera = INTERVALO_OCIOSO
+            except Exception:
+                traceback.print_exc()
+                self._parar.wait(espera)
+                espera = min(espera * 2, ESPERA_ERRO_MAXIMA)
+
+    def _passo(self):
+        tarefa = _reservar(self.pool, TIPO_DOCUMENTO)
+        if tarefa is None:
+            # Acorda ao enfileirar neste processo, ou periodicamente (outros processos)
+            self._acordar.wait(INTERVALO_OCIOSO)
+            self._acordar.clear()
+            return
+        id_tarefa, ref, tentativas = tarefa
+        try:
+            processar(self.pool, id_tarefa, ref, self._executor, self.raiz)
+            self.processadas += 1
+        except Exception as e:
+            self.falhas += 1
+            _falhar(self.pool, id_tarefa, tentativas, e)
+
+
+def processar_pendentes(pool, raiz=documentos.DOCS_DIR):
+    """Processa a fila toda na thread atual (uso em linha de comando) e devolve (ok, falhas)."""
+    ok = falhas = 0
+    while (tarefa := _reservar(pool, TIPO_DOCUMENTO)) is not None:
+        id_tarefa, ref, tentativas = tarefa
+        try:
+            processar(pool, id_tarefa, ref, raiz=raiz)
+            ok += 1
+        except Exception as e:
+            falhas += 1
+            _falhar(pool, id_tarefa, tentativas, e)
+    return ok, falhas
+
+
+def enfileirar_existentes(pool):
+    """Enfileira os documentos já referenciados que ainda não foram processados."""
+    uniao = " UNION ".join(f"SELECT {c} AS ref FROM solicitacoes WHERE {c} IS NOT NULL" for c in _COLUNAS_REF)
+    with pool.leitura() as conn:
+        refs = [r[0] for r in conn.execute(
+            f"SELECT ref FROM ({uniao}) AS refs WHERE ref NOT IN (SELECT ref_original FROM documentos_info) "
+            f"AND ref NOT IN (SELECT ref FROM documentos_info)")]
+    with pool.escrita() as w:
+        enfileirar(w, refs)
+    return len(refs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import banco
+    import migracoes
+
+    parser = argparse.ArgumentParser(description="Processa a fila de documentos (otimização, miniaturas e metadados).")
+    parser.add_argument("--banco", default=os.environ.get("TRANSPORTE_DB", "transporte_v4.db"),
+                        help="Arquivo SQLite ou postgresql://...")
+    parser.add_argument("--raiz", default=documentos.DOCS_DIR)
+    parser.add_argument("--existentes", action="store_true", help="Enfileira antes os documentos ainda não processados")
+    args = parser.parse_args()
+
+    pool = banco.abrir(args.banco)
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+    if args.existentes:
+        print(f"{enfileirar_existentes(pool)} documento(s) enfileirado(s).")
+    inicio = time.perf_counter()
+    ok, falhas = processar_pendentes(pool, args.raiz)
+    pool.fechar()
+    print(f"{ok} processado(s), {falhas} falha(s) em {time.perf_counter() - inicio:.1f}s.")
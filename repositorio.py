@@ -0,0 +1,102 @@
+import json
+from datetime import datetime
+
+import autenticacao
+import eventos
+import fila
+import processamento
+
+# ==========================================
+# REPOSITÓRIO: SOLICITAÇÕES E USUÁRIOS
+# ==========================================
+# As escritas das telas (cadastro, edição, exclusão lógica, restauração e
+# usuários) ficam aqui, sobre a interface de pool de banco.py, e funcionam
+# igual com SQLite (banco.PoolConexoes) e PostgreSQL (banco_pg.PoolPostgres).
+# O restante do acesso a dados já tem módulo próprio: leituras com cache em
+# dados, fila e avaliação do supervisor em fila, relatórios em listagem e
+# exportacao, busca em busca.
+
+COLUNAS_FORMULARIO = (
+    "nome_aluno", "cpf_aluno", "ra_aluno", "cadeirante", "cid",
+    "cep_aluno", "logradouro_aluno", "numero_aluno", "municipio_aluno",
+    "nome_escola", "cep_escola", "logradouro_escola", "numero_escola", "municipio_escola",
+    "sala_recurso", "dias_frequencia", "horario_entrada", "horario_saida",
+    "ref_arq_medico", "nome_arq_medico", "ref_arq_viagem", "nome_arq_viagem",
+)
+# Campos que a tela de relatórios pode alterar
+COLUNAS_EDITAVEIS = ("nome_aluno", "status", "nome_escola", "empresa")
+
+
+class UsuarioExistente(Exception):
+    pass
+
+
+# ---------- Solicitações ----------
+def inserir_solicitacao(pool, campos):
+    """Grava uma solicitação do formulário e enfileira os documentos; devolve o id."""
+    colunas = [c for c in COLUNAS_FORMULARIO if c in campos]
+    valores = [campos[c] for c in colunas] + [str(datetime.now())]
+    sql = (f"INSERT INTO solicitacoes ({', '.join(colunas)}, data_solicitacao) "
+           f"VALUES ({', '.join('?' * len(valores))})")
+    with pool.escrita() as w:
+        if pool.dialeto == "sqlite":
+            id_solicitacao = w.execute(sql, valores).lastrowid
+        else:
+            id_solicitacao = w.execute(sql + " RETURNING id", valores).fetchone()[0]
+        processamento.enfileirar(w, [campos.get("ref_arq_medico"), campos.get("ref_arq_viagem")])
+    return id_solicitacao
+
+
+def editar_solicitacao(pool, registro, novos, autor):
+    """Grava só os campos que mudaram em relação a `registro` e devolve as mudanças.
+
+    Como fila.finalizar, só grava se o registro ainda estiver na versão lida
+    (senão levanta fila.ConflitoVersao): um formulário aberto antes da decisão
+    do supervisor não a desfaz.
+    """
+    mudancas = {c: novos[c] for c in COLUNAS_EDITAVEIS if c in novos and (registro[c] or "") != (novos[c] or "")}
+    if not mudancas:
+        return mudancas
+    with pool.escrita() as w:
+        cur = w.execute(f"UPDATE solicitacoes SET {', '.join(f'{c}=?' for c in mudancas)}, versao=versao+1 "
+                        "WHERE id=? AND versao=?", (*mudancas.values(), registro["id"], registro["versao"]))
+        if cur.rowcount == 0:
+            raise fila.ConflitoVersao(f"A solicitação {registro['id']} foi alterada por outra pessoa.")
+        eventos.registrar(w, registro["id"], eventos.EDITADA, autor, mudancas)
+    return mudancas
+
+
+def excluir_solicitacao(pool, registro, autor):
+    """Exclusão lógica: o registro e o histórico continuam no banco."""
+    with pool.escrita() as w:
+        w.execute("UPDATE solicitacoes SET status=?, reservado_por=NULL, reserva_expira=NULL, "
+                  "versao=versao+1 WHERE id=?", (eventos.STATUS_EXCLUIDO, registro["id"]))
+        eventos.registrar(w, registro["id"], eventos.EXCLUIDA, autor, {"st": registro["status"]})
+
+
+def restaurar_solicitacao(pool, id_solicitacao, autor):
+    """Volta ao status anterior à exclusão (guardado no evento) e devolve esse status."""
+    with pool.escrita() as w:
+        linha = w.execute("SELECT dados FROM eventos WHERE solicitacao_id = ? AND tipo = ? ORDER BY seq DESC LIMIT 1",
+                          (id_solicitacao, eventos.EXCLUIDA)).fetchone()
+        anterior = (json.loads(linha[0]).get("st") if linha and linha[0] else None) or "Pendente"
+        w.execute("UPDATE solicitacoes SET status=?, versao=versao+1 WHERE id=?", (anterior, id_solicitacao))
+        eventos.registrar(w, id_solicitacao, eventos.RESTAURADA, autor, {"st": anterior})
+    return anterior
+
+
+# ---------- Usuários ----------
+def criar_usuario(pool, nome_completo, username, senha, perfis):
+    """Cadastra com a senha já em scrypt; levanta UsuarioExistente se o login estiver em uso."""
+    senha_hash = autenticacao.gerar_hash(senha)
+    try:
+        with pool.escrita() as w:
+            w.execute("INSERT INTO usuarios (nome_completo, username, password, perfis) VALUES (?,?,?,?)",
+                      (nome_completo, username, senha_hash, ",".join(perfis)))
+    except pool.ErroIntegridade:
+        raise UsuarioExistente(f"O usuário {username} já existe.") from None
+
+
+def excluir_usuario(pool, username):
+    with pool.escrita() as w:
+        return w.execute("DELETE FROM usuarios WHERE username=?", (username,)).rowcount
@@ -0,0 +1,333 @@
+import csv
+import io
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import agenda
+import cep as cep_mod
+import importacao
+
+# ==========================================
+# PLANEJAMENTO DE ROTAS E CAPACIDADE
+# ==========================================
+# Agrupa os alunos aprovados por empresa, escola, dia, sentido (ida/volta)
+# e janela de horário, e monta as viagens de cada grupo com a heurística de
+# economias de Clarke-Wright (seguida de 2-opt), respeitando assentos e
+# posições para cadeira de rodas por veículo. As distâncias vêm dos
+# centroides dos CEPs (tabela cep_coordenadas), sem rede.
+
+RAIO_TERRA_KM = 6371.0
+# Distância pelas ruas ≈ 1,3 x a linha reta em malha urbana
+FATOR_VIARIO = 1.3
+DIAS_SEMANA = agenda.DIAS
+JANELA_MINUTOS = 30
+CAPACIDADE_ASSENTOS = 15
+CAPACIDADE_CADEIRAS = 2
+# Vizinhos considerados por aluno na heurística de economias
+VIZINHOS = 40
+
+COLUNAS_ALUNOS = ("id", "nome_aluno", "cep_aluno", "logradouro_aluno", "numero_aluno", "nome_escola", "cep_escola",
+                  "dias_mask", "entrada_min", "saida_min", "cadeirante", "empresa")
+
+
+# ---------- Coordenadas dos CEPs ----------
+def carregar_coordenadas(pool, arquivo, lote=5000):
+    """Carrega um CSV com colunas cep, lat, lon (caminho ou arquivo binário) na tabela cep_coordenadas."""
+    total = 0
+    buffer = []
+    for linha in importacao.linhas_csv(arquivo):
+        cep = cep_mod.normalizar_cep(linha.get("cep"))
+        if cep is None:
+            continue
+        buffer.append((cep, float(linha["lat"]), float(linha["lon"])))
+        if len(buffer) >= lote:
+            total += _gravar_coordenadas(pool, buffer)
+            buffer = []
+    if buffer:
+        total += _gravar_coordenadas(pool, buffer)
+    return total
+
+
+def _gravar_coordenadas(pool, linhas):
+    with pool.escrita() as w:
+        w.executemany("INSERT INTO cep_coordenadas (cep, lat, lon) VALUES (?, ?, ?) "
+                      "ON CONFLICT (cep) DO UPDATE SET lat = excluded.lat, lon = excluded.lon", linhas)
+    return len(linhas)
+
+
+def total_coordenadas(conn):
+    return conn.execute("SELECT COUNT(*) FROM cep_coordenadas").fetchone()[0]
+
+
+def geocodificar(conn, ceps):
+    """Devolve {cep: (lat, lon)}. CEPs sem coordenada exata usam o centroide do prefixo (5 e depois 3 dígitos)."""
+    ceps = {c for c in (cep_mod.normalizar_cep(x) for x in ceps) if c}
+    coords = {}
+    lista = sorted(ceps)
+    for i in range(0, len(lista), 500):
+        parte = lista[i:i + 500]
+        for linha in conn.execute(f"SELECT cep, lat, lon FROM cep_coordenadas WHERE cep IN ({','.join('?' * len(parte))})",
+                                  parte):
+            coords[linha[0]] = (linha[1], linha[2])
+
+    centroides = {}
+    for cep in ceps - coords.keys():
+        for tamanho in (5, 3):
+            prefixo = cep[:tamanho]
+            if prefixo not in centroides:
+                # Busca por faixa na chave primária: usa o índice
+                centroides[prefixo] = conn.execute(
+                    "SELECT AVG(lat), AVG(lon) FROM cep_coordenadas WHERE cep >= ? AND cep <= ?",
+                    (prefixo.ljust(8, "0"), prefixo.ljust(8, "9")),
+                ).fetchone()
+            lat, lon = centroides[prefixo]
+            if lat is not None:
+                coords[cep] = (lat, lon)
+                break
+    return coords
+
+
+# ---------- Distâncias ----------
+def matriz_distancias(coords):
+    """Matriz n x n de distâncias em km (haversine x fator viário) para coords (n, 2) em graus."""
+    rad = np.radians(np.asarray(coords, dtype=float))
+    lat, lon = rad[:, 0:1], rad[:, 1:2]
+    dlat = lat - lat.T
+    dlon = lon - lon.T
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlon / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1))) * FATOR_VIARIO
+
+
+# ---------- Heurística de roteirização ----------
+def _economias(dist, assentos, cadeiras, cap_assentos, cap_cadeiras):
+    # Nó 0 = escola; nós 1..n = alunos
+    n = len(dist) - 1
+    if n == 0:
+        return []
+    rota_de = list(range(n + 1))
+    rotas = {i: [i] for i in range(1, n + 1)}
+    carga = {i: (int(assentos[i - 1]), int(cadeiras[i - 1])) for i in range(1, n + 1)}
+    if n == 1:
+        return list(rotas.values())
+
+    # Só pares entre vizinhos próximos: uma van nunca junta alunos distantes
+    # quando há vizinhos livres, e isso reduz os pares de n²/2 para ~n·k
+    if n - 1 > VIZINHOS:
+        alunos = dist[1:, 1:]
+        proximos = np.argpartition(alunos, VIZINHOS, axis=1)[:, :VIZINHOS + 1]
+        candidatos = np.zeros((n, n), dtype=bool)
+        candidatos[np.arange(n)[:, None], proximos] = True
+        ii, jj = np.nonzero(np.triu(candidatos | candidatos.T, k=1))
+    else:
+        ii, jj = np.triu_indices(n, k=1)
+
+    d0 = dist[0, 1:]
+    economia = d0[ii] + d0[jj] - dist[ii + 1, jj + 1]
+    ordem = np.argsort(-economia, kind="stable")
+    ordem = ordem[:int(np.count_nonzero(economia > 0))]
+
+    for i, j in zip((ii[ordem] + 1).tolist(), (jj[ordem] + 1).tolist()):
+        ri, rj = rota_de[i], rota_de[j]
+        if ri == rj:
+            continue
+        a_i, c_i = carga[ri]
+        a_j, c_j = carga[rj]
+        if a_i + a_j > cap_assentos or c_i + c_j > cap_cadeiras:
+            continue
+        A, B = rotas[ri], rotas[rj]
+        # Só une rotas pelas pontas (i e j precisam ser extremos)
+        if A[-1] == i and B[0] == j:
+            nova = A + B
+        elif A[0] == i and B[-1] == j:
+            nova = B + A
+        elif A[-1] == i and B[-1] == j:
+            nova = A + B[::-1]
+        elif A[0] == i and B[0] == j:
+            nova = A[::-1] + B
+        else:
+            continue
+        rotas[ri] = nova
+        carga[ri] = (a_i + a_j, c_i + c_j)
+        del rotas[rj], carga[rj]
+        for x in B:
+            rota_de[x] = ri
+    return list(rotas.values())
+
+
+def _dois_opt(rota, dist):
+    """Melhora a ordem das paradas invertendo trechos (2-opt) e devolve (rota, km)."""
+    # Submatriz local: posição m = escola (fim do percurso aberto)
+    m = len(rota)
+    nos = rota + [0]
+    d = dist[np.ix_(nos, nos)].tolist()
+    ordem = list(range(m + 1))
+    # Com duas paradas também: a ordem b -> a -> escola pode ser a mais curta
+    melhorou = m >= 2
+    while melhorou:
+        melhorou = False
+        for i in range(m - 1):
+            for k in range(i + 1, m):
+                a, b, c, e = ordem[i - 1], ordem[i], ordem[k], ordem[k + 1]
+                # O percurso começa na primeira parada: sem aresta antes de i = 0
+                antes = d[a][b] if i > 0 else 0.0
+                depois = d[a][c] if i > 0 else 0.0
+                if depois + d[b][e] < antes + d[c][e] - 1e-9:
+                    ordem[i:k + 1] = ordem[i:k + 1][::-1]
+                    melhorou = True
+    km = sum(d[ordem[x]][ordem[x + 1]] for x in range(m))
+    return [nos[x] for x in ordem[:m]], km
+
+
+def roteirizar(coord_escola, coords_alunos, cadeirantes, cap_assentos=CAPACIDADE_ASSENTOS,
+               cap_cadeiras=CAPACIDADE_CADEIRAS):
+    """Divide os alunos em viagens.
+
+    Devolve ([(índices dos alunos em ordem de embarque, km)], índices dos
+    alunos que não cabem em nenhum veículo, ex.: cadeirante sem posição para cadeira).
+    """
+    cadeirantes = np.asarray(cadeirantes, dtype=bool)
+    # Cadeirante ocupa uma posição de cadeira, os demais um assento
+    assentos = (~cadeirantes).astype(int)
+    cadeiras = cadeirantes.astype(int)
+    cabem = (assentos <= cap_assentos) & (cadeiras <= cap_cadeiras)
+    dentro = np.flatnonzero(cabem)
+    dist = matriz_distancias(np.vstack([coord_escola, np.asarray(coords_alunos, dtype=float).reshape(-1, 2)[dentro]]))
+    viagens = []
+    for rota in _economias(dist, assentos[dentro], cadeiras[dentro], cap_assentos, cap_cadeiras):
+        ordem, km = _dois_opt(rota, dist)
+        viagens.append(([int(dentro[n - 1]) for n in ordem], km))
+    return viagens, np.flatnonzero(~cabem).tolist()
+
+
+# ---------- Planejamento ----------
+def _janela(minutos, tamanho):
+    inicio = minutos - minutos % tamanho
+    return f"{inicio // 60:02d}:{inicio % 60:02d}"
+
+
+def agrupar(alunos, dias=DIAS_SEMANA, janela=JANELA_MINUTOS):
+    """Agrupa por (empresa, escola, dia, sentido, janela); alunos sem horário ficam de fora."""
+    bits = {dia: agenda.BITS[dia] for dia in dias}
+    grupos = defaultdict(list)
+    for aluno in alunos:
+        for sentido, coluna in (("Ida", "entrada_min"), ("Volta", "saida_min")):
+            minutos = aluno[coluna]
+            if minutos is None:
+                continue
+            for dia, bit in bits.items():
+                if aluno["dias_mask"] & bit:
+                    chave = (aluno["empresa"] or "Sem empresa", aluno["nome_escola"], dia, sentido, _janela(minutos, janela))
+                    grupos[chave].append(aluno)
+    return grupos
+
+
+def planejar(pool, empresa=None, dias=DIAS_SEMANA, cap_assentos=CAPACIDADE_ASSENTOS,
+             cap_cadeiras=CAPACIDADE_CADEIRAS, janela=JANELA_MINUTOS):
+    """Monta as viagens dos alunos aprovados. Devolve (viagens, alunos_sem_coordenada, alunos_sem_lugar, segundos)."""
+    inicio = time.perf_counter()
+    sql = f"SELECT {', '.join(COLUNAS_ALUNOS)} FROM solicitacoes WHERE status = 'Aprovado'"
+    params = []
+    if empresa:
+        sql += " AND empresa = ?"
+        params.append(empresa)
+
+    with pool.leitura() as conn:
+        alunos = conn.execute(sql, params).fetchall()
+        coords = geocodificar(conn, [a["cep_aluno"] for a in alunos] + [a["cep_escola"] for a in alunos])
+
+    por_cep = {}
+
+    def coord(cep):
+        if cep not in por_cep:
+            por_cep[cep] = coords.get(cep_mod.normalizar_cep(cep))
+        return por_cep[cep]
+
+    sem_coordenada = [a for a in alunos if coord(a["cep_aluno"]) is None or coord(a["cep_escola"]) is None]
+    localizados = [a for a in alunos if coord(a["cep_aluno"]) is not None and coord(a["cep_escola"]) is not None]
+
+    viagens = []
+    # Por id: o mesmo aluno aparece em vários grupos (dias e sentidos)
+    sem_lugar = {}
+    for (emp, escola, dia, sentido, horario), grupo in sorted(agrupar(localizados, dias, janela).items()):
+        coord_escola = coord(grupo[0]["cep_escola"])
+        coords_alunos = np.array([coord(a["cep_aluno"]) for a in grupo])
+        cadeirantes = [a["cadeirante"] == "SIM" for a in grupo]
+        rotas_grupo, fora = roteirizar(coord_escola, coords_alunos, cadeirantes, cap_assentos, cap_cadeiras)
+        for i in fora:
+            sem_lugar[grupo[i]["id"]] = grupo[i]
+        for veiculo, (ordem, km) in enumerate(rotas_grupo, start=1):
+            paradas = [grupo[i] for i in ordem]
+            if sentido == "Volta":
+                # Na volta o veículo sai da escola e deixa primeiro o mais próximo
+                paradas.reverse()
+            viagens.append({
+                "empresa": emp, "escola": escola, "dia": dia, "sentido": sentido, "janela": horario,
+                "veiculo": veiculo, "alunos": len(paradas),
+                "cadeirantes": sum(p["cadeirante"] == "SIM" for p in paradas),
+                "distancia_km": round(km, 2), "paradas": paradas,
+            })
+    return viagens, sem_coordenada, list(sem_lugar.values()), time.perf_counter() - inicio
+
+
+def resumo_por_empresa(viagens):
+    resumo = defaultdict(lambda: {"viagens": 0, "alunos_transportados": 0, "km": 0.0})
+    for v in viagens:
+        r = resumo[v["empresa"]]
+        r["viagens"] += 1
+        r["alunos_transportados"] += v["alunos"]
+        r["km"] = round(r["km"] + v["distancia_km"], 2)
+    return [{"empresa": emp, **valores} for emp, valores in sorted(resumo.items())]
+
+
+def exportar_csv(viagens, empresa=None):
+    """CSV com uma linha por parada (na ordem de embarque/desembarque)."""
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=";")
+    escritor.writerow(["empresa", "escola", "dia", "sentido", "janela", "veiculo", "ordem", "id", "nome_aluno",
+                       "logradouro", "numero", "cep", "cadeirante", "distancia_viagem_km"])
+    for v in viagens:
+        if empresa and v["empresa"] != empresa:
+            continue
+        for ordem, p in enumerate(v["paradas"], start=1):
+            escritor.writerow([v["empresa"], v["escola"], v["dia"], v["sentido"], v["janela"], v["veiculo"], ordem,
+                               p["id"], p["nome_aluno"], p["logradouro_aluno"], p["numero_aluno"], p["cep_aluno"],
+                               p["cadeirante"], v["distancia_km"]])
+    return saida.getvalue()
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    import banco
+    import migracoes
+
+    parser = argparse.ArgumentParser(description="Planeja as viagens dos alunos aprovados, por empresa.")
+    parser.add_argument("--banco", default="transporte_v4.db", help="Arquivo SQLite ou postgresql://...")
+    parser.add_argument("--coordenadas", help="CSV cep;lat;lon para carregar antes de planejar")
+    parser.add_argument("--empresa")
+    parser.add_argument("--assentos", type=int, default=CAPACIDADE_ASSENTOS)
+    parser.add_argument("--cadeiras", type=int, default=CAPACIDADE_CADEIRAS)
+    parser.add_argument("--saida", default="planos", help="Pasta dos CSVs por empresa")
+    args = parser.parse_args()
+
+    pool = banco.abrir(args.banco)
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+    if args.coordenadas:
+        print(f"{carregar_coordenadas(pool, args.coordenadas)} coordenadas carregadas.")
+
+    viagens, sem_coord, sem_lugar, segundos = planejar(pool, args.empresa, cap_assentos=args.assentos,
+                                                       cap_cadeiras=args.cadeiras)
+    pool.fechar()
+    print(f"{len(viagens)} viagens planejadas em {segundos:.2f}s; {len(sem_coord)} alunos sem coordenada, "
+          f"{len(sem_lugar)} sem lugar nos veículos.")
+
+    os.makedirs(args.saida, exist_ok=True)
+    for r in resumo_por_empresa(viagens):
+        caminho = os.path.join(args.saida, f"plano_{r['empresa'].replace('/', '_').replace(' ', '_')}.csv")
+        with open(caminho, "w", encoding="utf-8-sig", newline="") as arq:
+            arq.write(exportar_csv(viagens, r["empresa"]))
+        print(f"{r['empresa']}: {r['viagens']} viagens, {r['alunos_transportados']} alunos, {r['km']} km -> {caminho}")
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import banco  # noqa: E402
+import dados  # noqa: E402
+import migracoes  # noqa: E402
+import repositorio  # noqa: E402
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """Banco SQLite novo e migrado, com o cache de consultas ligado (como no app)."""
+    pool = banco.abrir(str(tmp_path / "transporte.db"))
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+    dados.cache.limpar()
+    dados.ligar_invalidacao(pool)
+    yield pool
+    pool.ouvintes_escrita.clear()
+    pool.fechar()
+
+
+@pytest.fixture
+def nova_solicitacao(pool):
+    """Cria uma solicitação pendente e devolve o id."""
+    def criar(nome="Aluno Teste", **campos):
+        return repositorio.inserir_solicitacao(pool, {"nome_aluno": nome, "nome_escola": "EE Teste", **campos})
+    return criar
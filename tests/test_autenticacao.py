@@ -0,0 +1,43 @@
+import time
+
+import autenticacao
+
+
+def test_usuario_inexistente_tambem_confere_um_hash(pool, monkeypatch):
+    conferidos = []
+    original = autenticacao.conferir_hash
+
+    def conferir(senha, armazenado):
+        conferidos.append(armazenado)
+        return original(senha, armazenado)
+
+    monkeypatch.setattr(autenticacao, "conferir_hash", conferir)
+
+    assert autenticacao.verificar_credenciais(pool, "nao_existe", "qualquer") is None
+    assert len(conferidos) == 1
+
+
+def test_sessao_renovada_depois_da_metade_da_validade(pool):
+    token = autenticacao.criar_sessao(pool, "adm", "ADM", duracao=60)
+
+    novo = autenticacao.renovar_sessao(pool, token, "adm", "ADM")
+
+    assert novo != token
+    assert autenticacao.validar_sessao(pool, token) is None
+    assert autenticacao.validar_sessao(pool, novo)[0] == "adm"
+
+
+def test_sessao_recente_nao_e_renovada(pool):
+    token = autenticacao.criar_sessao(pool, "adm", "ADM")
+
+    assert autenticacao.renovar_sessao(pool, token, "adm", "ADM") == token
+
+
+def test_login_apaga_sessoes_vencidas(pool):
+    with pool.escrita() as w:
+        w.execute("INSERT INTO sessoes (id, username, perfil, criada_em, expira_em) VALUES ('velha', 'adm', 'ADM', 0, 1)")
+
+    autenticacao.criar_sessao(pool, "adm", "ADM")
+
+    with pool.leitura() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sessoes WHERE expira_em < ?", (time.time(),)).fetchone()[0] == 0
@@ -0,0 +1,20 @@
+import busca
+
+
+def test_reconstruir_refaz_o_indice(pool, nova_solicitacao):
+    id_sol = nova_solicitacao("João da Silva")
+    with pool.escrita() as w:
+        # Como num backup restaurado sem o índice
+        w.execute("DELETE FROM busca_solicitacoes")
+    with pool.leitura() as conn:
+        assert busca.buscar(conn, "joao")[0] == []
+
+    busca.reconstruir(pool)
+
+    with pool.leitura() as conn:
+        assert [r["id"] for r in busca.buscar(conn, "joao")[0]] == [id_sol]
+
+
+def test_termo_do_postgres_normalizado_como_a_coluna_busca():
+    # Só as letras da função sem_acento perdem o acento; "ñ" fica como está no índice
+    assert busca.montar_consulta("João Peña", dialeto="postgres") == "joao:* & peña:*"
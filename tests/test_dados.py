@@ -0,0 +1,117 @@
+import dados
+import fila
+import listagem
+
+
+def _ouvir(pool):
+    recebidas = []
+    pool.ouvintes_escrita.append(recebidas.append)
+    return recebidas
+
+
+def _renomear(pool, id_sol, nome):
+    with pool.escrita() as w:
+        w.execute("UPDATE solicitacoes SET nome_aluno = ? WHERE id = ?", (nome, id_sol))
+
+
+def test_escrita_repetida_informa_as_mesmas_chaves(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    recebidas = _ouvir(pool)
+
+    # A segunda execução usa o statement já preparado (sem passar pelo autorizador)
+    _renomear(pool, id_sol, "Primeiro")
+    _renomear(pool, id_sol, "Segundo")
+
+    assert recebidas[0] == recebidas[1]
+    assert {"solicitacoes.nome_aluno", "solicitacoes.*"} <= recebidas[1]
+
+
+def test_chaves_incluem_tabelas_alteradas_por_gatilho(pool, nova_solicitacao):
+    nova_solicitacao()
+    recebidas = _ouvir(pool)
+
+    nova_solicitacao()
+    nova_solicitacao()
+
+    for chaves in recebidas:
+        assert {"solicitacoes", "eventos"} <= chaves
+
+
+def test_gatilho_novo_entra_nas_chaves_de_statement_ja_preparado(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    _renomear(pool, id_sol, "Antes")
+    with pool.escrita() as w:
+        w.execute("CREATE TABLE auditoria (id INTEGER)")
+        w.execute("CREATE TRIGGER trg_auditoria AFTER UPDATE OF nome_aluno ON solicitacoes "
+                  "BEGIN INSERT INTO auditoria VALUES (NEW.id); END")
+    recebidas = _ouvir(pool)
+
+    _renomear(pool, id_sol, "Depois")
+    _renomear(pool, id_sol, "De novo")
+
+    assert all("auditoria" in chaves for chaves in recebidas)
+
+
+def test_listagem_em_cache_ve_a_edicao(pool, nova_solicitacao):
+    id_sol = nova_solicitacao("Nome Antigo")
+    filtros = listagem.montar_filtros()
+    with pool.leitura() as conn:
+        assert dados.listar_pagina(conn, filtros, "ID", False, None)[0][0]["nome_aluno"] == "Nome Antigo"
+
+    _renomear(pool, id_sol, "Nome Novo")
+    _renomear(pool, id_sol, "Nome Mais Novo")
+
+    with pool.leitura() as conn:
+        assert dados.listar_pagina(conn, filtros, "ID", False, None)[0][0]["nome_aluno"] == "Nome Mais Novo"
+
+
+def test_reserva_nao_invalida_a_listagem(pool, nova_solicitacao):
+    nova_solicitacao()
+    filtros = listagem.montar_filtros()
+    with pool.leitura() as conn:
+        dados.listar_pagina(conn, filtros, "ID", False, None)
+        acertos = dados.cache.acertos
+
+        fila.reservar(pool, "sup1", 1)
+        dados.listar_pagina(conn, filtros, "ID", False, None)
+
+    assert dados.cache.acertos == acertos + 1
+
+
+def test_nova_solicitacao_invalida_contagem(pool, nova_solicitacao):
+    nova_solicitacao()
+    filtros = listagem.montar_filtros()
+    with pool.leitura() as conn:
+        assert dados.contar(conn, filtros) == 1
+        nova_solicitacao()
+        nova_solicitacao()
+        assert dados.contar(conn, filtros) == 3
+
+
+def test_busca_em_cache_ve_edicao_de_coluna_indexada(pool, nova_solicitacao):
+    id_sol = nova_solicitacao(logradouro_aluno="Rua Flores")
+    filtros = listagem.montar_filtros(busca="ipe")
+    with pool.leitura() as conn:
+        assert dados.contar(conn, filtros) == 0
+        assert dados.listar_pagina(conn, filtros, "ID", False, None)[0] == []
+
+    with pool.escrita() as w:
+        w.execute("UPDATE solicitacoes SET logradouro_aluno = 'Rua Ipe' WHERE id = ?", (id_sol,))
+
+    with pool.leitura() as conn:
+        assert dados.contar(conn, filtros) == 1
+        assert [r["id"] for r in dados.listar_pagina(conn, filtros, "ID", False, None)[0]] == [id_sol]
+
+
+def test_edicao_de_coluna_indexada_nao_invalida_listagem_sem_busca(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    filtros = listagem.montar_filtros()
+    with pool.leitura() as conn:
+        dados.listar_pagina(conn, filtros, "ID", False, None)
+        acertos = dados.cache.acertos
+
+        with pool.escrita() as w:
+            w.execute("UPDATE solicitacoes SET logradouro_aluno = 'Rua Ipe' WHERE id = ?", (id_sol,))
+        dados.listar_pagina(conn, filtros, "ID", False, None)
+
+    assert dados.cache.acertos == acertos + 1
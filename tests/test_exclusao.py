@@ -0,0 +1,81 @@
+import dados
+import eventos
+import fila
+import listagem
+import repositorio
+
+
+def _registro(pool, id_sol):
+    with pool.leitura() as conn:
+        return conn.execute("SELECT * FROM solicitacoes WHERE id = ?", (id_sol,)).fetchone()
+
+
+def _ids_listados(pool, **filtros):
+    with pool.leitura() as conn:
+        linhas, _ = dados.listar_pagina(conn, listagem.montar_filtros(**filtros), "ID", False, None)
+    return [r["id"] for r in linhas]
+
+
+def test_excluida_sai_da_listagem_e_da_fila(pool, nova_solicitacao):
+    mantida, excluida = nova_solicitacao("Aluno A"), nova_solicitacao("Aluno B")
+    assert _ids_listados(pool) == [mantida, excluida]
+
+    repositorio.excluir_solicitacao(pool, _registro(pool, excluida), "admin")
+
+    assert _ids_listados(pool) == [mantida]
+    assert _ids_listados(pool, status=eventos.STATUS_EXCLUIDO) == [excluida]
+    with pool.leitura() as conn:
+        assert dados.contar(conn, listagem.montar_filtros()) == 1
+    assert [r[0] for r in fila.reservar(pool, "sup1", 5)] == [mantida]
+
+
+def test_exclusao_solta_a_reserva(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    (_, _, versao), = fila.reservar(pool, "sup1", 1)
+
+    repositorio.excluir_solicitacao(pool, _registro(pool, id_sol), "admin")
+
+    registro = _registro(pool, id_sol)
+    assert registro["reservado_por"] is None and registro["versao"] == versao + 1
+
+
+def test_restaurar_volta_ao_status_anterior(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    (_, _, versao), = fila.reservar(pool, "sup1", 1)
+    fila.finalizar(pool, id_sol, versao, "sup1", "Aprovado", "Supervisor", "000", None, None, None)
+    repositorio.excluir_solicitacao(pool, _registro(pool, id_sol), "admin")
+
+    assert repositorio.restaurar_solicitacao(pool, id_sol, "admin") == "Aprovado"
+    assert _registro(pool, id_sol)["status"] == "Aprovado"
+    assert _ids_listados(pool) == [id_sol]
+
+    with pool.leitura() as conn:
+        historico = eventos.historico(conn, id_sol)
+    assert [e["tipo"] for e in historico[-2:]] == ["excluida", "restaurada"]
+    assert historico[-2]["dados"] == {"st": "Aprovado"} and historico[-1]["autor"] == "admin"
+
+
+def test_restaurar_usa_a_exclusao_mais_recente(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    repositorio.excluir_solicitacao(pool, _registro(pool, id_sol), "admin")
+    repositorio.restaurar_solicitacao(pool, id_sol, "admin")
+    with pool.escrita() as w:
+        w.execute("UPDATE solicitacoes SET status = 'Reprovado' WHERE id = ?", (id_sol,))
+    repositorio.excluir_solicitacao(pool, _registro(pool, id_sol), "admin")
+
+    assert repositorio.restaurar_solicitacao(pool, id_sol, "admin") == "Reprovado"
+
+
+def test_ids_alterados_desde_o_cursor(pool, nova_solicitacao):
+    primeira, segunda = nova_solicitacao("Aluno A"), nova_solicitacao("Aluno B")
+    with pool.leitura() as conn:
+        ids, cursor = eventos.ids_alterados(conn)
+    assert sorted(ids) == [primeira, segunda]
+
+    repositorio.excluir_solicitacao(pool, _registro(pool, segunda), "admin")
+    repositorio.restaurar_solicitacao(pool, segunda, "admin")
+
+    with pool.leitura() as conn:
+        ids, novo = eventos.ids_alterados(conn, cursor)
+        assert ids == [segunda] and novo > cursor
+        assert eventos.ids_alterados(conn, novo) == ([], novo)
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+import fila
+import repositorio
+
+
+def test_reserva_entrega_cada_pendente_a_um_supervisor(pool, nova_solicitacao):
+    ids = [nova_solicitacao(f"Aluno {i}") for i in range(6)]
+
+    primeiro = fila.reservar(pool, "sup1", 4)
+    segundo = fila.reservar(pool, "sup2", 4)
+
+    assert [r[0] for r in primeiro] == ids[:4]
+    assert [r[0] for r in segundo] == ids[4:]
+    assert fila.reservar(pool, "sup3", 4) == []
+
+
+def test_reserva_nao_pega_de_novo_as_proprias(pool, nova_solicitacao):
+    nova_solicitacao()
+    (id_sol, _, versao), = fila.reservar(pool, "sup1", 5)
+
+    assert fila.reservar(pool, "sup1", 5) == []
+    with pool.leitura() as conn:
+        assert [tuple(r)[:3] for r in fila.minhas_reservas(conn, "sup1")] == [(id_sol, "Aluno Teste", versao)]
+
+
+def test_reservas_simultaneas_nao_se_repetem(pool, nova_solicitacao):
+    for i in range(60):
+        nova_solicitacao(f"Aluno {i}")
+    recebidos = []
+
+    def supervisor(nome):
+        while lote := fila.reservar(pool, nome, 3):
+            recebidos.extend(r[0] for r in lote)
+
+    threads = [threading.Thread(target=supervisor, args=(f"sup{i}",)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(recebidos) == 60
+    assert len(set(recebidos)) == 60
+
+
+def test_reserva_vencida_volta_para_a_fila(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    fila.reservar(pool, "sup1", 1, duracao=-1)
+
+    assert [r[0] for r in fila.reservar(pool, "sup2", 1)] == [id_sol]
+
+
+def test_finalizar_grava_a_decisao_na_versao_reservada(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    (_, _, versao), = fila.reservar(pool, "sup1", 1)
+
+    fila.finalizar(pool, id_sol, versao, "sup1", "Aprovado", "Supervisor 1", "00000000000", "", None, None)
+
+    with pool.leitura() as conn:
+        status, reservado_por = conn.execute("SELECT status, reservado_por FROM solicitacoes WHERE id = ?",
+                                             (id_sol,)).fetchone()
+    assert (status, reservado_por) == ("Aprovado", None)
+
+
+def test_finalizar_recusa_versao_antiga(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    (_, _, versao), = fila.reservar(pool, "sup1", 1, duracao=-1)
+    # A reserva venceu e outro supervisor pegou o registro (nova versão)
+    fila.reservar(pool, "sup2", 1)
+
+    with pytest.raises(fila.ConflitoVersao):
+        fila.finalizar(pool, id_sol, versao, "sup1", "Reprovado", "Supervisor 1", "00000000000", "x", None, None)
+    with pool.leitura() as conn:
+        assert conn.execute("SELECT status FROM solicitacoes WHERE id = ?", (id_sol,)).fetchone()[0] == "Pendente"
+
+
+def test_finalizar_recusa_decisao_repetida(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    (_, _, versao), = fila.reservar(pool, "sup1", 1)
+    fila.finalizar(pool, id_sol, versao, "sup1", "Aprovado", "Supervisor 1", "00000000000", "", None, None)
+
+    with pytest.raises(fila.ConflitoVersao):
+        fila.finalizar(pool, id_sol, versao, "sup1", "Reprovado", "Supervisor 1", "00000000000", "", None, None)
+
+
+def _registro(pool, id_sol):
+    with pool.leitura() as conn:
+        return dict(conn.execute("SELECT * FROM solicitacoes WHERE id = ?", (id_sol,)).fetchone())
+
+
+def test_edicao_com_formulario_antigo_nao_desfaz_decisao(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    na_tela = _registro(pool, id_sol)
+    (_, _, versao), = fila.reservar(pool, "sup1", 1)
+    fila.finalizar(pool, id_sol, versao, "sup1", "Aprovado", "Supervisor 1", "00000000000", "", None, None)
+
+    with pytest.raises(fila.ConflitoVersao):
+        repositorio.editar_solicitacao(pool, na_tela, {**na_tela, "empresa": "Viação Y"}, "adm")
+    assert _registro(pool, id_sol)["status"] == "Aprovado"
+
+
+def test_edicao_grava_so_o_que_mudou(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    na_tela = _registro(pool, id_sol)
+
+    assert repositorio.editar_solicitacao(pool, na_tela, {**na_tela, "empresa": "Viação Y"}, "adm") == {
+        "empresa": "Viação Y"}
+    depois = _registro(pool, id_sol)
+    assert (depois["empresa"], depois["versao"]) == ("Viação Y", na_tela["versao"] + 1)
+
+
+def test_expirar_reservas_solta_so_as_vencidas(pool, nova_solicitacao):
+    vigente, vencida = nova_solicitacao("Aluno A"), nova_solicitacao("Aluno B")
+    fila.reservar(pool, "sup2", 1)
+    fila.reservar(pool, "sup1", 1, duracao=-1)
+
+    assert fila.expirar_reservas(pool) == 1
+    assert _registro(pool, vencida)["reservado_por"] is None
+    assert _registro(pool, vigente)["reservado_por"] == "sup2"
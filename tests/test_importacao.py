@@ -0,0 +1,10 @@
+import importacao
+
+
+def test_celula_numerica_zero_nao_vira_vazia():
+    # Como chegam do XLSX: RA e número do endereço como números
+    reg, erros = importacao.validar_linha({"nome_aluno": "Aluno", "cpf_aluno": "529.982.247-25", "ra_aluno": 0,
+                                           "numero_aluno": 0.0, "numero_escola": 120.0})
+
+    assert erros == []
+    assert (reg["ra_aluno"], reg["numero_aluno"], reg["numero_escola"]) == ("0", "0", "120")
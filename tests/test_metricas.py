@@ -0,0 +1,51 @@
+import metricas
+
+
+def _serie(sql):
+    nome = metricas.nome_consulta(sql)
+    return next(s for s in metricas.registro.resumo("sql") if s["nome"] == nome)
+
+
+def _criar(pool, quantidade):
+    with pool.escrita() as w:
+        w.executemany("INSERT INTO solicitacoes (nome_aluno) VALUES (?)", [(f"Aluno {i}",) for i in range(quantidade)])
+
+
+def test_linhas_contadas_conforme_leitura(pool):
+    _criar(pool, 7)
+    metricas.registro.limpar()
+    sql = "SELECT id, nome_aluno FROM solicitacoes ORDER BY id"
+    with pool.leitura() as conn:
+        cursor = conn.execute(sql)
+        assert len(cursor.fetchmany(3)) == 3
+        assert len(list(cursor)) == 4
+        conn.execute(sql).fetchone()
+
+    serie = _serie(sql)
+    assert serie["chamadas"] == 2 and serie["linhas"] == 8
+    assert serie["bytes"] == 0
+
+
+def test_bytes_so_quando_pedidos(pool, monkeypatch):
+    _criar(pool, 2)
+    monkeypatch.setattr(metricas, "CONTAR_BYTES", True)
+    metricas.registro.limpar()
+    sql = "SELECT nome_aluno FROM solicitacoes"
+    with pool.leitura() as conn:
+        conn.execute(sql).fetchall()
+
+    assert _serie(sql)["bytes"] == len("Aluno 0") + len("Aluno 1")
+
+
+def test_consultas_longas_nao_se_misturam():
+    base = "SELECT " + ", ".join(f"coluna_{i}" for i in range(40)) + " FROM solicitacoes ORDER BY "
+    assert metricas.nome_consulta(base + "id") != metricas.nome_consulta(base + "nome_aluno")
+    assert metricas.nome_consulta("SELECT * FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (?…)"
+
+
+def test_pausa_fica_fora_da_medida():
+    metricas.registro.limpar()
+    with metricas.medir("pagina", "teste") as medida:
+        medida.pausar(0.05)
+
+    assert metricas.registro.resumo("pagina")[0]["max_ms"] < 50
@@ -0,0 +1,39 @@
+import banco
+import eventos
+import migracoes
+
+
+def test_historico_de_solicitacao_antiga_cria_antes_de_decidir(tmp_path, monkeypatch):
+    pool = banco.abrir(str(tmp_path / "antigo.db"))
+    # Banco parado antes do histórico de eventos, com uma decisão antiga sem data_solicitacao
+    monkeypatch.setattr(migracoes, "MIGRACOES", migracoes.MIGRACOES[:13])
+    monkeypatch.setattr(migracoes, "VERSAO_ATUAL", 13)
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+    with pool.escrita() as w:
+        w.execute("INSERT INTO solicitacoes (nome_aluno, nome_escola, status, supervisor_nome, data_atualizacao, "
+                  "data_solicitacao) VALUES ('Aluno', 'EE Teste', 'Aprovado', 'Sup', '2024-03-01 10:00:00', NULL)")
+    monkeypatch.undo()
+    with pool.escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+
+    with pool.leitura() as conn:
+        tipos = [r[0] for r in conn.execute("SELECT tipo FROM eventos ORDER BY seq")]
+        sla = conn.execute("SELECT decididas, no_prazo, soma_horas FROM sla_diario").fetchall()
+        data = conn.execute("SELECT data_solicitacao FROM solicitacoes").fetchone()[0]
+    pool.fechar()
+
+    assert tipos == [eventos.CRIADA, eventos.DECIDIDA]
+    assert [tuple(r) for r in sla] == [(1, 1, 0.0)]
+    assert data == "2024-03-01 10:00:00"
+
+
+def test_sla_ignora_criacao_depois_da_decisao(pool, nova_solicitacao):
+    id_sol = nova_solicitacao()
+    with pool.escrita() as w:
+        # Como no histórico reconstruído pelo passo 14 antigo
+        eventos.registrar(w, id_sol, eventos.DECIDIDA, "sup", {"st": "Aprovado", "sup": "Sup"}, em=1000.0)
+        eventos.recalcular_sla(w)
+
+    with pool.leitura() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sla_diario").fetchone()[0] == 0
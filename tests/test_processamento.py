@@ -0,0 +1,75 @@
+import io
+import os
+import time
+
+import pytest
+
+import documentos
+import processamento
+
+
+def _png_sem_compressao():
+    from PIL import Image
+
+    saida = io.BytesIO()
+    Image.new("RGB", (400, 300), (200, 30, 30)).save(saida, "PNG", compress_level=0)
+    return saida.getvalue()
+
+
+def test_referencia_continua_no_enviado_e_otimizado_vira_previa(pool, nova_solicitacao, tmp_path):
+    pytest.importorskip("PIL")
+    raiz = str(tmp_path / "docs")
+    original = documentos.salvar_documento(_png_sem_compressao(), raiz)
+    id_sol = nova_solicitacao(ref_arq_medico=original)
+
+    assert processamento.processar_pendentes(pool, raiz) == (1, 0)
+
+    with pool.leitura() as conn:
+        atual = conn.execute("SELECT ref_arq_medico FROM solicitacoes WHERE id = ?", (id_sol,)).fetchone()[0]
+        info = processamento.situacao(conn, [original])[original]
+    assert atual == original
+    assert info["estado"] == "pronto" and info["ref"] != original
+    assert info["tamanho"] < info["tamanho_original"]
+    assert os.path.exists(documentos.caminho_documento(info["ref"], raiz))
+
+    # O mesmo arquivo enviado de novo reaproveita a prévia, sem reprocessar nem trocar referências
+    outro = nova_solicitacao("Outro Aluno", ref_arq_medico=documentos.salvar_documento(_png_sem_compressao(), raiz))
+    assert processamento.processar_pendentes(pool, raiz) == (1, 0)
+    with pool.leitura() as conn:
+        assert conn.execute("SELECT ref_arq_medico FROM solicitacoes WHERE id = ?", (outro,)).fetchone()[0] == original
+        assert conn.execute("SELECT COUNT(*) FROM documentos_info").fetchone()[0] == 1
+    assert processamento.enfileirar_existentes(pool) == 0
+
+
+def test_reserva_vencida_na_ultima_tentativa_vira_erro(pool):
+    with pool.escrita() as w:
+        processamento.enfileirar(w, ["abc"])
+        w.execute("UPDATE tarefas SET estado = 'processando', reservada_ate = ?, tentativas = ?",
+                  (time.time() - 1, processamento.MAX_TENTATIVAS))
+    with pool.leitura() as conn:
+        assert processamento.pendentes(conn) == 1
+
+    assert processamento._reservar(pool, processamento.TIPO_DOCUMENTO) is None
+    with pool.leitura() as conn:
+        assert conn.execute("SELECT estado FROM tarefas").fetchone()[0] == "erro"
+        assert processamento.pendentes(conn) == 0
+
+
+def test_laco_sobrevive_a_erro_do_banco(pool, monkeypatch):
+    chamadas = []
+    processador = processamento.Processador(pool, trabalhadores=1)
+
+    def reservar(pool, tipo):
+        chamadas.append(tipo)
+        if len(chamadas) == 1:
+            raise RuntimeError("banco indisponível")
+        processador._parar.set()
+        return None
+
+    monkeypatch.setattr(processamento, "_reservar", reservar)
+    monkeypatch.setattr(processamento, "INTERVALO_OCIOSO", 0.01)
+    processador.iniciar()
+    processador._threads[0].join(timeout=5)
+    processador.parar()
+
+    assert len(chamadas) == 2
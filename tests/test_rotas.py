@@ -0,0 +1,51 @@
+import numpy as np
+
+import rotas
+
+
+def test_duas_paradas_comecam_pela_mais_distante():
+    # Escola na origem; a parada 1 fica perto dela e a 2 longe
+    dist = rotas.matriz_distancias([(0, 0), (0.01, 0), (0.05, 0)])
+
+    for rota in ([1, 2], [2, 1]):
+        ordem, km = rotas._dois_opt(rota, dist)
+        assert ordem == [2, 1]
+        assert np.isclose(km, dist[2][1] + dist[1][0])
+
+
+def test_centroide_de_prefixo_no_fim_da_faixa(pool):
+    with pool.escrita() as w:
+        w.executemany("INSERT INTO cep_coordenadas (cep, lat, lon) VALUES (?, ?, ?)",
+                      [("99999010", -1.5, -48.5), ("99900010", -1.0, -48.0)])
+
+    with pool.leitura() as conn:
+        coords = rotas.geocodificar(conn, ["99999-999", "99988-000"])
+
+    assert coords["99999999"] == (-1.5, -48.5)
+    assert coords["99988000"] == (-1.25, -48.25)
+
+
+def test_cadeirante_sem_posicao_para_cadeira_fica_sem_lugar():
+    coords = np.array([(0.01, 0), (0.02, 0), (0.03, 0)])
+
+    viagens, sem_lugar = rotas.roteirizar((0, 0), coords, [False, True, False], cap_assentos=15, cap_cadeiras=0)
+
+    assert sem_lugar == [1]
+    assert sorted(i for ordem, _ in viagens for i in ordem) == [0, 2]
+
+
+def test_planejar_informa_aluno_sem_lugar_uma_vez(pool, nova_solicitacao):
+    with pool.escrita() as w:
+        w.executemany("INSERT INTO cep_coordenadas (cep, lat, lon) VALUES (?, ?, ?)",
+                      [("01000000", 0.0, 0.0), ("01000100", 0.01, 0.0), ("01000200", 0.02, 0.0)])
+    comuns = {"cep_escola": "01000-000", "dias_frequencia": "Segunda, Terça", "horario_entrada": "07:00",
+              "horario_saida": "12:00"}
+    cadeirante = nova_solicitacao("Aluno A", cep_aluno="01000-100", cadeirante="SIM", **comuns)
+    nova_solicitacao("Aluno B", cep_aluno="01000-200", cadeirante="NÃO", **comuns)
+    with pool.escrita() as w:
+        w.execute("UPDATE solicitacoes SET status = 'Aprovado'")
+
+    viagens, sem_coord, sem_lugar, _ = rotas.planejar(pool, cap_cadeiras=0)
+
+    assert sem_coord == [] and [a["id"] for a in sem_lugar] == [cadeirante]
+    assert len(viagens) == 4 and all(v["alunos"] == 1 and v["cadeirantes"] == 0 for v in viagens)
@@ -1,9 +1,28 @@
+import time
+_inicio_imports = time.perf_counter()
 import streamlit as st
-import sqlite3
-import pandas as pd
-import requests
+import csv
 from datetime import datetime
-import time
+import os
+import agenda
+import autenticacao
+import busca
+import banco
+import cep
+import dados
+import documentos
+import eventos
+import exportacao
+import fila
+import importacao
+import listagem
+import metricas
+import migracoes
+import processamento
+import repositorio
+_segundos_imports = time.perf_counter() - _inicio_imports
+# pandas e rotas (numpy) são importados só nas telas que os usam: a tela da
+# escola, a mais acessada, abre sem carregá-los
 
 # ==========================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -13,76 +32,81 @@ st.set_page_config(page_title="Gestão de Transporte Escolar", layout="wide")
 # ==========================================
 # CONEXÃO E MIGRATION DO BANCO DE DADOS
 # ==========================================
-DB_NAME = 'transporte_v4.db'
+# Arquivo SQLite (padrão) ou postgresql://... para várias réplicas do app no mesmo banco
+DB_URL = os.environ.get('TRANSPORTE_DB_URL') or os.environ.get('TRANSPORTE_DB', 'transporte_v4.db')
+EXPORT_DIR = 'exportacoes'
+LIMITE_DOWNLOAD = 200 * 1024 * 1024
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+# A subida do processo aparece na página Desempenho (categoria "inicio"):
+# imports, pool, migrações e processador, medidos uma vez por processo
+@st.cache_resource
+def medir_imports():
+    metricas.registro.registrar("inicio", "imports", _segundos_imports)
 
+# Pool compartilhado por todas as sessões do processo (leitores + um escritor)
+@st.cache_resource
+def get_pool():
+    with metricas.medir("inicio", "get_pool"):
+        pool = banco.abrir(DB_URL)
+        # Toda escrita confirmada invalida as consultas em cache que dependem dela
+        dados.ligar_invalidacao(pool)
+    return pool
+
+# Roda uma vez por processo; com o schema em dia, migrar() só lê a versão
+@st.cache_resource
 def init_db():
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    # 1. Tabela de Solicitações
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS solicitacoes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome_aluno TEXT, cpf_aluno TEXT, ra_aluno TEXT, cadeirante TEXT, cid TEXT,
-        cep_aluno TEXT, logradouro_aluno TEXT, numero_aluno TEXT, municipio_aluno TEXT,
-        nome_escola TEXT, cep_escola TEXT, logradouro_escola TEXT, numero_escola TEXT, municipio_escola TEXT,
-        sala_recurso TEXT, dias_frequencia TEXT, horario_entrada TEXT, horario_saida TEXT,
-        arquivo_medico BLOB, nome_arq_medico TEXT, arquivo_viagem BLOB, nome_arq_viagem TEXT,
-        status TEXT DEFAULT 'Pendente', supervisor_nome TEXT, supervisor_cpf TEXT,
-        motivo_reprovacao TEXT, arquivo_assinado BLOB, nome_arq_assinado TEXT, data_atualizacao TEXT
-    )
-    ''')
-    
-    # 2. Tabela de Usuários
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS usuarios (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome_completo TEXT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        perfis TEXT NOT NULL
-    )
-    ''')
-    
-    # 3. Adicionar coluna 'empresa' se não existir
-    try:
-        c.execute("ALTER TABLE solicitacoes ADD COLUMN empresa TEXT")
-    except sqlite3.OperationalError:
-        pass 
-        
-    # 4. GARANTIR USUÁRIO ADM COM A SENHA NOVA (12345678)
-    # Verifica se já existe
-    c.execute("SELECT * FROM usuarios WHERE username = 'adm'")
-    if c.fetchone():
-        # Se existe, ATUALIZA a senha para garantir a mudança
-        c.execute("UPDATE usuarios SET password = '12345678' WHERE username = 'adm'")
-    else:
-        # Se não existe, CRIA com a senha nova
-        c.execute("INSERT INTO usuarios (nome_completo, username, password, perfis) VALUES (?, ?, ?, ?)",
-                  ("Administrador do Sistema", "adm", "12345678", "ADM"))
-        
-    conn.commit()
-    conn.close()
+    with metricas.medir("inicio", "init_db"), get_pool().escrita(transacao=False) as conn:
+        migracoes.migrar(conn)
+
+# Otimização, miniaturas e metadados dos documentos enviados (threads do processo)
+@st.cache_resource
+def get_processador():
+    with metricas.medir("inicio", "get_processador"):
+        return processamento.Processador(get_pool()).iniciar()
 
 # Inicializa o banco ao abrir o app
+medir_imports()
+pool = get_pool()
 init_db()
+get_processador()
 
 # ==========================================
 # FUNÇÕES DE AUTENTICAÇÃO E SESSÃO
 # ==========================================
 
 def verificar_credenciais(username, password):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT * FROM usuarios WHERE username = ? AND password = ?", (username, password))
-    user = c.fetchone()
-    conn.close()
-    return user
+    return autenticacao.verificar_credenciais(pool, username, password)
+
+COOKIE_SESSAO = "transporte_sessao"
+
+def iniciar_sessao(username, nome, perfil, token=None):
+    st.session_state.logged_in = True
+    st.session_state.user_role = perfil
+    st.session_state.user_name = nome
+    st.session_state.username_login = username
+    # O token no cookie permite voltar ao painel após recarregar a página ou reiniciar o servidor
+    st.session_state.token_sessao = token or autenticacao.criar_sessao(pool, username, perfil)
+
+def restaurar_sessao():
+    # Links antigos com ?sessao= não valem mais (o token vazava pela URL)
+    if "sessao" in st.query_params:
+        del st.query_params["sessao"]
+    token = st.context.cookies.get(COOKIE_SESSAO)
+    if not token:
+        return
+    sessao = autenticacao.validar_sessao(pool, token)
+    if sessao is None:
+        st.session_state.apagar_cookie = True
+        return
+    username, nome, perfil = sessao
+    iniciar_sessao(username, nome, perfil, autenticacao.renovar_sessao(pool, token, username, perfil))
+
+def gravar_cookie(valor, duracao):
+    # st.context.cookies só lê; quem grava é um componente invisível no navegador
+    st.iframe(
+        f"<script>window.parent.document.cookie = '{COOKIE_SESSAO}={valor}; path=/; max-age={int(duracao)}; "
+        f"SameSite=Strict' + (window.parent.location.protocol === 'https:' ? '; Secure' : '');</script>",
+        height=1)
 
 def login_screen():
     st.markdown("<h1 style='text-align: center;'>🔐 Transporte Escolar</h1>", unsafe_allow_html=True)
@@ -95,10 +119,7 @@ def login_screen():
         role_selected = st.selectbox("Perfil:", roles)
         
         if st.button("Acessar Painel"):
-            st.session_state.logged_in = True
-            st.session_state.user_role = role_selected
-            st.session_state.user_name = st.session_state.temp_user_name
-            st.session_state.username_login = st.session_state.temp_username_login
+            iniciar_sessao(st.session_state.temp_username_login, st.session_state.temp_user_name, role_selected)
             
             del st.session_state.auth_success
             del st.session_state.pending_roles
@@ -121,10 +142,7 @@ def login_screen():
                         lista_perfis = [p.strip() for p in perfis_str.split(",")]
                         
                         if len(lista_perfis) == 1:
-                            st.session_state.logged_in = True
-                            st.session_state.user_role = lista_perfis[0]
-                            st.session_state.user_name = user_db["nome_completo"]
-                            st.session_state.username_login = user_db["username"]
+                            iniciar_sessao(user_db["username"], user_db["nome_completo"], lista_perfis[0])
                             st.rerun()
                         else:
                             st.session_state.auth_success = True
@@ -137,22 +155,59 @@ def login_screen():
 
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
+    restaurar_sessao()
+
+# Repetido a cada rerun até o navegador reconectar com o cookie novo
+# (st.context.cookies é o da conexão): um st.rerun() logo depois não o perde
+if st.session_state.get("token_sessao") and st.context.cookies.get(COOKIE_SESSAO) != st.session_state.token_sessao:
+    gravar_cookie(st.session_state.token_sessao, autenticacao.DURACAO_SESSAO)
+elif st.session_state.get("apagar_cookie") and st.context.cookies.get(COOKIE_SESSAO):
+    gravar_cookie("", 0)
 
 # ==========================================
 # FUNÇÕES AUXILIARES GERAIS
 # ==========================================
-def buscar_dados_cep(cep):
-    if not cep: return None
-    cep = cep.replace("-", "").replace(".", "").strip()
-    if len(cep) == 8:
-        try:
-            response = requests.get(f"https://viacep.com.br/ws/{cep}/json/")
-            dados = response.json()
-            if "erro" not in dados:
-                return dados
-        except:
-            return None
-    return None
+# Cache em memória + tabela cep_cache + ViaCEP, compartilhado pelo processo
+@st.cache_resource
+def get_servico_cep():
+    return cep.ServicoCEP(get_pool())
+
+def botao_documento(container, rotulo, ref, nome, **kwargs):
+    if not ref: return
+    arq = documentos.abrir_documento(ref)
+    if arq is None:
+        container.caption(f"{rotulo}: arquivo não encontrado")
+        return
+    with arq, metricas.medir("documento", "download") as medida:
+        medida.bytes = os.fstat(arq.fileno()).st_size
+        container.download_button(rotulo, arq, nome, **kwargs)
+
+def _tamanho_legivel(n):
+    return f"{n / 1024:.0f} KB" if n < 1024 * 1024 else f"{n / 1024 / 1024:.1f} MB"
+
+_EXTENSOES_PREVIA = {"image/jpeg": "jpg", "image/png": "png", "application/pdf": "pdf"}
+
+def situacao_documento(container, info, chave=None):
+    # info vem de dados.situacao_documentos; com `chave`, oferece também a versão
+    # reduzida (prévia em documentos_info). O botão principal sempre entrega o enviado
+    if not info or info["estado"] is None: return
+    if info["estado"] == "processando":
+        container.caption("⏳ Processando documento (miniatura e compressão)...")
+    elif info["estado"] == "erro":
+        container.caption(f"⚠️ Falha ao processar: {info['erro']}")
+    else:
+        miniatura = documentos.ler_documento(info["ref_miniatura"])
+        if miniatura:
+            container.image(miniatura, width=160)
+        legenda = f"{info['mime']} | {_tamanho_legivel(info['tamanho'])}"
+        if info["tamanho"] < info["tamanho_original"]:
+            legenda += f" (original {_tamanho_legivel(info['tamanho_original'])})"
+        if info["paginas"]:
+            legenda += f" | {info['paginas']} pág."
+        container.caption(legenda)
+        if chave and info["ref"] != info["ref_original"]:
+            botao_documento(container, "Versão reduzida", info["ref"],
+                            f"previa.{_EXTENSOES_PREVIA.get(info['mime'], 'bin')}", key=chave)
 
 # ==========================================
 # LÓGICA PRINCIPAL (APP)
@@ -168,7 +223,7 @@ else:
     role = st.session_state.user_role
     
     if role == "ADM":
-        opcoes_menu = ["Escola (Solicitação)", "Supervisor (Avaliação)", "Relatórios e Docs", "Gestão de Acesso"]
+        opcoes_menu = ["Escola (Solicitação)", "Supervisor (Avaliação)", "Relatórios e Docs", "Gestão de Acesso", "Importação em Lote", "Planejamento de Rotas", "Painel de Frequência", "Desempenho"]
     elif role == "Escola":
         opcoes_menu = ["Escola (Solicitação)"]
     elif role == "Supervisor":
@@ -178,273 +233,630 @@ else:
     
     st.sidebar.markdown("---")
     if st.sidebar.button("Sair / Logout"):
+        if st.session_state.get("token_sessao"):
+            autenticacao.encerrar_sessao(pool, st.session_state.token_sessao)
         for key in list(st.session_state.keys()):
             del st.session_state[key]
+        st.session_state.logged_in = False
+        st.session_state.apagar_cookie = True
         st.rerun()
 
-    conn = get_db_connection()
-    c = conn.cursor()
+    # Cada consulta da tela empresta uma conexão de leitura só enquanto roda
+    # (banco.LeituraPorConsulta); o tempo de cada tela vai para a página Desempenho,
+    # sem as pausas para ler um aviso antes do st.rerun() (medida_pagina.pausar)
+    with banco.LeituraPorConsulta(pool) as conn, metricas.medir("pagina", menu) as medida_pagina:
 
-    # ==========================================
-    # 1. ESCOLA (SOLICITAÇÃO)
-    # ==========================================
-    if menu == "Escola (Solicitação)":
-        st.title("🚌 Transporte Escolar - Solicitação")
-        st.markdown("---")
+        # ==========================================
+        # 1. ESCOLA (SOLICITAÇÃO)
+        # ==========================================
+        if menu == "Escola (Solicitação)":
+            st.title("🚌 Transporte Escolar - Solicitação")
+            st.markdown("---")
 
-        disable_widgets = True if role == "Supervisor" else False
+            disable_widgets = True if role == "Supervisor" else False
         
-        if disable_widgets:
-            st.warning("🔒 MODO VISUALIZAÇÃO: Seu perfil permite apenas visualizar este formulário.")
-
-        with st.form("form_escola"):
-            st.subheader("1. Dados do Aluno")
-            c1, c2, c3 = st.columns(3)
-            nome = c1.text_input("Nome Completo", disabled=disable_widgets)
-            cpf = c2.text_input("CPF", disabled=disable_widgets)
-            ra = c3.text_input("R.A.", disabled=disable_widgets)
-
-            c4, c5 = st.columns(2)
-            cadeirante = c4.radio("Cadeirante?", ["NÃO", "SIM"], horizontal=True, disabled=disable_widgets)
-            cid = c5.text_input("CID", disabled=disable_widgets)
-
-            st.markdown("##### Endereço Residencial")
-            c_cep, c_dummy = st.columns([1, 2])
-            cep_aluno = c_cep.text_input("CEP Residencial", disabled=disable_widgets)
+            if disable_widgets:
+                st.warning("🔒 MODO VISUALIZAÇÃO: Seu perfil permite apenas visualizar este formulário.")
+
+            # Os dois CEPs do último envio são resolvidos em paralelo antes de desenhar o formulário
+            d, d2 = None, None
+            if not disable_widgets:
+                d, d2 = get_servico_cep().resolver_varios(
+                    [st.session_state.get("cep_aluno"), st.session_state.get("cep_escola")])
+
+            with st.form("form_escola"):
+                st.subheader("1. Dados do Aluno")
+                c1, c2, c3 = st.columns(3)
+                nome = c1.text_input("Nome Completo", disabled=disable_widgets)
+                cpf = c2.text_input("CPF", disabled=disable_widgets)
+                ra = c3.text_input("R.A.", disabled=disable_widgets)
+
+                c4, c5 = st.columns(2)
+                cadeirante = c4.radio("Cadeirante?", ["NÃO", "SIM"], horizontal=True, disabled=disable_widgets)
+                cid = c5.text_input("CID", disabled=disable_widgets)
+
+                st.markdown("##### Endereço Residencial")
+                c_cep, c_dummy = st.columns([1, 2])
+                cep_aluno = c_cep.text_input("CEP Residencial", key="cep_aluno", disabled=disable_widgets)
             
-            log_sugg = ""
-            mun_sugg = ""
-            if not disable_widgets and cep_aluno and len(cep_aluno) >= 8:
-                d = buscar_dados_cep(cep_aluno)
+                log_sugg = ""
+                mun_sugg = ""
                 if d:
                     log_sugg = f"{d['logradouro']}, {d['bairro']}"
                     mun_sugg = f"{d['localidade']} - {d['uf']}"
                     st.success(f"Endereço encontrado: {log_sugg}")
 
-            c_end, c_num, c_mun = st.columns([3, 1, 2])
-            end_aluno = c_end.text_input("Logradouro", value=log_sugg, disabled=disable_widgets)
-            num_aluno = c_num.text_input("Número", disabled=disable_widgets)
-            mun_aluno = c_mun.text_input("Município", value=mun_sugg, disabled=disable_widgets)
+                c_end, c_num, c_mun = st.columns([3, 1, 2])
+                end_aluno = c_end.text_input("Logradouro", value=log_sugg, disabled=disable_widgets)
+                num_aluno = c_num.text_input("Número", disabled=disable_widgets)
+                mun_aluno = c_mun.text_input("Município", value=mun_sugg, disabled=disable_widgets)
 
-            st.subheader("2. Dados da Escola")
-            nome_escola = st.text_input("Nome da Unidade", disabled=disable_widgets)
+                st.subheader("2. Dados da Escola")
+                nome_escola = st.text_input("Nome da Unidade", disabled=disable_widgets)
             
-            c_cep2, dummy = st.columns([1, 2])
-            cep_escola = c_cep2.text_input("CEP Escola", disabled=disable_widgets)
+                c_cep2, dummy = st.columns([1, 2])
+                cep_escola = c_cep2.text_input("CEP Escola", key="cep_escola", disabled=disable_widgets)
             
-            log_esc_sugg = ""
-            mun_esc_sugg = ""
-            if not disable_widgets and cep_escola and len(cep_escola) >= 8:
-                d2 = buscar_dados_cep(cep_escola)
+                log_esc_sugg = ""
+                mun_esc_sugg = ""
                 if d2:
                     log_esc_sugg = f"{d2['logradouro']}, {d2['bairro']}"
                     mun_esc_sugg = f"{d2['localidade']} - {d2['uf']}"
                     st.success(f"Escola encontrada: {log_esc_sugg}")
 
-            ce2, cn2, cm2 = st.columns([3, 1, 2])
-            end_escola = ce2.text_input("Logradouro Escola", value=log_esc_sugg, disabled=disable_widgets)
-            num_escola = cn2.text_input("Número Escola", disabled=disable_widgets)
-            mun_escola = cm2.text_input("Município Escola", value=mun_esc_sugg, disabled=disable_widgets)
+                ce2, cn2, cm2 = st.columns([3, 1, 2])
+                end_escola = ce2.text_input("Logradouro Escola", value=log_esc_sugg, disabled=disable_widgets)
+                num_escola = cn2.text_input("Número Escola", disabled=disable_widgets)
+                mun_escola = cm2.text_input("Município Escola", value=mun_esc_sugg, disabled=disable_widgets)
 
-            st.subheader("3. Frequência")
-            sala_rec = st.radio("Sala de Recurso?", ["NÃO", "SIM"], horizontal=True, disabled=disable_widgets)
-            dias = st.multiselect("Dias", ["Segunda", "Terça", "Quarta", "Quinta", "Sexta"], disabled=disable_widgets)
+                st.subheader("3. Frequência")
+                sala_rec = st.radio("Sala de Recurso?", ["NÃO", "SIM"], horizontal=True, disabled=disable_widgets)
+                dias = st.multiselect("Dias", ["Segunda", "Terça", "Quarta", "Quinta", "Sexta"], disabled=disable_widgets)
             
-            ch1, ch2 = st.columns(2)
-            hr_ent = ch1.time_input("Entrada", value=None, disabled=disable_widgets)
-            hr_sai = ch2.time_input("Saída", value=None, disabled=disable_widgets)
+                ch1, ch2 = st.columns(2)
+                hr_ent = ch1.time_input("Entrada", value=None, disabled=disable_widgets)
+                hr_sai = ch2.time_input("Saída", value=None, disabled=disable_widgets)
 
-            st.subheader("4. Documentação")
-            f_med = st.file_uploader("Ficha Médica", disabled=disable_widgets)
-            f_via = st.file_uploader("Ficha Viagem", disabled=disable_widgets)
+                st.subheader("4. Documentação")
+                f_med = st.file_uploader("Ficha Médica", disabled=disable_widgets)
+                f_via = st.file_uploader("Ficha Viagem", disabled=disable_widgets)
 
-            if not disable_widgets:
-                if st.form_submit_button("Enviar Solicitação"):
-                    if nome and cpf and ra and num_aluno and num_escola and f_med and f_via:
-                        c.execute('''INSERT INTO solicitacoes (
-                            nome_aluno, cpf_aluno, ra_aluno, cadeirante, cid,
-                            cep_aluno, logradouro_aluno, numero_aluno, municipio_aluno,
-                            nome_escola, cep_escola, logradouro_escola, numero_escola, municipio_escola,
-                            sala_recurso, dias_frequencia, horario_entrada, horario_saida,
-                            arquivo_medico, nome_arq_medico, arquivo_viagem, nome_arq_viagem
-                        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)''',
-                        (nome, cpf, ra, cadeirante, cid, cep_aluno, end_aluno, num_aluno, mun_aluno,
-                         nome_escola, cep_escola, end_escola, num_escola, mun_escola,
-                         sala_rec, ", ".join(dias), str(hr_ent), str(hr_sai),
-                         f_med.getvalue(), f_med.name, f_via.getvalue(), f_via.name))
-                        conn.commit()
-                        st.success("Cadastrado com sucesso!")
-                    else:
-                        st.error("Preencha campos obrigatórios e anexe documentos.")
+                if not disable_widgets:
+                    if st.form_submit_button("Enviar Solicitação"):
+                        if nome and cpf and ra and num_aluno and num_escola and f_med and f_via:
+                            ref_med = documentos.salvar_documento(f_med)
+                            ref_via = documentos.salvar_documento(f_via)
+                            repositorio.inserir_solicitacao(pool, dict(zip(repositorio.COLUNAS_FORMULARIO, (
+                                nome, cpf, ra, cadeirante, cid, cep_aluno, end_aluno, num_aluno, mun_aluno,
+                                nome_escola, cep_escola, end_escola, num_escola, mun_escola,
+                                sala_rec, ", ".join(dias), str(hr_ent) if hr_ent else None, str(hr_sai) if hr_sai else None,
+                                ref_med, f_med.name, ref_via, f_via.name))))
+                            get_processador().acordar()
+                            st.success("Cadastrado com sucesso!")
+                        else:
+                            st.error("Preencha campos obrigatórios e anexe documentos.")
+
+        # ==========================================
+        # 2. SUPERVISOR (AVALIAÇÃO)
+        # ==========================================
+        elif menu == "Supervisor (Avaliação)":
+            import pandas as pd
 
-    # ==========================================
-    # 2. SUPERVISOR (AVALIAÇÃO)
-    # ==========================================
-    elif menu == "Supervisor (Avaliação)":
-        st.title("📋 Painel do Supervisor")
+            st.title("📋 Painel do Supervisor")
         
-        pendentes = pd.read_sql("SELECT id, nome_aluno FROM solicitacoes WHERE status='Pendente'", conn)
+            supervisor = st.session_state.username_login
+
+            m = dados.metricas_fila(conn)
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Pendentes", m["pendentes"])
+            m2.metric("Disponíveis", m["disponiveis"])
+            m3.metric("Em análise", m["reservadas"])
+            m4.metric("Decididas (24h)", m["decididas"])
+            if m["por_supervisor"]:
+                with st.expander("Vazão por supervisor (24h)"):
+                    st.dataframe(pd.DataFrame([dict(r) for r in m["por_supervisor"]]), hide_index=True)
+            with st.expander(f"⏱️ Tempo até a decisão (30 dias, prazo {eventos.PRAZO_SLA_HORAS}h)"):
+                s1, s2 = st.columns(2)
+                s1.dataframe(pd.DataFrame(dados.sla(conn, "supervisor")), hide_index=True)
+                s2.dataframe(pd.DataFrame(dados.sla(conn, "escola")), hide_index=True)
+
+            q1, q2, q3 = st.columns([1, 1, 2])
+            qtd = q1.number_input("Quantidade", min_value=1, max_value=50, value=5)
+            if q2.button("📥 Pegar próximas"):
+                # Solta as reservas abandonadas: deixam de aparecer como "em análise" e nas métricas
+                fila.expirar_reservas(pool)
+                if not fila.reservar(pool, supervisor, int(qtd)):
+                    st.info("Nenhuma solicitação disponível na fila.")
+                st.rerun()
+            if q3.button(f"⏱️ Renovar prazo ({fila.DURACAO_RESERVA // 60} min)"):
+                fila.renovar(pool, supervisor)
+                st.rerun()
+
+            with st.expander("🔎 Buscar solicitação (nome, CPF, RA, escola, empresa, endereço)"):
+                termo_sup = st.text_input("Buscar", key="busca_supervisor", label_visibility="collapsed",
+                                          placeholder="Ex.: joao silva, 123.456, EE Escola 3")
+                if termo_sup:
+                    achados, aproximado, segundos = busca.buscar(conn, termo_sup)
+                    st.caption(f"{len(achados)} resultado(s) em {segundos * 1000:.0f} ms"
+                               + (" | nenhum com todos os termos; mostrando aproximados" if aproximado else ""))
+                    agora_ts = time.time()
+                    for achado in achados:
+                        r1, r2 = st.columns([5, 1])
+                        ocupado = achado['reservado_por'] and achado['reserva_expira'] >= agora_ts and achado['reservado_por'] != supervisor
+                        r1.write(f"**{achado['id']} - {achado['nome_aluno']}** | RA {achado['ra_aluno']} | "
+                                 f"{achado['nome_escola']} | {achado['status']}"
+                                 + (f" | 🔒 em análise por {achado['reservado_por']}" if ocupado else ""))
+                        if achado['status'] == "Pendente" and not ocupado:
+                            if r2.button("📥 Reservar", key=f"reservar_{achado['id']}"):
+                                if not fila.reservar_id(pool, achado['id'], supervisor):
+                                    st.warning("Outra pessoa reservou esta solicitação.")
+                                st.rerun()
+
+            # Só as solicitações reservadas para este supervisor (e dentro do prazo)
+            reservas = {f"{r['id']} - {r['nome_aluno']}": r for r in dados.minhas_reservas(conn, supervisor)}
         
-        if not pendentes.empty:
-            sel = st.selectbox("Selecione:", pendentes.apply(lambda x: f"{x['id']} - {x['nome_aluno']}", axis=1))
-            id_sel = int(sel.split(' - ')[0])
+            if reservas:
+                sel = st.selectbox("Minhas reservas:", list(reservas))
+                reserva = reservas[sel]
+                id_sel = reserva['id']
+                st.caption(f"Reservada até {datetime.fromtimestamp(reserva['reserva_expira']).strftime('%H:%M')}")
             
-            c.execute("SELECT * FROM solicitacoes WHERE id=?", (id_sel,))
-            aluno = c.fetchone()
+                aluno = dados.registro(conn, id_sel)
             
-            if aluno:
-                st.info(f"Aluno: {aluno['nome_aluno']} (RA: {aluno['ra_aluno']})")
+                if aluno:
+                    st.info(f"Aluno: {aluno['nome_aluno']} (RA: {aluno['ra_aluno']})")
                 
-                t1, t2 = st.tabs(["Dados", "Documentos"])
-                with t1:
-                    st.write(f"**Endereço:** {aluno['logradouro_aluno']}, {aluno['numero_aluno']}")
-                    st.write(f"**Escola:** {aluno['nome_escola']}")
-                    st.write(f"**Horário:** {aluno['horario_entrada']} - {aluno['horario_saida']}")
-                with t2:
-                    c1, c2 = st.columns(2)
-                    if aluno['arquivo_medico']:
-                        c1.download_button("Médico", aluno['arquivo_medico'], aluno['nome_arq_medico'] or "med.pdf")
-                    if aluno['arquivo_viagem']:
-                        c2.download_button("Viagem", aluno['arquivo_viagem'], aluno['nome_arq_viagem'] or "via.pdf")
+                    t1, t2 = st.tabs(["Dados", "Documentos"])
+                    with t1:
+                        st.write(f"**Endereço:** {aluno['logradouro_aluno']}, {aluno['numero_aluno']}")
+                        st.write(f"**Escola:** {aluno['nome_escola']}")
+                        st.write(f"**Horário:** {aluno['horario_entrada']} - {aluno['horario_saida']}")
+                    with t2:
+                        c1, c2 = st.columns(2)
+                        sit_docs = dados.situacao_documentos(conn, (aluno['ref_arq_medico'], aluno['ref_arq_viagem']))
+                        botao_documento(c1, "Médico", aluno['ref_arq_medico'], aluno['nome_arq_medico'] or "med.pdf")
+                        situacao_documento(c1, sit_docs.get(aluno['ref_arq_medico']), chave=f"pm{aluno['id']}")
+                        botao_documento(c2, "Viagem", aluno['ref_arq_viagem'], aluno['nome_arq_viagem'] or "via.pdf")
+                        situacao_documento(c2, sit_docs.get(aluno['ref_arq_viagem']), chave=f"pv{aluno['id']}")
                 
-                st.markdown("---")
-                with st.form("valida_sup"):
-                    st.markdown("#### Identificação e Parecer")
-                    nome_padrao = st.session_state.user_name if role == "Supervisor" else ""
+                    st.markdown("---")
+                    with st.form("valida_sup"):
+                        st.markdown("#### Identificação e Parecer")
+                        nome_padrao = st.session_state.user_name if role == "Supervisor" else ""
                     
-                    nome_sup = st.text_input("Nome Supervisor", value=nome_padrao)
-                    cpf_sup = st.text_input("CPF Supervisor")
-                    parecer = st.radio("Decisão", ["Aprovar Solicitação", "Reprovar Solicitação"])
+                        nome_sup = st.text_input("Nome Supervisor", value=nome_padrao)
+                        cpf_sup = st.text_input("CPF Supervisor")
+                        parecer = st.radio("Decisão", ["Aprovar Solicitação", "Reprovar Solicitação"])
                     
-                    motivo = None
-                    if parecer == "Reprovar Solicitação":
-                        motivo = st.selectbox("Motivo", ["Falta de Doc", "Não elegível", "Reavaliação"])
+                        motivo = None
+                        if parecer == "Reprovar Solicitação":
+                            motivo = st.selectbox("Motivo", ["Falta de Doc", "Não elegível", "Reavaliação"])
                     
-                    f_ass = st.file_uploader("Ficha Assinada (Obrigatório)")
+                        f_ass = st.file_uploader("Ficha Assinada (Obrigatório)")
                     
-                    if st.form_submit_button("Finalizar"):
-                        if nome_sup and cpf_sup and f_ass:
-                            st_final = "Aprovado" if parecer == "Aprovar Solicitação" else "Reprovado"
-                            c.execute('''UPDATE solicitacoes SET 
-                                status=?, supervisor_nome=?, supervisor_cpf=?, motivo_reprovacao=?,
-                                arquivo_assinado=?, nome_arq_assinado=?, data_atualizacao=?
-                                WHERE id=?''',
-                                (st_final, nome_sup, cpf_sup, motivo or "Aprovado", 
-                                 f_ass.getvalue(), f_ass.name, str(datetime.now()), id_sel))
-                            conn.commit()
-                            st.success("Avaliação salva!")
-                            st.rerun()
-                        else:
-                            st.error("Preencha todos os campos e anexe o arquivo.")
-        else:
-            st.info("Sem pendências.")
-
-    # ==========================================
-    # 3. RELATÓRIOS E DOCS (COM EDIÇÃO)
-    # ==========================================
-    elif menu == "Relatórios e Docs":
-        st.title("🗂️ Relatório Geral e Edição")
-        
-        filtro = st.selectbox("Filtrar Status", ["Todos", "Pendente", "Aprovado", "Reprovado"])
-        
-        query = "SELECT * FROM solicitacoes"
-        if filtro != "Todos":
-            query += f" WHERE status = '{filtro}'"
-            
-        df = pd.read_sql(query, conn)
-        
-        st.dataframe(df[['id', 'nome_aluno', 'nome_escola', 'status', 'empresa', 'supervisor_nome']])
-        
-        st.markdown("---")
-        st.subheader("Gerenciar Registros (Editar / Excluir / Docs)")
+                        if st.form_submit_button("Finalizar"):
+                            if nome_sup and cpf_sup and f_ass:
+                                st_final = "Aprovado" if parecer == "Aprovar Solicitação" else "Reprovado"
+                                ref_ass = documentos.salvar_documento(f_ass)
+                                try:
+                                    fila.finalizar(pool, id_sel, reserva['versao'], supervisor, st_final,
+                                                   nome_sup, cpf_sup, motivo or "Aprovado", ref_ass, f_ass.name)
+                                except fila.ConflitoVersao as e:
+                                    st.error(f"{e} Recarregue a fila antes de continuar.")
+                                else:
+                                    with pool.escrita() as w:
+                                        processamento.enfileirar(w, [ref_ass])
+                                    get_processador().acordar()
+                                    st.success("Avaliação salva!")
+                                    st.rerun()
+                            else:
+                                st.error("Preencha todos os campos e anexe o arquivo.")
+
+                    if st.button("↩️ Devolver à fila"):
+                        fila.liberar(pool, id_sel, supervisor)
+                        st.rerun()
+            else:
+                st.info("Nenhuma solicitação reservada para você. Use \"Pegar próximas\".")
+
+        # ==========================================
+        # 3. RELATÓRIOS E DOCS (COM EDIÇÃO)
+        # ==========================================
+        elif menu == "Relatórios e Docs":
+            import pandas as pd
+
+            st.title("🗂️ Relatório Geral e Edição")
         
-        registros = c.execute(query).fetchall()
+            termo_rel = st.text_input("🔎 Buscar (nome, CPF, RA, escola, empresa, endereço)", key="busca_relatorio")
+            f1, f2, f3 = st.columns(3)
+            filtro = f1.selectbox("Filtrar Status", ["Todos", "Pendente", "Aprovado", "Reprovado", eventos.STATUS_EXCLUIDO])
+            filtro_escola = f2.selectbox("Escola", ["Todas"] + dados.valores_distintos(conn, "nome_escola"))
+            filtro_empresa = f3.selectbox("Empresa", ["Todas"] + dados.valores_distintos(conn, "empresa"))
+
+            f4, f5, f6, f7 = st.columns(4)
+            data_ini = f4.date_input("Solicitado a partir de", value=None)
+            data_fim = f5.date_input("Solicitado até", value=None)
+            ordem = f6.selectbox("Ordenar por", list(listagem.ORDENACOES))
+            decrescente = f7.radio("Sentido", ["Crescente", "Decrescente"], horizontal=True) == "Decrescente"
+
+            filtros = listagem.montar_filtros(
+                status=None if filtro == "Todos" else filtro,
+                escola=None if filtro_escola == "Todas" else filtro_escola,
+                empresa=None if filtro_empresa == "Todas" else filtro_empresa,
+                data_inicio=data_ini, data_fim=data_fim, busca=termo_rel, dialeto=pool.dialeto,
+            )
+
+            # Pilha com o cursor de início de cada página visitada; zera quando a consulta muda
+            assinatura = (filtros[0], tuple(filtros[1]), ordem, decrescente)
+            if st.session_state.get("rel_assinatura") != assinatura:
+                st.session_state.rel_assinatura = assinatura
+                st.session_state.rel_cursores = [None]
+            cursores = st.session_state.rel_cursores
+
+            registros, proximo = dados.listar_pagina(conn, filtros, ordem, decrescente, cursores[-1])
+            total = dados.contar(conn, filtros)
+
+            st.caption(f"{total} registro(s) | Página {len(cursores)}")
+            st.dataframe(
+                pd.DataFrame([dict(r) for r in registros],
+                             columns=['id', 'nome_aluno', 'nome_escola', 'status', 'empresa', 'supervisor_nome', 'data_solicitacao']),
+                hide_index=True,
+            )
+
+            p_ant, p_prox, _ = st.columns([1, 1, 4])
+            if p_ant.button("⬅️ Anterior", disabled=len(cursores) == 1):
+                cursores.pop()
+                st.rerun()
+            if p_prox.button("Próxima ➡️", disabled=proximo is None):
+                cursores.append(proximo)
+                st.rerun()
         
-        for reg in registros:
-            empresa_lbl = f" | 🏢 {reg['empresa']}" if reg['empresa'] else ""
-            label = f"🆔 {reg['id']} - {reg['nome_aluno']} ({reg['status']}){empresa_lbl}"
-            
-            with st.expander(label):
+            with st.expander("📤 Exportar registros filtrados"):
+                ex1, ex2, ex3 = st.columns([1, 1, 1])
+                formato = ex1.selectbox("Formato", exportacao.FORMATOS)
+                com_docs = ex2.checkbox("Incluir ZIP de documentos")
+                if ex3.button("Gerar exportação"):
+                    # Gerado em disco, em fluxo; o navegador só baixa se couber no limite de download
+                    pasta = os.path.join(EXPORT_DIR, datetime.now().strftime("%Y%m%d_%H%M%S"))
+                    os.makedirs(pasta, exist_ok=True)
+                    gerados = [os.path.join(pasta, f"solicitacoes.{formato}")]
+                    try:
+                        with st.spinner("Exportando..."):
+                            with open(gerados[0], "wb") as arq:
+                                exportacao.exportar_tabela(pool, arq, formato, filtros)
+                            if com_docs:
+                                gerados.append(os.path.join(pasta, "documentos.zip"))
+                                with open(gerados[1], "wb") as arq:
+                                    exportacao.exportar_documentos_zip(pool, arq, filtros)
+                    except RuntimeError as e:
+                        st.error(str(e))
+                    else:
+                        for caminho in gerados:
+                            if os.path.getsize(caminho) <= LIMITE_DOWNLOAD:
+                                with open(caminho, "rb") as arq:
+                                    st.download_button(f"Baixar {os.path.basename(caminho)}", arq, os.path.basename(caminho))
+                            else:
+                                st.info(f"Arquivo grande demais para o navegador; disponível no servidor em {caminho}")
+
+            st.markdown("---")
+            st.subheader("Gerenciar Registros (Editar / Excluir / Docs)")
+
+            # A opção é o id: o registro continua escolhido quando o status ou a empresa mudam
+            opcoes = {
+                r['id']: f"🆔 {r['id']} - {r['nome_aluno']} ({r['status']})" + (f" | 🏢 {r['empresa']}" if r['empresa'] else "")
+                for r in registros
+            }
+            escolhido = st.selectbox("Registro da página:", [None] + list(opcoes), format_func=lambda x: opcoes[x] if x else "Selecione...", key="registro_relatorio")
+
+            # O registro completo só é lido quando o usuário abre um deles
+            reg = None
+            if escolhido:
+                reg = dados.registro(conn, escolhido)
+
+            if reg:
                 st.markdown("#### 📂 Documentos")
                 cd1, cd2, cd3 = st.columns(3)
-                if reg['arquivo_medico']: cd1.download_button("Ficha Médica", reg['arquivo_medico'], "med.pdf", key=f"dm{reg['id']}")
-                if reg['arquivo_viagem']: cd2.download_button("Ficha Viagem", reg['arquivo_viagem'], "via.pdf", key=f"dv{reg['id']}")
-                if reg['arquivo_assinado']: cd3.download_button("Parecer Assinado", reg['arquivo_assinado'], "par.pdf", key=f"da{reg['id']}")
-                
-                st.markdown("---")
-                st.markdown("#### ✏️ Editar Informações")
-                with st.form(f"edit_{reg['id']}"):
-                    ce1, ce2 = st.columns(2)
-                    new_nome = ce1.text_input("Nome Aluno", reg['nome_aluno'])
-                    new_status = ce2.selectbox("Status", ["Pendente", "Aprovado", "Reprovado"], index=["Pendente", "Aprovado", "Reprovado"].index(reg['status']))
-                    
-                    ce3, ce4 = st.columns(2)
-                    new_escola = ce3.text_input("Escola", reg['nome_escola'])
-                    new_empresa = ce4.text_input("🏢 Empresa Transportadora", value=reg['empresa'] if reg['empresa'] else "")
-                    
-                    c_save, c_del = st.columns([1, 4])
-                    save_btn = c_save.form_submit_button("💾 Salvar Alterações")
-                    
-                    if save_btn:
-                        c.execute("UPDATE solicitacoes SET nome_aluno=?, status=?, nome_escola=?, empresa=? WHERE id=?",
-                                  (new_nome, new_status, new_escola, new_empresa, reg['id']))
-                        conn.commit()
-                        st.success("Atualizado!")
-                        time.sleep(1)
-                        st.rerun()
+                botao_documento(cd1, "Ficha Médica", reg['ref_arq_medico'], reg['nome_arq_medico'] or "med.pdf", key=f"dm{reg['id']}")
+                botao_documento(cd2, "Ficha Viagem", reg['ref_arq_viagem'], reg['nome_arq_viagem'] or "via.pdf", key=f"dv{reg['id']}")
+                botao_documento(cd3, "Parecer Assinado", reg['ref_arq_assinado'], reg['nome_arq_assinado'] or "par.pdf", key=f"da{reg['id']}")
+                sit_docs = dados.situacao_documentos(conn, (reg['ref_arq_medico'], reg['ref_arq_viagem'], reg['ref_arq_assinado']))
+                for coluna_doc, ref_doc, chave_doc in zip((cd1, cd2, cd3), (reg['ref_arq_medico'], reg['ref_arq_viagem'], reg['ref_arq_assinado']), ("pm", "pv", "pa")):
+                    situacao_documento(coluna_doc, sit_docs.get(ref_doc), chave=f"{chave_doc}{reg['id']}")
+            
+                with st.expander("🕓 Histórico"):
+                    st.dataframe(pd.DataFrame(dados.historico(conn, reg['id']),
+                                              columns=["seq", "em", "tipo", "autor", "dados"]), hide_index=True)
 
-                if st.button(f"🗑️ Excluir Registro {reg['id']}", key=f"del_{reg['id']}"):
-                    c.execute("DELETE FROM solicitacoes WHERE id=?", (reg['id'],))
-                    conn.commit()
+                if reg['status'] == eventos.STATUS_EXCLUIDO:
                     st.warning("Registro excluído.")
-                    time.sleep(1)
-                    st.rerun()
+                    if st.button(f"♻️ Restaurar Registro {reg['id']}", key=f"rest_{reg['id']}"):
+                        # Volta ao status anterior à exclusão, guardado no evento
+                        repositorio.restaurar_solicitacao(pool, reg['id'], st.session_state.username_login)
+                        st.rerun()
+                else:
+                    st.markdown("---")
+                    st.markdown("#### ✏️ Editar Informações")
+                    # O formulário compara e grava contra o registro que estava na tela
+                    # quando foi preenchido (versão inclusa), não contra o relido no envio
+                    chave_base = f"edit_base_{reg['id']}"
+                    if chave_base not in st.session_state or not st.session_state.get(f"salvar_{reg['id']}"):
+                        st.session_state[chave_base] = dict(reg)
+                    base = st.session_state[chave_base]
+                    with st.form(f"edit_{reg['id']}"):
+                        ce1, ce2 = st.columns(2)
+                        new_nome = ce1.text_input("Nome Aluno", base['nome_aluno'])
+                        new_status = ce2.selectbox("Status", ["Pendente", "Aprovado", "Reprovado"], index=["Pendente", "Aprovado", "Reprovado"].index(base['status']))
 
-    # ==========================================
-    # 4. GESTÃO DE ACESSO (SÓ ADM)
-    # ==========================================
-    elif menu == "Gestão de Acesso":
-        if role != "ADM":
-            st.error("Acesso Negado.")
-        else:
-            st.title("🔐 Gestão de Usuários")
-            
-            with st.expander("➕ Cadastrar Novo Usuário", expanded=True):
-                with st.form("new_user"):
-                    u_nome = st.text_input("Nome Completo")
-                    u_user = st.text_input("Usuário (Login)")
-                    u_pass = st.text_input("Senha")
-                    u_perfis = st.multiselect("Perfis de Acesso", ["ADM", "Escola", "Supervisor"])
-                    
-                    if st.form_submit_button("Cadastrar"):
-                        if u_nome and u_user and u_pass and u_perfis:
+                        ce3, ce4 = st.columns(2)
+                        new_escola = ce3.text_input("Escola", base['nome_escola'])
+                        new_empresa = ce4.text_input("🏢 Empresa Transportadora", value=base['empresa'] if base['empresa'] else "")
+
+                        c_save, c_del = st.columns([1, 4])
+                        save_btn = c_save.form_submit_button("💾 Salvar Alterações", key=f"salvar_{reg['id']}")
+
+                        if save_btn:
+                            novos = {"nome_aluno": new_nome, "status": new_status, "nome_escola": new_escola, "empresa": new_empresa}
+                            del st.session_state[chave_base]
                             try:
-                                perfis_str = ",".join(u_perfis)
-                                c.execute("INSERT INTO usuarios (nome_completo, username, password, perfis) VALUES (?,?,?,?)",
-                                          (u_nome, u_user, u_pass, perfis_str))
-                                conn.commit()
-                                st.success(f"Usuário {u_user} criado!")
-                                time.sleep(1)
+                                repositorio.editar_solicitacao(pool, base, novos, st.session_state.username_login)
+                            except fila.ConflitoVersao as e:
+                                st.error(f"{e} Recarregue o registro antes de continuar.")
+                            else:
+                                st.success("Atualizado!")
+                                medida_pagina.pausar(1)
                                 st.rerun()
-                            except sqlite3.IntegrityError:
-                                st.error("Erro: Este nome de usuário já existe.")
-                        else:
-                            st.warning("Preencha todos os campos.")
+
+                    if st.button(f"🗑️ Excluir Registro {reg['id']}", key=f"del_{reg['id']}"):
+                        # Exclusão lógica: o registro e o histórico continuam no banco
+                        repositorio.excluir_solicitacao(pool, reg, st.session_state.username_login)
+                        st.warning("Registro excluído.")
+                        medida_pagina.pausar(1)
+                        st.rerun()
+
+        # ==========================================
+        # 4. GESTÃO DE ACESSO (SÓ ADM)
+        # ==========================================
+        elif menu == "Gestão de Acesso":
+            if role != "ADM":
+                st.error("Acesso Negado.")
+            else:
+                import pandas as pd
+
+                st.title("🔐 Gestão de Usuários")
+            
+                with st.expander("➕ Cadastrar Novo Usuário", expanded=True):
+                    with st.form("new_user"):
+                        u_nome = st.text_input("Nome Completo")
+                        u_user = st.text_input("Usuário (Login)")
+                        u_pass = st.text_input("Senha")
+                        u_perfis = st.multiselect("Perfis de Acesso", ["ADM", "Escola", "Supervisor"])
+                    
+                        if st.form_submit_button("Cadastrar"):
+                            if u_nome and u_user and u_pass and u_perfis:
+                                try:
+                                    repositorio.criar_usuario(pool, u_nome, u_user, u_pass, u_perfis)
+                                    st.success(f"Usuário {u_user} criado!")
+                                    medida_pagina.pausar(1)
+                                    st.rerun()
+                                except repositorio.UsuarioExistente:
+                                    st.error("Erro: Este nome de usuário já existe.")
+                            else:
+                                st.warning("Preencha todos os campos.")
             
-            st.subheader("Usuários Cadastrados")
-            users = pd.read_sql("SELECT id, nome_completo, username, perfis FROM usuarios", conn)
-            st.dataframe(users)
+                st.subheader("Usuários Cadastrados")
+                users = pd.DataFrame([dict(u) for u in dados.listar_usuarios(conn)],
+                                     columns=["id", "nome_completo", "username", "perfis"])
+                st.dataframe(users)
             
-            st.markdown("#### Gerenciar")
-            user_to_edit = st.selectbox("Selecione usuário para excluir:", users['username'])
-            if st.button("Excluir Usuário Selecionado"):
-                if user_to_edit == "adm":
-                    st.error("Não é possível excluir o administrador principal.")
-                else:
-                    c.execute("DELETE FROM usuarios WHERE username=?", (user_to_edit,))
-                    conn.commit()
-                    st.success("Excluído.")
-                    time.sleep(1)
-                    st.rerun()
+                st.markdown("#### Gerenciar")
+                user_to_edit = st.selectbox("Selecione usuário para excluir:", users['username'])
+                if st.button("Excluir Usuário Selecionado"):
+                    if user_to_edit == "adm":
+                        st.error("Não é possível excluir o administrador principal.")
+                    else:
+                        repositorio.excluir_usuario(pool, user_to_edit)
+                        st.success("Excluído.")
+                        medida_pagina.pausar(1)
+                        st.rerun()
+
+        # ==========================================
+        # 5. IMPORTAÇÃO EM LOTE (SÓ ADM)
+        # ==========================================
+        elif menu == "Importação em Lote":
+            if role != "ADM":
+                st.error("Acesso Negado.")
+            else:
+                import pandas as pd
+
+                st.title("📥 Importação em Lote de Solicitações")
+                st.caption("CSV (separado por vírgula ou ponto e vírgula) ou XLSX, com cabeçalho igual aos campos abaixo. "
+                           "Obrigatórios: " + ", ".join(importacao.OBRIGATORIAS) + ".")
+                st.code(";".join(importacao.COLUNAS_IMPORTACAO))
+
+                with st.form("importacao"):
+                    arquivo = st.file_uploader("Arquivo", type=["csv", "xlsx"])
+                    completar_cep = st.checkbox("Completar endereços pelo CEP", value=True)
+                    enviar = st.form_submit_button("Importar")
+
+                if enviar and arquivo:
+                    barra = st.progress(0.0, text="Importando...")
+                    tamanho = max(arquivo.size, 1)
+
+                    def atualizar(resumo):
+                        # Posição aproximada pelo total lido do arquivo enviado
+                        posicao = min(arquivo.tell() / tamanho, 1.0) if not arquivo.closed else 1.0
+                        barra.progress(posicao, text=f"{resumo['lidas']} linhas lidas | "
+                                                     f"{resumo['inseridas']} inseridas | {len(resumo['erros'])} erros")
+
+                    try:
+                        resumo = importacao.importar(
+                            pool, arquivo, nome=arquivo.name,
+                            servico_cep=get_servico_cep() if completar_cep else None,
+                            progresso=atualizar,
+                        )
+                    except (RuntimeError, UnicodeDecodeError, csv.Error) as e:
+                        st.error(f"Não foi possível ler o arquivo: {e}")
+                    else:
+                        barra.progress(1.0, text="Concluído")
+                        taxa = resumo["lidas"] / resumo["segundos"] if resumo["segundos"] else 0
+                        st.success(f"{resumo['inseridas']} de {resumo['lidas']} linhas importadas "
+                                   f"em {resumo['segundos']:.1f}s ({taxa:.0f} linhas/s).")
+                        if resumo["erros"]:
+                            st.warning(f"{len(resumo['erros'])} erro(s) encontrados.")
+                            st.dataframe(pd.DataFrame(resumo["erros"][:1000], columns=["linha", "erro"]), hide_index=True)
+                            st.download_button("Baixar relatório de erros", importacao.relatorio_erros_csv(resumo["erros"]),
+                                               "erros_importacao.csv", mime="text/csv")
+
+        # ==========================================
+        # 6. PLANEJAMENTO DE ROTAS (SÓ ADM)
+        # ==========================================
+        elif menu == "Planejamento de Rotas":
+            if role != "ADM":
+                st.error("Acesso Negado.")
+            else:
+                import pandas as pd
+                import rotas
+
+                st.title("🚌 Planejamento de Rotas")
+                st.caption("Viagens por empresa, escola, dia e janela de horário, a partir dos alunos aprovados. "
+                           "Distâncias aproximadas pelos centroides dos CEPs (x1,3 pelo traçado das ruas).")
+
+                with st.expander("Base de coordenadas dos CEPs"):
+                    st.write(f"CEPs com coordenada: "
+                             f"{rotas.total_coordenadas(conn)}")
+                    base = st.file_uploader("CSV com colunas cep, lat, lon", type=["csv"], key="base_coordenadas")
+                    if base and st.button("Carregar coordenadas"):
+                        try:
+                            st.success(f"{rotas.carregar_coordenadas(pool, base)} coordenadas carregadas.")
+                        except (KeyError, ValueError, csv.Error) as e:
+                            st.error(f"Arquivo inválido: {e}")
+
+                with st.form("planejamento"):
+                    c1, c2 = st.columns(2)
+                    emp_plano = c1.selectbox("Empresa", ["Todas"] + dados.valores_distintos(conn, "empresa"))
+                    dias_plano = c2.multiselect("Dias", list(rotas.DIAS_SEMANA), default=list(rotas.DIAS_SEMANA))
+                    c3, c4, c5 = st.columns(3)
+                    assentos = c3.number_input("Assentos por veículo", 1, 60, rotas.CAPACIDADE_ASSENTOS)
+                    cadeiras = c4.number_input("Posições para cadeira", 0, 10, rotas.CAPACIDADE_CADEIRAS)
+                    janela = c5.number_input("Janela de horário (min)", 5, 120, rotas.JANELA_MINUTOS, step=5)
+                    planejar = st.form_submit_button("Planejar")
+
+                if planejar:
+                    st.session_state.plano_rotas = rotas.planejar(
+                        pool, None if emp_plano == "Todas" else emp_plano, dias_plano,
+                        int(assentos), int(cadeiras), int(janela))
+
+                if "plano_rotas" in st.session_state:
+                    viagens, sem_coord, sem_lugar, segundos = st.session_state.plano_rotas
+                    st.success(f"{len(viagens)} viagens planejadas em {segundos:.2f}s.")
+                    if sem_coord:
+                        st.warning(f"{len(sem_coord)} aluno(s) sem coordenada do CEP (aluno ou escola) ficaram de fora.")
+                    if sem_lugar:
+                        st.warning(f"{len(sem_lugar)} aluno(s) não cabem em nenhum veículo (ex.: cadeirante sem posição "
+                                   "para cadeira) e ficaram de fora.")
+                        with st.expander("Alunos sem lugar"):
+                            st.dataframe(pd.DataFrame([{c: a[c] for c in ("id", "nome_aluno", "nome_escola", "empresa", "cadeirante")}
+                                                       for a in sem_lugar]), hide_index=True)
+                    resumo = rotas.resumo_por_empresa(viagens)
+                    if resumo:
+                        st.dataframe(pd.DataFrame(resumo), hide_index=True)
+                        st.dataframe(pd.DataFrame([{k: v for k, v in viagem.items() if k != "paradas"} for viagem in viagens]),
+                                     hide_index=True)
+                        for r in resumo:
+                            st.download_button(f"📥 Plano - {r['empresa']}", rotas.exportar_csv(viagens, r["empresa"]),
+                                               f"plano_{r['empresa'].replace(' ', '_')}.csv", mime="text/csv",
+                                               key=f"plano_{r['empresa']}")
+
+        # ==========================================
+        # 7. PAINEL DE FREQUÊNCIA (SÓ ADM)
+        # ==========================================
+        elif menu == "Painel de Frequência":
+            if role != "ADM":
+                st.error("Acesso Negado.")
+            else:
+                import pandas as pd
+
+                st.title("📅 Painel de Frequência")
+                st.caption("Alunos aprovados por escola, dia, faixa de horário e empresa.")
+
+                f1, f2, f3 = st.columns(3)
+                esc_painel = f1.selectbox("Escola", ["Todas"] + dados.valores_distintos(conn, "nome_escola"), key="painel_escola")
+                emp_painel = f2.selectbox("Empresa", ["Todas"] + dados.valores_distintos(conn, "empresa"), key="painel_empresa")
+                dias_painel = f3.multiselect("Dias", list(agenda.DIAS), key="painel_dias")
+                f4, f5, f6, f7 = st.columns(4)
+                horario_painel = f4.radio("Horário", ["entrada", "saida"], horizontal=True,
+                                          format_func=lambda h: "Entrada" if h == "entrada" else "Saída")
+                ate_painel = f5.time_input("Até (inclusive)", value=None, key="painel_ate")
+                faixa_painel = f6.selectbox("Faixa (min)", [15, 30, 60], index=1)
+                so_cadeirantes = f7.checkbox("Só cadeirantes")
+                dimensoes = st.multiselect("Agrupar por", list(agenda.DIMENSOES), default=["escola", "dia", "faixa", "empresa"])
+
+                filtros_painel = dict(
+                    escola=None if esc_painel == "Todas" else esc_painel,
+                    empresa=None if emp_painel == "Todas" else emp_painel,
+                    dias=tuple(dias_painel) or None,
+                    cadeirante=True if so_cadeirantes else None,
+                    horario=horario_painel,
+                    ate=agenda.minutos(ate_painel),
+                    faixa=faixa_painel,
+                )
+                total = dados.contagens_agenda(conn, (), **filtros_painel)[0]
+                m1, m2, m3 = st.columns(3)
+                m1.metric("Alunos", total["alunos"])
+                m2.metric("Cadeirantes", total["cadeirantes"] or 0)
+                m3.metric("Sem dia/horário", agenda.sem_horario(conn))
 
-    conn.close()
+                if dimensoes:
+                    linhas = dados.contagens_agenda(conn, tuple(dimensoes), **filtros_painel)
+                    st.dataframe(pd.DataFrame(linhas), hide_index=True)
+                    if "dia" in dimensoes:
+                        por_dia = dados.contagens_agenda(conn, ("dia",), **filtros_painel)
+                        st.bar_chart(pd.DataFrame(por_dia).set_index("dia")[["alunos", "cadeirantes"]] if por_dia else None)
+
+        # ==========================================
+        # 8. DESEMPENHO (SÓ ADM)
+        # ==========================================
+        elif menu == "Desempenho":
+            if role != "ADM":
+                st.error("Acesso Negado.")
+            else:
+                import pandas as pd
+
+                st.title("⏱️ Desempenho")
+                st.caption(f"Medições deste processo desde {datetime.fromtimestamp(metricas.registro.inicio):%d/%m/%Y %H:%M}"
+                           f" (últimas {metricas.JANELA} amostras por série para p50/p95). "
+                           "Com várias réplicas, cada uma mede só as próprias requisições.")
+                paginas = metricas.registro.resumo("pagina")
+                consultas = metricas.registro.resumo("sql")
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Telas exibidas", sum(p["chamadas"] for p in paginas))
+                m2.metric("Consultas SQL", sum(c["chamadas"] for c in consultas))
+                m3.metric("Linhas lidas", sum(c["linhas"] for c in consultas))
+                m4.metric("Cache de consultas (acertos/faltas)", f"{dados.cache.acertos} / {dados.cache.faltas}")
+                st.caption(f"Documentos na fila de processamento: {processamento.pendentes(conn)}")
+                if not metricas.ATIVO:
+                    st.info("Medição das consultas desligada (TRANSPORTE_METRICAS=0).")
+
+                colunas = ["nome", "chamadas", "p50_ms", "p95_ms", "max_ms", "total_s", "linhas", "bytes"]
+                st.subheader("Por tela")
+                st.dataframe(pd.DataFrame(paginas, columns=colunas[:6]), hide_index=True)
+                st.subheader("Por consulta")
+                st.dataframe(pd.DataFrame(consultas, columns=colunas), hide_index=True)
+                st.subheader("CEP, documentos e início do processo")
+                st.dataframe(pd.DataFrame(metricas.registro.resumo("cep") + metricas.registro.resumo("documento")
+                                          + metricas.registro.resumo("inicio"),
+                                          columns=["categoria"] + colunas), hide_index=True)
+
+                d1, d2, _ = st.columns([1, 1, 3])
+                if d1.button("💾 Exportar resumo (JSON)"):
+                    os.makedirs(EXPORT_DIR, exist_ok=True)
+                    caminho = metricas.registro.exportar(
+                        os.path.join(EXPORT_DIR, datetime.now().strftime("metricas_%Y%m%d_%H%M%S.json")))
+                    with open(caminho, "rb") as arq:
+                        st.download_button(f"Baixar {os.path.basename(caminho)}", arq, os.path.basename(caminho))
+                if d2.button("🧹 Zerar medições"):
+                    metricas.registro.limpar()
+                    st.rerun()
+                if metricas.ARQUIVO:
+                    st.caption(f"Cada amostra também é gravada em {metricas.ARQUIVO} (JSON por linha).")
+                else:
+                    st.caption("Defina TRANSPORTE_METRICAS_ARQUIVO para gravar cada amostra em arquivo (JSON por linha).")